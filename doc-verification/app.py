@@ -1,24 +1,49 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import io
 import os
-import uuid
-import shutil
-import numpy as np
+import hmac
 import json
+import uuid
 import re
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import logging
 import traceback
-try:
-    import pytesseract
-    # Comment out the explicit path for now
-    # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    from PIL import Image
-    import cv2
-    ADVANCED_FEATURES = True
-except ImportError:
-    ADVANCED_FEATURES = False
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from ocr_cache import OCRCache, hash_bytes, hash_file, settings_fingerprint
+from jobs import JobManager, JobQueueFullError
+from process_pool import DocumentProcessPool
+from ocr_engine import engine_settings as ocr_engine_settings, get_ocr_engine, shutdown_ocr_engine
+from keyword_engine import KeywordEngine
+from lazy_loading import LazyModule, Warmup, module_available, preload
+from preprocessing import decode_image_bytes, get_profile, load_image_file, preprocess_gray
+from preprocessing import decode_color_bytes, load_color_file
+from triage import REJECTED_VERDICTS, TRIAGE_ENABLED, TriageRejectedError, rotate_upright, triage_image, triage_settings
+from phash_index import MATCH_SIDE, PerceptualHashIndex, match_view, perceptual_hash, same_document
+from ingestion import IngestRequest, UploadRejectedError, inspect_upload
+from result_store import ResultStore
+from blob_store import BlobStore
+from write_behind import WriteBehindBuffer
+from metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import stage, collect_stages, observe_stages
+from profiling import PROFILE_HEADER, RequestProfile, sampled as profile_sampled
+from traffic import TrafficRecorder
+from batch import BATCH_MAX_DOCTORS, BatchFormatError, archive_entries, fan_out, form_entries, open_archive
+
+# OCR and imaging libraries are imported on first use or by the warm-up
+# thread, so the service starts answering requests immediately
+# To set an explicit tesseract path:
+# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+ADVANCED_FEATURES = module_available('pytesseract', 'PIL', 'cv2', 'numpy')
+if not ADVANCED_FEATURES:
     print("Advanced features disabled: Install pytesseract, pillow, and opencv-python for OCR capabilities")
+cv2 = LazyModule('cv2')
+Image = LazyModule('PIL.Image')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -26,6 +51,8 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# Stream uploads through a hashing, validating spool instead of werkzeug's default buffer
+app.request_class = IngestRequest
 # Configure CORS to accept requests from all origins with all methods
 CORS(app, origins="*", allow_headers=["Content-Type", "Authorization"], 
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], supports_credentials=True)
@@ -36,11 +63,28 @@ RESULTS_FOLDER = 'analysis_results'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['RESULTS_FOLDER'] = RESULTS_FOLDER
+# Admin review copies; kept on the upload volume so they are hardlinks into
+# the blob store and cost no space
+app.config['REVIEW_FOLDER'] = os.getenv('REVIEW_FOLDER', os.path.join(UPLOAD_FOLDER, 'review'))
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+# Batch uploads are spooled to disk and may be far larger than a single request
+app.config['BULK_UPLOAD_ENDPOINTS'] = ('verify_batch',)
+app.config['BULK_MAX_CONTENT_LENGTH'] = int(os.getenv('BATCH_MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))
+app.config['BULK_MAX_FORM_PARTS'] = 5 * BATCH_MAX_DOCTORS + 10
+# Decode uploads straight into memory for OCR and persist the original in the background
+app.config['IN_MEMORY_PIPELINE'] = os.getenv('IN_MEMORY_PIPELINE', '1') != '0'
 
 # Create necessary folders if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
+os.makedirs(app.config['REVIEW_FOLDER'], exist_ok=True)
+
+# Deduplicated upload contents; upload and review names are hardlinks into it
+blob_store = BlobStore(os.getenv('BLOB_STORE_PATH', os.path.join(UPLOAD_FOLDER, 'objects')))
+for _folder in (UPLOAD_FOLDER, app.config['REVIEW_FOLDER']):
+    if os.stat(_folder).st_dev != os.stat(blob_store.root).st_dev:
+        logger.warning(f"{_folder} is on a different volume than the blob store {blob_store.root}; "
+                       f"its files will be copies instead of hardlinks")
 
 # Keywords for license verification
 LICENSE_KEYWORDS = [
@@ -56,84 +100,241 @@ DEGREE_KEYWORDS = [
     'awarded', 'academic', 'diploma', 'education', 'institution', 'student'
 ]
 
+# Preprocessing profile applied before OCR (PREPROCESS_PROFILE=fast|quality|full)
+PREPROCESS_PROFILE = get_profile() if ADVANCED_FEATURES else {}
+
+# Compiled matcher scoring both keyword sets in a single pass over the text
+keyword_engine = KeywordEngine({'license': LICENSE_KEYWORDS, 'degree': DEGREE_KEYWORDS})
+
+# Persistent OCR cache keyed by the SHA-256 of the uploaded bytes
+ocr_cache = OCRCache()
+
+# Indexed store of verification results (RESULT_STORE_PATH, RESULT_RETENTION)
+result_store = ResultStore()
+
+# Perceptual hashes of license and degree images for near-duplicate detection
+# (PHASH_INDEX_PATH). Every near hit within the search radius is confirmed
+# against its stored original, nearest first; same-template certificates
+# crowd that radius, so the cap is only a safety bound and cutting
+# candidates off is logged
+phash_index = PerceptualHashIndex()
+PHASH_CONFIRM_CANDIDATES = int(os.getenv('PHASH_CONFIRM_CANDIDATES', 25))
+# Stored originals of recent candidates, decoded once at matching scale;
+# blobs are content-addressed, so a cached page never goes stale
+PHASH_CANDIDATE_CACHE = int(os.getenv('PHASH_CANDIDATE_CACHE', 16))
+_candidate_pages = OrderedDict()
+_candidate_pages_lock = threading.Lock()
+
+# Sanitized request shapes for load-test replay (TRAFFIC_RECORD_PATH)
+traffic_recorder = TrafficRecorder()
+RECORDED_ROUTES = ('/api/verify-doctor', '/api/verify-doctor-original')
+
+# Highest confidence for a page triage flagged as a likely screen capture;
+# below the 0.9 needed for 'verified', so a person looks at it
+SCREENSHOT_MAX_CONFIDENCE = 0.85
+
+# Bearer token required by the admin result endpoints. Without one they
+# refuse every request, unless ADMIN_API_OPEN=1 opts into serving them
+# unauthenticated (local development only)
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
+ADMIN_API_OPEN = os.getenv('ADMIN_API_OPEN', '0') == '1'
+if not ADMIN_API_TOKEN:
+    if ADMIN_API_OPEN:
+        logger.warning("ADMIN_API_OPEN is set; admin result endpoints are served without authentication")
+    else:
+        logger.info("ADMIN_API_TOKEN is not set; admin result endpoints are disabled")
+
+# Verification summaries are written to MongoDB in the background when a
+# database is configured (MONGO_PERSIST=0 disables it)
+MONGO_PERSIST = os.getenv('MONGO_PERSIST', '1' if os.getenv('MONGO_URI') else '0') != '0' \
+    and module_available('pymongo')
+_verification_writer = None
+_verification_writer_lock = threading.Lock()
+
+def ocr_fingerprint(keywords):
+    """Fingerprint of the settings a cached OCR result depends on"""
+    # Triage turns rotated pages upright before OCR
+    return settings_fingerprint(keywords, PREPROCESS_PROFILE, ocr_engine_settings(), triage_settings())
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def preprocess_image(image_path):
-    """Preprocess image for better OCR results"""
+def decode_image(data):
+    """Decode uploaded image bytes into a grayscale array without touching disk"""
+    if not ADVANCED_FEATURES or not data:
+        return None
+        
+    return decode_image_bytes(data, PREPROCESS_PROFILE)
+
+def preprocess_array(img):
+    """Preprocess a decoded image array for better OCR results"""
+    return preprocess_gray(img, PREPROCESS_PROFILE)
+
+def triage_page(img, report=None, load_color=None):
+    """
+    Run the cheap pre-OCR checks on a decoded page and turn it upright
+    
+    Parameters:
+    - img: Decoded grayscale page
+    - report: Optional dict updated with the triage report
+    - load_color: Optional callable returning the page in colour, used
+      only to recognize screenshots
+    
+    Returns:
+    - The page, rotated upright if it was turned; screenshots are returned
+      for OCR like any other page, with the verdict left in the report
+    
+    Raises:
+    - TriageRejectedError if the page is blank or blurred
+    """
+    if not TRIAGE_ENABLED:
+        return img
+        
+    with stage('triage'):
+        outcome = triage_image(img, load_color)
+    if report is not None:
+        report.update(outcome)
+    if outcome['verdict'] in REJECTED_VERDICTS:
+        logger.info(f"Triage skipped OCR: {outcome['reason']}")
+        raise TriageRejectedError(outcome)
+    if outcome['reason']:
+        logger.info(f"Triage flagged page: {outcome['reason']}")
+    if outcome['rotation']:
+        logger.info(f"Turning page rotated by {outcome['rotation']} degrees upright")
+    return rotate_upright(img, outcome['rotation'])
+
+def preprocess_image(image_path, triage_report=None, img=None):
+    """Preprocess image for better OCR results, reusing the decoded page if given"""
     if not ADVANCED_FEATURES:
         return None
         
     try:
-        # Load image
-        img = cv2.imread(image_path)
+        # Load image, decoding at reduced scale where the format allows it
+        if img is None:
+            with stage('decode'):
+                img = load_image_file(image_path, PREPROCESS_PROFILE)
         if img is None:
             logger.warning(f"Could not read image: {image_path}")
             return None
             
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply thresholding
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Apply noise removal
-        denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
-        
-        # Save preprocessed image temporarily
-        temp_path = f"{image_path}_processed.jpg"
-        cv2.imwrite(temp_path, denoised)
+        img = triage_page(img, triage_report, lambda: load_color_file(image_path))
+            
+        with stage('preprocess'):
+            denoised = preprocess_array(img)
+            
+            # Save preprocessed image temporarily
+            temp_path = f"{image_path}_processed.jpg"
+            cv2.imwrite(temp_path, denoised)
         
         return temp_path
+    except TriageRejectedError:
+        raise
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         return None
 
-def extract_text_from_image(image_path):
-    """Extract text from image using OCR"""
+def clean_extracted_text(text):
+    """Normalize raw OCR output for keyword matching"""
+    text = text.strip().lower()
+    # Remove non-alphanumeric characters except for spaces
+    text = re.sub(r'[^\w\s]', ' ', text)
+    # Replace multiple spaces with a single space
+    text = re.sub(r'\s+', ' ', text)
+    logger.info(f"Extracted text sample: {text[:100]}...")
+    return text
+
+def extract_text_from_image(image_path, triage_report=None, img=None):
+    """
+    Extract text from image using OCR
+    
+    Parameters:
+    - image_path: Path to the image file
+    - triage_report: Optional dict filled in with the triage report
+    - img: Optional page already decoded by load_page(), so the file is
+      not decoded a second time
+    
+    Raises:
+    - TriageRejectedError if triage found the page not worth reading;
+      triage_report, if given, is filled in either way
+    """
     if not ADVANCED_FEATURES:
         return "OCR capability not available. Install pytesseract, pillow, and opencv-python."
         
+    processed_path = None
     try:
         # Preprocess image
-        processed_path = preprocess_image(image_path)
-        if processed_path is None:
-            # If preprocessing failed, use original image
-            processed_path = image_path
-            
-        # Extract text using Tesseract OCR
-        text = pytesseract.image_to_string(Image.open(processed_path))
+        processed_path = preprocess_image(image_path, triage_report, img)
         
-        # Clean up temp file if it exists
-        if processed_path != image_path and os.path.exists(processed_path):
+        # Extract text using Tesseract OCR, using the original image if preprocessing failed
+        with stage('ocr'):
+            text = get_ocr_engine().image_to_string(Image.open(processed_path or image_path))
+        return clean_extracted_text(text)
+    except TriageRejectedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting text from image: {str(e)}")
+        return ""
+    finally:
+        # Clean up temp file even when OCR fails
+        if processed_path and os.path.exists(processed_path):
             os.remove(processed_path)
+
+def extract_text_from_bytes(data, triage_report=None, img=None):
+    """
+    Extract text from uploaded image bytes using OCR, entirely in memory
+    
+    Parameters:
+    - data: Uploaded image bytes
+    - triage_report: Optional dict filled in with the triage report
+    - img: Optional page already decoded by load_page(), so the bytes are
+      not decoded a second time
+    
+    Raises:
+    - TriageRejectedError if triage found the page not worth reading;
+      triage_report, if given, is filled in either way
+    """
+    if not ADVANCED_FEATURES:
+        return "OCR capability not available. Install pytesseract, pillow, and opencv-python."
+        
+    try:
+        if img is None:
+            with stage('decode'):
+                img = decode_image(data)
+        if img is not None:
+            img = triage_page(img, triage_report, lambda: decode_color_bytes(data))
+            # The OCR engine accepts the denoised array directly
+            with stage('preprocess'):
+                ocr_input = preprocess_array(img)
+        else:
+            # If decoding failed, let PIL try the original bytes
+            logger.warning("Could not decode image bytes, using original upload")
+            ocr_input = Image.open(io.BytesIO(data))
             
-        # Clean up text
-        text = text.strip().lower()
-        # Remove non-alphanumeric characters except for spaces
-        text = re.sub(r'[^\w\s]', ' ', text)
-        # Replace multiple spaces with a single space
-        text = re.sub(r'\s+', ' ', text)
-        logger.info(f"Extracted text sample: {text[:100]}...")
-        
-        return text
+        with stage('ocr'):
+            text = get_ocr_engine().image_to_string(ocr_input)
+        return clean_extracted_text(text)
+    except TriageRejectedError:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text from image: {str(e)}")
         return ""
 
+@lru_cache(maxsize=32)
+def _keyword_engine_for(keywords):
+    return KeywordEngine({'keywords': list(keywords)})
+
 def calculate_keyword_matches(text, keywords):
     """Calculate keyword match percentage in extracted text"""
     if not text:
         return 0, []
         
-    text_words = set(text.lower().split())
-    matches = [keyword for keyword in keywords if keyword.lower() in text_words or keyword.lower() in text.lower()]
-    match_percentage = len(matches) / len(keywords) if keywords else 0
-    
-    return match_percentage, matches
+    with stage('keyword_scoring'):
+        scan = _keyword_engine_for(tuple(keywords)).scan(text)
+    return scan['scores']['keywords'], scan['matches']['keywords']
 
-def verify_document(filepath, document_type, doctor_data=None):
+def verify_document(filepath, document_type, doctor_data=None, content=None, content_hash=None,
+                    profile=False):
     """
     Enhanced document verification function
     
@@ -141,18 +342,137 @@ def verify_document(filepath, document_type, doctor_data=None):
     - filepath: Path to the document file
     - document_type: Type of document (license, degree, etc.)
     - doctor_data: Additional doctor information for verification
+    - content: Optional document bytes; when given, OCR runs in memory
+      and filepath is only recorded as the location of the stored original
+    - content_hash: Optional SHA-256 of the document computed during upload
+    - profile: Whether to store a CPU and memory profile with the result
     
     Returns:
-    - Verification result with status and confidence
+    - Verification result with status and confidence, and the seconds
+      spent in each pipeline stage under 'stage_timings'
+    """
+    # Stage timings travel back with the result, since this may run in a
+    # document worker process whose metrics are never scraped
+    profiler = None
+    with collect_stages() as timings:
+        if profile:
+            with RequestProfile() as profiler:
+                result = _verify_document(filepath, document_type, doctor_data, content, content_hash)
+        else:
+            result = _verify_document(filepath, document_type, doctor_data, content, content_hash)
+    result['stage_timings'] = timings
+    if profiler is not None:
+        save_profile(result, profiler)
+    return result
+
+def load_page(filepath, content=None):
+    """
+    Decode a document image to a grayscale array, or None if it is not an image
+    
+    The page is decoded as OCR preprocessing would, so duplicate detection
+    and extract_text_from_bytes/extract_text_from_image share one decode.
+    """
+    try:
+        with stage('decode'):
+            if content is not None:
+                return decode_image(content)
+            return load_image_file(filepath, PREPROCESS_PROFILE)
+    except Exception as e:
+        logger.warning(f"Could not decode {filepath} for duplicate detection: {str(e)}")
+        return None
+
+def candidate_page(content_hash):
     """
+    Stored original of a duplicate candidate at matching scale, or None
+    
+    Candidates are decoded at the reduced scale same_document() compares
+    them at, and the most recent ones are kept, since the same few
+    certificates come up as candidates again and again.
+    """
+    with _candidate_pages_lock:
+        if content_hash in _candidate_pages:
+            _candidate_pages.move_to_end(content_hash)
+            return _candidate_pages[content_hash]
+    # A missing blob is not cached; it may still be being written
+    path = blob_store.path_for(content_hash)
+    other = load_image_file(path, {'max_side': MATCH_SIDE}) if os.path.exists(path) else None
+    if other is None:
+        return None
+    other = match_view(other)
+    with _candidate_pages_lock:
+        _candidate_pages[content_hash] = other
+        while len(_candidate_pages) > PHASH_CANDIDATE_CACHE:
+            _candidate_pages.popitem(last=False)
+    return other
+
+def confirm_duplicate(page, content_hash):
+    """Check a near hit against its stored original, aligning the two pages"""
+    other = candidate_page(content_hash)
+    if other is None:
+        return False
+    same, difference = same_document(page, other)
+    logger.info(f"Near-duplicate candidate {content_hash[:12]}: "
+                f"{'confirmed' if same else 'rejected'} (difference {difference})")
+    return same
+
+def find_duplicates(page, content_hash):
+    """
+    Find earlier uploads of the same certificate
+    
+    Parameters:
+    - page: Decoded grayscale document image
+    - content_hash: SHA-256 of the document bytes
+    
+    Returns:
+    - Tuple of (perceptual hash, confirmed index matches nearest first);
+      identical bytes are confirmed without comparing images. The hash is
+      None for a page without ink. Candidates beyond the first
+      PHASH_CONFIRM_CANDIDATES are not compared, with a warning.
+    """
+    phash = perceptual_hash(page)
+    if phash is None:
+        return None, []
+    # Scaled once for all candidates rather than per comparison
+    page = match_view(page)
+    confirmed = []
+    checked = {}
+    skipped = set()
+    # Matches come nearest first, so a cut-off drops the farthest candidates
+    for match in phash_index.search(phash):
+        candidate = match['content_hash']
+        if candidate != content_hash and candidate not in checked:
+            if len(checked) >= PHASH_CONFIRM_CANDIDATES:
+                skipped.add(candidate)
+                continue
+            checked[candidate] = confirm_duplicate(page, candidate)
+        if candidate == content_hash or checked[candidate]:
+            confirmed.append(match)
+    if skipped:
+        logger.warning(f"Duplicate check of {content_hash[:12]} compared {len(checked)} candidates "
+                       f"and skipped {len(skipped)} more (PHASH_CONFIRM_CANDIDATES)")
+    return phash, confirmed
+
+def save_profile(result, profiler):
+    """Store a verification's profile next to its result and link it from the result"""
+    if not profiler.captured or 'result_id' not in result:
+        return
+    try:
+        summary = profiler.summary()
+        summary['stage_timings'] = {name: round(elapsed, 4) for name, elapsed in result['stage_timings'].items()}
+        result_store.put_profile(result['result_id'], summary, profiler.stats_bytes())
+        result['profile_url'] = f"/api/results/{result['result_id']}/profile"
+    except Exception as e:
+        logger.error(f"Error saving profile for result {result['result_id']}: {str(e)}")
+
+def _verify_document(filepath, document_type, doctor_data=None, content=None, content_hash=None):
     logger.info(f"Verifying {document_type} document: {filepath}")
     
-    # Create result file path
+    # Create result ID
     result_id = str(uuid.uuid4())
-    result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{result_id}_{document_type}.json")
     
     # Select keywords based on document type
-    keywords = LICENSE_KEYWORDS if document_type == 'license' else DEGREE_KEYWORDS
+    keyword_set = 'license' if document_type == 'license' else 'degree'
+    keywords = LICENSE_KEYWORDS if keyword_set == 'license' else DEGREE_KEYWORDS
     
     # Basic verification - always return pending_review
     basic_result = {
@@ -168,14 +488,61 @@ def verify_document(filepath, document_type, doctor_data=None):
         return basic_result
     
     try:
-        # Extract text from document
-        extracted_text = extract_text_from_image(filepath)
+        # Reuse OCR output when the same bytes were seen before
+        if content_hash is None:
+            content_hash = hash_bytes(content) if content is not None else hash_file(filepath)
+        fingerprint = ocr_fingerprint(keywords)
+        extracted_text = ocr_cache.get(content_hash, fingerprint, namespace=document_type)
+        cache_hit = extracted_text is not None
+        triage_report = {}
         
-        # Check for presence of keywords
-        match_percentage, matches = calculate_keyword_matches(extracted_text, keywords)
+        # Earlier uploads of the same certificate, re-photographed or re-encoded
+        phash, duplicates, reused_from, page = None, [], None, None
+        if phash_index.enabled:
+            # Decoded once here and handed to OCR below
+            page = load_page(filepath, content)
+            if page is not None:
+                with stage('duplicate_check'):
+                    phash, duplicates = find_duplicates(page, content_hash)
+            
+        if not cache_hit:
+            # A confirmed duplicate that was already read shares its OCR output
+            for match in duplicates:
+                if match['content_hash'] != content_hash and match['document_type'] == document_type:
+                    extracted_text = ocr_cache.get(match['content_hash'], fingerprint, namespace=document_type)
+                    if extracted_text is not None:
+                        reused_from = match['result_id']
+                        logger.info(f"Reusing OCR output of near-duplicate result {reused_from}")
+                        ocr_cache.put(content_hash, fingerprint, extracted_text, namespace=document_type)
+                        break
+            
+        if extracted_text is None:
+            # Extract text from document, unless triage finds it not worth reading
+            try:
+                if content is not None:
+                    extracted_text = extract_text_from_bytes(content, triage_report, page)
+                else:
+                    extracted_text = extract_text_from_image(filepath, triage_report, page)
+                ocr_cache.put(content_hash, fingerprint, extracted_text, namespace=document_type)
+            except TriageRejectedError:
+                extracted_text = ''
+        
+        # Check for presence of keywords, scoring license and degree keywords
+        # in one pass to catch documents uploaded into the wrong slot
+        with stage('keyword_scoring'):
+            scan = keyword_engine.scan(extracted_text)
+        match_percentage = scan['scores'][keyword_set]
+        matches = scan['matches'][keyword_set]
+        detected_type, type_mismatch = KeywordEngine.type_check(scan, keyword_set)
+        if type_mismatch:
+            logger.warning(f"Document uploaded as {document_type} looks like a {detected_type}")
         
         # Calculate confidence based on match percentage
         confidence = min(0.3 + match_percentage * 0.7, 0.95)  # Max 95% confidence
+        # Born-digital certificates look like screenshots too, so the verdict
+        # only keeps the document from being verified without review
+        if triage_report.get('verdict') == 'screenshot':
+            confidence = min(confidence, SCREENSHOT_MAX_CONFIDENCE)
         
         # Determine status based on confidence
         if confidence >= 0.9:
@@ -191,6 +558,21 @@ def verify_document(filepath, document_type, doctor_data=None):
             status = 'suspicious'
             method = 'ai_ocr'
         
+        # Blank and blurred pages need a new upload
+        if triage_report.get('verdict') in REJECTED_VERDICTS:
+            status = 'rejected'
+            confidence = 0.0
+            method = 'triage'
+        
+        # One certificate uploaded by several accounts is a fraud signal
+        email = (doctor_data.get('email') or '').lower() if doctor_data else ''
+        cross_account = bool(email) and any(match['email'] and match['email'] != email
+                                            for match in duplicates)
+        if cross_account:
+            logger.warning(f"{document_type.title()} {result_id} matches a document uploaded by another account")
+            status = 'suspicious'
+            confidence = min(confidence, 0.3)
+        
         # Save analysis results to file
         result = {
             'status': status,
@@ -199,15 +581,44 @@ def verify_document(filepath, document_type, doctor_data=None):
             'document_type': document_type,
             'keyword_matches': matches,
             'match_percentage': round(match_percentage, 2),
+            'type_scores': {name: round(score, 2) for name, score in scan['scores'].items()},
+            'detected_type': detected_type,
+            'possible_type_mismatch': type_mismatch,
             'extracted_text': extracted_text[:500],  # First 500 chars
             'doctor_name': doctor_data.get('name', '') if doctor_data else '',
             'document_path': filepath,
+            'content_hash': content_hash,
+            'ocr_cache_hit': cache_hit,
             'result_id': result_id
         }
+        if triage_report:
+            result['triage'] = triage_report
+        if phash is not None:
+            result['perceptual_hash'] = f"{phash:016x}"
+            result['cross_account_reuse'] = cross_account
+            # Other accounts' emails stay out of the response
+            result['duplicates'] = [{
+                'result_id': match['result_id'],
+                'distance': match['distance'],
+                'same_account': match['email'] == (email or None)
+            } for match in duplicates[:5]]
+        if reused_from:
+            result['ocr_reused_from'] = reused_from
+        
+        # Save result to the result store
+        try:
+            with stage('persistence'):
+                result_store.put(result, email=doctor_data.get('email') if doctor_data else None)
+        except Exception as e:
+            logger.error(f"Error saving verification result {result_id}: {str(e)}")
         
-        # Save result to file
-        with open(result_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        # Index the document unless triage found it unreadable
+        if phash is not None and method != 'triage':
+            try:
+                with stage('persistence'):
+                    phash_index.add(phash, content_hash, result_id, email, document_type)
+            except Exception as e:
+                logger.error(f"Error indexing perceptual hash for {result_id}: {str(e)}")
         
         # Return verification result
         return result
@@ -219,6 +630,198 @@ def verify_document(filepath, document_type, doctor_data=None):
         basic_result['error'] = str(e)
         return basic_result
 
+# Background writer for uploaded originals kept for admin review
+persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='persist')
+
+# Bounded worker pool for asynchronous verification requests
+job_manager = JobManager()
+
+# Engines loaded by a background thread at startup and reported by /api/ready
+warmup = Warmup()
+warmup.register('imaging', lambda: preload(cv2, Image), enabled=ADVANCED_FEATURES)
+warmup.register('ocr', lambda: get_ocr_engine().warm_up(), enabled=ADVANCED_FEATURES)
+if os.getenv('WARMUP_ON_START', '1') != '0':
+    warmup.start()
+
+def warm_document_worker():
+    """Load the OCR engine of a new document worker process before its first document"""
+    if not ADVANCED_FEATURES:
+        return
+    try:
+        # A worker verifies one document at a time, so one instance is enough
+        get_ocr_engine().warm_up(count=1)
+    except Exception as e:
+        logger.warning(f"OCR warm-up failed in document worker {os.getpid()}: {str(e)}")
+
+# Worker processes that run OCR for documents in parallel across cores
+document_pool = DocumentProcessPool(initializer=warm_document_worker)
+
+# Request, document and queue metrics served at /metrics; pipeline stage
+# latencies are recorded by the stage() timers
+REQUEST_SECONDS = metrics_registry.histogram(
+    'docverify_request_seconds', 'HTTP request latency', labels=('endpoint', 'method', 'code')
+)
+REQUESTS_IN_FLIGHT = metrics_registry.gauge(
+    'docverify_requests_in_flight', 'HTTP requests being handled'
+)
+DOCUMENTS_IN_FLIGHT = metrics_registry.gauge(
+    'docverify_documents_in_flight', 'Documents being verified'
+)
+DOCUMENTS_TOTAL = metrics_registry.counter(
+    'docverify_documents_total', 'Verified documents by document type and result status',
+    labels=('document_type', 'status')
+)
+metrics_registry.gauge_callback(
+    'docverify_jobs_queued', 'Asynchronous verification jobs waiting for a worker',
+    lambda: job_manager.count('queued')
+)
+metrics_registry.gauge_callback(
+    'docverify_jobs_running', 'Asynchronous verification jobs being processed',
+    lambda: job_manager.count('running')
+)
+metrics_registry.gauge_callback(
+    'docverify_write_behind_pending', 'Verification records waiting to be written to MongoDB',
+    lambda: _verification_writer.pending() if _verification_writer is not None else 0
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.request_arrived = time.time()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def remember_status_code(response):
+    g.status_code = response.status_code
+    return response
+
+@app.after_request
+def record_traffic(response):
+    if traffic_recorder.enabled and request.method == 'POST' and request.path in RECORDED_ROUTES:
+        traffic_recorder.record(request.path, request.files, response.status_code,
+                                is_async=wants_async(), arrived_at=g.get('request_arrived'))
+    return response
+
+@app.teardown_request
+def record_request(error=None):
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    # Label by route pattern so result and job IDs do not create new series
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    code = g.pop('status_code', 500)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                            method=request.method, code=str(code))
+
+def verify_documents_parallel(documents, doctor_data, progress=None, fallback=None, profile=False):
+    """
+    Verify several documents in parallel on the document process pool
+    
+    Parameters:
+    - documents: List of (document_type, filepath, content, content_hash) tuples
+    - doctor_data: Additional doctor information for verification
+    - progress: Optional callback invoked after each document
+    - fallback: Optional dict used as the result of a failed document
+    - profile: Whether to profile the verification of each document
+    
+    Returns:
+    - Dictionary of results keyed by document type, in input order
+    """
+    calls = [{
+        'filepath': filepath,
+        'document_type': document_type,
+        'doctor_data': doctor_data,
+        'content': content,
+        'content_hash': content_hash,
+        'profile': profile
+    } for document_type, filepath, content, content_hash in documents]
+    
+    def on_error(call, error):
+        logger.error(f"Advanced verification failed for {call['document_type']}: {str(error)}")
+        result = dict(fallback) if fallback else {
+            'status': 'pending_review',
+            'confidence': 0.5,
+            'method': 'basic',
+            'document_type': call['document_type']
+        }
+        result['error'] = str(error)
+        return result
+    
+    DOCUMENTS_IN_FLIGHT.inc(len(calls))
+    try:
+        results = document_pool.run(verify_document, calls, on_error, on_done=progress)
+    finally:
+        DOCUMENTS_IN_FLIGHT.dec(len(calls))
+    for call, result in zip(calls, results):
+        timings = result.get('stage_timings')
+        if timings:
+            observe_stages(timings)
+            result['stage_timings'] = {name: round(elapsed, 4) for name, elapsed in timings.items()}
+        DOCUMENTS_TOTAL.inc(document_type=call['document_type'], status=result.get('status', 'unknown'))
+    return {call['document_type']: result for call, result in zip(calls, results)}
+
+def link_upload(content_hash, filepath, review_path=None):
+    """Link the upload name and the admin review copy to a stored blob"""
+    blob_store.link(content_hash, filepath)
+    if review_path:
+        blob_store.link(content_hash, review_path)
+
+def write_upload(content, content_hash, filepath, review_path=None):
+    """Store an uploaded original once, linking its upload and review names to it"""
+    try:
+        with stage('upload_store'):
+            blob_store.put_bytes(content_hash, content)
+            link_upload(content_hash, filepath, review_path)
+    except Exception as e:
+        logger.error(f"Error persisting upload {filepath}: {str(e)}")
+
+def store_upload(file, review=False):
+    """
+    Store an uploaded file under a unique name
+    
+    The content is stored once in the blob store, keyed by its hash; the
+    unique upload name and the review copy are hardlinks to that blob.
+    
+    Parameters:
+    - file: Uploaded werkzeug FileStorage
+    - review: Whether to keep a copy in the review folder for admin review
+    
+    Returns:
+    - Tuple of (filepath, content, content_hash); content holds the uploaded
+      bytes when the in-memory pipeline is enabled and None otherwise
+    
+    Raises:
+    - UploadRejectedError if the upload failed content validation
+    """
+    # Hash, magic bytes and dimensions were checked while the upload streamed in
+    spool = inspect_upload(file)
+    
+    filename = secure_filename(file.filename)
+    unique_filename = f"{uuid.uuid4()}_{filename}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    review_path = os.path.join(app.config['REVIEW_FOLDER'], unique_filename) if review else None
+    in_memory = app.config['IN_MEMORY_PIPELINE']
+    content_hash = spool.sha256
+    
+    if in_memory and not spool.on_disk:
+        content = spool.getvalue()
+        persist_executor.submit(write_upload, content, content_hash, filepath, review_path)
+        return filepath, content, content_hash
+    
+    # Uploads spooled to disk are renamed into the blob store rather than copied
+    with stage('upload_store'):
+        blob_store.put(content_hash, spool.persist)
+        link_upload(content_hash, filepath, review_path)
+    return filepath, spool.getvalue() if in_memory else None, content_hash
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Answer bodies over the upload limit with 413 instead of a verification result"""
+    limit = request.max_content_length
+    message = f"Upload is larger than {limit // (1024 * 1024)}MB" if limit else str(e)
+    return jsonify({'success': False, 'error': message}), 413
+
 # Root endpoint for basic connectivity testing
 @app.route('/', methods=['GET'])
 def root():
@@ -228,8 +831,13 @@ def root():
         'message': 'Welcome to the Hospital AI Service API',
         'endpoints': {
             'health': '/api/health',
+            'ready': '/api/ready',
             'verify': '/api/verify-doctor',
             'original': '/api/verify-doctor-original',
+            'batch': '/api/verify-batch',
+            'jobs': '/api/verify-jobs/<job_id>',
+            'results': '/api/results',
+            'metrics': '/metrics',
             'routes': '/api/routes',
             'test': '/test-files'
         }
@@ -270,6 +878,20 @@ def health_check():
             'error': str(e)
         }), 500
 
+# Readiness check endpoint
+@app.route('/api/ready', methods=['GET', 'OPTIONS'])
+def readiness_check():
+    """Report which engines are warm; 503 until warm-up has finished"""
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    ready, engines = warmup.status()
+    return jsonify({
+        'status': 'ready' if ready else 'warming_up',
+        'engines': engines
+    }), 200 if ready else 503
+
 # Route to list all available endpoints for debugging
 @app.route('/api/routes', methods=['GET', 'OPTIONS'])
 def list_routes():
@@ -314,6 +936,176 @@ def test_files():
     
     return jsonify(result)
 
+def get_verification_writer():
+    """Return the write-behind buffer feeding DBConnector, creating it on first use"""
+    global _verification_writer
+    with _verification_writer_lock:
+        if _verification_writer is None:
+            # Imported here so pymongo is only loaded when persistence is used
+            from db_connector import DBConnector, is_transient_error
+            db = DBConnector(ensure_indexes=False)
+            persist_executor.submit(db.ensure_indexes)
+            
+            def write_batch(docs):
+                with stage('database_write'):
+                    db.add_verification_requests(docs)
+            
+            _verification_writer = WriteBehindBuffer(write_batch, is_transient=is_transient_error)
+        return _verification_writer
+
+def persist_verification(doctor_data, summary):
+    """
+    Queue a verification summary for writing to MongoDB without waiting for it
+    
+    Returns:
+    - ID the verification request will be stored under, or None if
+      persistence is disabled or the record could not be queued
+    """
+    if not MONGO_PERSIST:
+        return None
+        
+    try:
+        from db_connector import DBConnector
+        verification_doc = DBConnector.build_verification_doc(doctor_data, {
+            'status': summary.get('status', 'pending_review'),
+            'message': summary.get('message', ''),
+            'verification_results': summary.get('verification_results', {})
+        })
+        if get_verification_writer().submit(verification_doc):
+            return str(verification_doc['_id'])
+    except Exception as e:
+        logger.error(f"Error queuing verification for persistence: {str(e)}")
+    return None
+
+def profile_requested():
+    """Check whether this verification should be profiled (admin X-Profile header or sampling)"""
+    if request.headers.get(PROFILE_HEADER) == '1':
+        # Profiling is expensive, so the header needs a real token even
+        # when the admin endpoints are open
+        if admin_authorized(allow_open=False):
+            return True
+        logger.warning("Ignoring profiling request without admin authorization")
+    return profile_sampled()
+
+def wants_async():
+    """Check whether the client asked for asynchronous verification"""
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return True
+    # RFC 7240 preference header
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def queue_verification(func, *args, total_steps=1, **kwargs):
+    """Queue a verification job and build the 202 Accepted response"""
+    try:
+        job_id = job_manager.submit(func, *args, total_steps=total_steps, **kwargs)
+    except JobQueueFullError as e:
+        logger.warning(str(e))
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '30'}
+        
+    status_url = f"/api/verify-jobs/{job_id}"
+    return jsonify({
+        'success': True,
+        'status': 'queued',
+        'job_id': job_id,
+        'status_url': status_url,
+        'message': 'Documents received. Verification is running in the background.'
+    }), 202, {'Location': status_url}
+
+def overall_verification_status(verification_results):
+    """
+    Summarize per-document results into the status of the whole submission
+    
+    A suspicious document outranks everything else; otherwise any rejected
+    (blank, blurred or invalid) document means the doctor has to upload it
+    again, which review alone cannot fix.
+    
+    Parameters:
+    - verification_results: Dictionary of document type to verification result
+    
+    Returns:
+    - Tuple of ('verified', 'suspicious', 'resubmission_required' or
+      'pending_review', dict of document type to the reason it was rejected)
+    """
+    resubmission_reasons = {
+        document_type: result.get('error') or (result.get('triage') or {}).get('reason')
+        or 'Document could not be processed'
+        for document_type, result in verification_results.items()
+        if result.get('status') == 'rejected'
+    }
+    if all(result.get('status') == 'verified' for result in verification_results.values()):
+        return 'verified', resubmission_reasons
+    if any(result.get('status') == 'suspicious' for result in verification_results.values()):
+        return 'suspicious', resubmission_reasons
+    if resubmission_reasons:
+        return 'resubmission_required', resubmission_reasons
+    return 'pending_review', resubmission_reasons
+
+def resubmission_message(resubmission_reasons):
+    """Tell the doctor which documents to upload again and why"""
+    details = '; '.join(f"{document_type}: {reason}" for document_type, reason in resubmission_reasons.items())
+    return f"Some documents could not be used and must be uploaded again ({details})."
+
+def run_simplified_verification(documents, doctor_data, files_received, rejected=None, progress=None,
+                                profile=False):
+    """
+    Verify uploaded documents for the simplified endpoint
+    
+    Parameters:
+    - documents: List of (document_type, filepath, content, content_hash) tuples
+    - doctor_data: Doctor name and email
+    - files_received: Whether any file was uploaded
+    - rejected: Optional dict of document type to the reason its upload was rejected
+    - progress: Optional callback invoked after each document
+    - profile: Whether to profile the verification of each document
+    
+    Returns:
+    - Response payload with verification results
+    """
+    # Try advanced verification if features are available
+    placeholder = {
+        'status': 'pending_review',
+        'confidence': 0.6,
+        'method': 'basic'
+    }
+    if ADVANCED_FEATURES:
+        verification_results = verify_documents_parallel(documents, doctor_data, progress,
+                                                         fallback=placeholder, profile=profile)
+    else:
+        verification_results = {}
+        for document_type, _, _, _ in documents:
+            verification_results[document_type] = dict(placeholder)
+            if progress:
+                progress()
+    
+    # Rejected uploads never reach OCR
+    for document_type, reason in (rejected or {}).items():
+        verification_results[document_type] = {
+            'status': 'rejected',
+            'confidence': 0.0,
+            'method': 'ingestion',
+            'error': reason
+        }
+        DOCUMENTS_TOTAL.inc(document_type=document_type, status='rejected')
+            
+    response = {
+        'success': True,
+        'status': 'pending_review',
+        'message': 'Documents received and analyzed. Pending final review.',
+        'files_received': files_received,
+        'verification_results': verification_results
+    }
+    # Unusable documents are reported instead of silently queued for review
+    _, resubmission_reasons = overall_verification_status(verification_results)
+    if resubmission_reasons:
+        response['status'] = 'resubmission_required'
+        response['message'] = resubmission_message(resubmission_reasons)
+        response['resubmission_reasons'] = resubmission_reasons
+    
+    verification_id = persist_verification(doctor_data, response)
+    if verification_id:
+        response['verification_id'] = verification_id
+    return response
+
 # Enhanced verification endpoint
 @app.route('/api/verify-doctor', methods=['POST', 'OPTIONS'])
 def verify_doctor_simplified():
@@ -329,79 +1121,27 @@ def verify_doctor_simplified():
         logger.info(f"Request form data keys: {list(request.form.keys())}")
         logger.info(f"Request files keys: {list(request.files.keys()) if request.files else 'No files'}")
         
-        # Process files if they exist
-        verification_results = {}
-        files_received = False
+        doctor_data = {
+            'name': request.form.get('name', ''),
+            'email': request.form.get('email', '')
+        }
         
-        # Process license file
-        if 'license' in request.files:
-            file = request.files['license']
-            if file and file.filename:
-                files_received = True
-                logger.info(f"Processing license file: {file.filename}")
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-                
-                # Perform verification
-                verification_results['license'] = {
-                    'status': 'pending_review',
-                    'confidence': 0.6,
-                    'method': 'basic'
-                }
-                
-                # Try advanced verification if features are available
-                if ADVANCED_FEATURES:
-                    try:
-                        logger.info(f"Performing advanced verification on license")
-                        doctor_data = {
-                            'name': request.form.get('name', ''),
-                            'email': request.form.get('email', '')
-                        }
-                        verification_result = verify_document(
-                            filepath, 
-                            document_type='license',
-                            doctor_data=doctor_data
-                        )
-                        verification_results['license'] = verification_result
-                    except Exception as e:
-                        logger.error(f"Advanced verification failed for license: {str(e)}")
-        
-        # Process degree file
-        if 'degree' in request.files:
-            file = request.files['degree']
-            if file and file.filename:
-                files_received = True
-                logger.info(f"Processing degree file: {file.filename}")
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-                
-                # Perform verification
-                verification_results['degree'] = {
-                    'status': 'pending_review',
-                    'confidence': 0.6,
-                    'method': 'basic'
-                }
-                
-                # Try advanced verification if features are available
-                if ADVANCED_FEATURES:
+        # Store license and degree files if they exist
+        documents = []
+        rejected = {}
+        files_received = False
+        for document_type in ['license', 'degree']:
+            if document_type in request.files:
+                file = request.files[document_type]
+                if file and file.filename:
+                    files_received = True
+                    logger.info(f"Processing {document_type} file: {file.filename}")
                     try:
-                        logger.info(f"Performing advanced verification on degree")
-                        doctor_data = {
-                            'name': request.form.get('name', ''),
-                            'email': request.form.get('email', '')
-                        }
-                        verification_result = verify_document(
-                            filepath, 
-                            document_type='degree',
-                            doctor_data=doctor_data
-                        )
-                        verification_results['degree'] = verification_result
-                    except Exception as e:
-                        logger.error(f"Advanced verification failed for degree: {str(e)}")
+                        filepath, content, content_hash = store_upload(file)
+                    except UploadRejectedError as e:
+                        rejected[document_type] = str(e)
+                        continue
+                    documents.append((document_type, filepath, content, content_hash))
                         
         # Process profile photo if needed
         if 'profile_photo' in request.files:
@@ -410,23 +1150,26 @@ def verify_doctor_simplified():
                 files_received = True
                 logger.info(f"Received profile photo: {file.filename}")
                 # Save profile photo for reference
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
+                try:
+                    store_upload(file)
+                except UploadRejectedError as e:
+                    logger.warning(f"Profile photo not stored: {str(e)}")
         
         # Create response
         if not files_received:
             logger.warning("No files were received in the request")
             
+        profile = profile_requested()
+        if wants_async():
+            return queue_verification(run_simplified_verification, documents, doctor_data,
+                                      files_received, rejected, total_steps=len(documents),
+                                      profile=profile)
+            
         # Return a success response with verification results
-        return jsonify({
-            'success': True,
-            'status': 'pending_review',
-            'message': 'Documents received and analyzed. Pending final review.',
-            'files_received': files_received,
-            'verification_results': verification_results
-        })
+        return jsonify(run_simplified_verification(documents, doctor_data, files_received, rejected,
+                                                   profile=profile))
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error in simplified verification: {str(e)}")
         logger.error(traceback.format_exc())
@@ -450,6 +1193,46 @@ def verify_doctor_simplified():
             }
         })
 
+def run_full_verification(documents, doctor_data, progress=None, profile=False):
+    """
+    Verify credentials for the original endpoint and summarize the outcome
+    
+    Parameters:
+    - documents: List of (document_type, filepath, content, content_hash) tuples
+    - doctor_data: Doctor information from the form
+    - progress: Optional callback invoked after each document
+    - profile: Whether to profile the verification of each document
+    
+    Returns:
+    - Verification summary with per-document results and overall status
+    """
+    # Verify documents in parallel
+    verification_results = verify_documents_parallel(documents, doctor_data, progress, profile=profile)
+    for document_type, verification_result in verification_results.items():
+        logger.info(f"{document_type.title()} verification result: {verification_result['status']}")
+    
+    # Determine overall verification status
+    overall_status, resubmission_reasons = overall_verification_status(verification_results)
+    
+    # Prepare verification summary
+    verification_summary = {
+        'success': True,
+        'doctor_data': doctor_data,
+        'verification_results': verification_results,
+        'status': overall_status,
+        'message': 'Documents have been analyzed using AI technology and are now ready for review.' 
+    }
+    if resubmission_reasons:
+        verification_summary['message'] = resubmission_message(resubmission_reasons)
+        verification_summary['resubmission_reasons'] = resubmission_reasons
+    
+    verification_id = persist_verification(doctor_data, verification_summary)
+    if verification_id:
+        verification_summary['verification_id'] = verification_id
+    
+    logger.info(f"Verification complete. Status: {verification_summary['status']}")
+    return verification_summary
+
 # Original verification endpoint - keep for future use once simplified endpoint is working
 @app.route('/api/verify-doctor-original', methods=['POST', 'OPTIONS'])
 def verify_doctor_documents():
@@ -462,6 +1245,9 @@ def verify_doctor_documents():
     - license: medical license document (file)
     - degree: medical degree document (file)
     - profile_photo: profile photo (file)
+    
+    Pass ?async=1 or a "Prefer: respond-async" header to get a job ID
+    back immediately instead of waiting for the analysis.
     """
     # Handle OPTIONS request for CORS preflight
     if request.method == 'OPTIONS':
@@ -487,7 +1273,7 @@ def verify_doctor_documents():
         
         # Process files
         files_data = {}
-        verification_results = {}
+        documents = []
         
         # Check if files exist in the request
         if not request.files:
@@ -504,54 +1290,32 @@ def verify_doctor_documents():
                 continue
                 
             if file and allowed_file(file.filename):
-                # Generate unique filename
                 filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+                is_credential = file_type in ['license', 'degree']
                 
-                # Log file info
+                # Save file, keeping a copy for admin review if it's a credential
+                try:
+                    filepath, content, content_hash = store_upload(file, review=is_credential)
+                except UploadRejectedError as e:
+                    return jsonify({'success': False, 'error': f"Invalid {file_type} file: {str(e)}"}), 400
                 logger.info(f"Saving {file_type} file: {filename} to {filepath}")
-                
-                # Save file
-                file.save(filepath)
                 files_data[file_type] = {
                     'original_name': filename,
                     'path': filepath
                 }
                 
-                # Copy file for admin review if it's a credential
-                if file_type in ['license', 'degree']:
-                    review_copy = os.path.join(app.config['RESULTS_FOLDER'], unique_filename)
-                    shutil.copy2(filepath, review_copy)
-                    
-                    # Verify document
-                    verification_result = verify_document(
-                        filepath, 
-                        document_type=file_type,
-                        doctor_data=doctor_data
-                    )
-                    verification_results[file_type] = verification_result
-                    logger.info(f"{file_type.title()} verification result: {verification_result['status']}")
-        
-        # Determine overall verification status
-        overall_status = 'pending_review'
-        if all(result.get('status') == 'verified' for result in verification_results.values()):
-            overall_status = 'verified'
-        elif any(result.get('status') == 'suspicious' for result in verification_results.values()):
-            overall_status = 'suspicious'
-        
-        # Prepare verification summary
-        verification_summary = {
-            'success': True,
-            'doctor_data': doctor_data,
-            'verification_results': verification_results,
-            'status': overall_status,
-            'message': 'Documents have been analyzed using AI technology and are now ready for review.' 
-        }
+                if is_credential:
+                    documents.append((file_type, filepath, content, content_hash))
+        
+        profile = profile_requested()
+        if wants_async():
+            return queue_verification(run_full_verification, documents, doctor_data,
+                                      total_steps=len(documents), profile=profile)
         
-        logger.info(f"Verification complete. Status: {verification_summary['status']}")
-        return jsonify(verification_summary)
+        return jsonify(run_full_verification(documents, doctor_data, profile=profile))
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logger.error(f"Error processing verification request: {str(e)}")
         logger.error(traceback.format_exc())
@@ -561,6 +1325,210 @@ def verify_doctor_documents():
             'traceback': traceback.format_exc()
         }), 500
 
+def verify_batch_entry(entry):
+    """
+    Store and verify one doctor's documents from a batch
+
+    Parameters:
+    - entry: BatchEntry from the batch request
+
+    Returns:
+    - Response payload of the simplified endpoint for the doctor
+    """
+    with app.app_context():
+        documents = []
+        rejected = dict(entry.rejected)
+        files_received = bool(rejected)
+        for document_type, file in entry.open_files():
+            files_received = True
+            try:
+                filepath, content, content_hash = store_upload(file)
+            except UploadRejectedError as e:
+                rejected[document_type] = str(e)
+                continue
+            finally:
+                # Releases the decompressed archive member or the request spool
+                file.close()
+            documents.append((document_type, filepath, content, content_hash))
+        return run_simplified_verification(documents, entry.doctor_data, files_received, rejected)
+
+def stream_batch_results(entries):
+    """Verify batch entries and yield one NDJSON line per doctor, then a summary line"""
+    start = time.perf_counter()
+    counts = {'completed': 0, 'failed': 0}
+    for entry, result, error in fan_out(entries, verify_batch_entry):
+        line = {'type': 'result', 'index': entry.index, 'key': entry.key, 'doctor': entry.doctor_data}
+        if error is None:
+            counts['completed'] += 1
+            line.update(result)
+        else:
+            counts['failed'] += 1
+            line.update({'success': False, 'status': 'error', 'error': str(error)})
+        yield json.dumps(line) + '\n'
+    yield json.dumps({
+        'type': 'summary',
+        'doctors': len(entries),
+        'completed': counts['completed'],
+        'failed': counts['failed'],
+        'elapsed_seconds': round(time.perf_counter() - start, 3)
+    }) + '\n'
+
+# Batch verification endpoint
+@app.route('/api/verify-batch', methods=['POST', 'OPTIONS'])
+def verify_batch():
+    """
+    Verify many doctors' documents in one request
+    Expected form data, either:
+    - archive: ZIP file with one folder per doctor holding license.* and
+      degree.* documents and an optional doctor.json with name and email
+    or repeated groups:
+    - doctors[<key>][name], doctors[<key>][email]
+    - doctors[<key>][license], doctors[<key>][degree]: documents (files)
+
+    Results are streamed as newline-delimited JSON in completion order, one
+    line per doctor with its index and key, followed by a summary line.
+    """
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    try:
+        archive = request.files.get('archive')
+        if archive and archive.filename:
+            inspect_upload(archive)
+            entries = archive_entries(open_archive(archive.stream), app.config['MAX_CONTENT_LENGTH'])
+        else:
+            entries = form_entries(request.form, request.files)
+    except (BatchFormatError, UploadRejectedError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    logger.info(f"Received batch verification request for {len(entries)} doctors")
+    return Response(stream_with_context(stream_batch_results(entries)), mimetype='application/x-ndjson')
+
+# Verification job status endpoint
+@app.route('/api/verify-jobs/<job_id>', methods=['GET', 'OPTIONS'])
+def verification_job_status(job_id):
+    """Report progress and, once finished, the result of a verification job"""
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job ID'}), 404
+        
+    return jsonify(job)
+
+def admin_authorized(allow_open=True):
+    """
+    Check the admin bearer token
+
+    Parameters:
+    - allow_open: Whether ADMIN_API_OPEN may stand in for a missing token
+
+    Returns:
+    - True if the request carries ADMIN_API_TOKEN, or no token is configured
+      and the operator opted into open admin endpoints
+    """
+    if not ADMIN_API_TOKEN:
+        return allow_open and ADMIN_API_OPEN
+    supplied = request.headers.get('Authorization', '').encode()
+    return hmac.compare_digest(supplied, f"Bearer {ADMIN_API_TOKEN}".encode())
+
+# Admin listing of stored verification results
+@app.route('/api/results', methods=['GET', 'OPTIONS'])
+def list_results():
+    """
+    List stored verification results, newest first
+    
+    Query parameters:
+    - status: e.g. suspicious, for the admin review queue
+    - email: doctor email
+    - document_type: license or degree
+    - limit: page size (default 50, max 200)
+    - cursor: next_cursor from the previous page
+    """
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    if not admin_authorized():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        results, next_cursor = result_store.list(
+            status=request.args.get('status'),
+            email=request.args.get('email'),
+            document_type=request.args.get('document_type'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
+    return jsonify({
+        'success': True,
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
+# Admin lookup of a single verification result
+@app.route('/api/results/<result_id>', methods=['GET', 'OPTIONS'])
+def get_result(result_id):
+    """Return a stored verification result by ID"""
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    if not admin_authorized():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+    result = result_store.get(result_id)
+    if result is None:
+        return jsonify({'success': False, 'error': 'Unknown result ID'}), 404
+        
+    return jsonify(result)
+
+# Admin download of a profiled verification
+@app.route('/api/results/<result_id>/profile', methods=['GET', 'OPTIONS'])
+def get_result_profile(result_id):
+    """
+    Return the CPU and memory profile stored with a verification result
+    
+    Query parameters:
+    - format: json (default) for a summary of the slowest functions, or
+      pstats for the raw profile (open with snakeviz or pstats.Stats)
+    """
+    # Handle OPTIONS request for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+        
+    if not admin_authorized():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        
+    profile = result_store.get_profile(result_id)
+    if profile is None:
+        return jsonify({'success': False, 'error': 'No profile stored for this result'}), 404
+        
+    summary, stats = profile
+    if request.args.get('format') == 'pstats':
+        return Response(stats, mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename="{result_id}.prof"'})
+        
+    return jsonify({'success': True, 'result_id': result_id, 'profile': summary})
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Pipeline stage latencies, request latencies, document counts by status
+    and type, and queue depths in Prometheus text format
+
+    Under gunicorn the metrics of all live workers are merged (METRICS_DIR).
+    """
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 if __name__ == '__main__':
     logger.info("Starting Flask verification service on port 5001")
     logger.info(f"Advanced features: {'ENABLED' if ADVANCED_FEATURES else 'DISABLED'}")
@@ -589,4 +1557,6 @@ if __name__ == '__main__':
         --------------------------------------------------
         """)
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Development server; in production run pre-forked workers with
+    # gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(host='0.0.0.0', port=5001, debug=os.getenv('FLASK_DEBUG', '1') == '1')
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import logging
+from pymongo import AsyncMongoClient, DESCENDING
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from db_connector import (DBConnector, DOCTOR_INDEXES, DUPLICATE_KEY_ERROR, STATUS_PROJECTION,
+                          VERIFICATION_INDEXES, client_options)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class AsyncDBConnector:
+    """
+    Asyncio counterpart of DBConnector
+
+    Methods mirror DBConnector and must be awaited. The connection pool is
+    sized and timed out by the same MONGO_* settings (see client_options()),
+    so one event loop can keep up to maxPoolSize operations in flight without
+    a thread per call.
+    """
+
+    def __init__(self, client=None, **options):
+        """
+        Initialize the database client; no connection is made until first use
+
+        Parameters:
+        - client: Optional AsyncMongoClient (or compatible stand-in) to use
+          instead of connecting to MONGO_URI
+        - options: Client options overriding client_options(), e.g. maxPoolSize
+        """
+        mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+        db_name = os.getenv('DB_NAME', 'healthlink')
+
+        if client is None:
+            client = AsyncMongoClient(mongo_uri, **dict(client_options(), **options))
+        self.client = client
+        self.db = self.client[db_name]
+
+        # Define collections
+        self.doctors_collection = self.db['doctors']
+        self.verification_collection = self.db['verifications']
+
+    async def close(self):
+        """Close the client and its connection pool"""
+        await self.client.close()
+
+    async def ensure_indexes(self):
+        """
+        Create the indexes used by status and admin queries if they are missing
+
+        Returns:
+        - True if all indexes exist, False if creating them failed
+        """
+        try:
+            for keys, name in VERIFICATION_INDEXES:
+                await self.verification_collection.create_index(keys, name=name)
+            for keys, name in DOCTOR_INDEXES:
+                await self.doctors_collection.create_index(keys, name=name)
+            logger.info("MongoDB indexes are in place")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating MongoDB indexes: {str(e)}")
+            return False
+
+    async def add_doctor_verification_request(self, doctor_data, verification_results):
+        """
+        Add a new doctor verification request to the database
+
+        Returns:
+        - ID of inserted document
+        """
+        try:
+            verification_doc = DBConnector.build_verification_doc(doctor_data, verification_results)
+            result = await self.verification_collection.insert_one(verification_doc)
+            logger.info(f"Added verification request with ID: {result.inserted_id}")
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error adding verification request: {str(e)}")
+            raise
+
+    async def add_verification_requests(self, verification_docs):
+        """
+        Insert verification request documents in one unordered bulk write
+
+        Returns:
+        - Number of newly inserted documents
+        """
+        if not verification_docs:
+            return 0
+        try:
+            result = await self.verification_collection.insert_many(verification_docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            inserted = e.details.get('nInserted', 0)
+        logger.info(f"Added {inserted} verification requests in bulk")
+        return inserted
+
+    async def update_verification_status(self, verification_id, new_status, reviewer_notes=None):
+        """
+        Update the status of a verification request
+
+        Returns:
+        - True if update was successful, False otherwise
+        """
+        try:
+            result = await self.verification_collection.update_one(
+                {'_id': ObjectId(verification_id)},
+                DBConnector.build_status_update(new_status, reviewer_notes)
+            )
+            logger.info(f"Updated verification {verification_id} to status: {new_status}")
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"Error updating verification status: {str(e)}")
+            return False
+
+    async def get_verification_status(self, doctor_email=None, verification_id=None, projection=None):
+        """
+        Get the status of a verification request by doctor email or verification ID
+
+        Returns:
+        - Verification document or None if not found
+        """
+        try:
+            query = {}
+            if verification_id:
+                query['_id'] = ObjectId(verification_id)
+            elif doctor_email:
+                query['doctor_data.email'] = doctor_email
+            else:
+                return None
+
+            return await self.verification_collection.find_one(
+                query, projection, sort=[('timestamp.created_at', DESCENDING)]
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving verification status: {str(e)}")
+            return None
+
+    async def get_verification_statuses(self, doctor_emails=None, verification_ids=None,
+                                        projection=STATUS_PROJECTION):
+        """
+        Resolve the statuses of many verification requests in one round-trip
+
+        Returns:
+        - Dictionary keyed by email or ID (as given) of the matching documents
+        """
+        try:
+            if verification_ids:
+                object_ids = {}
+                for verification_id in verification_ids:
+                    try:
+                        object_ids[ObjectId(verification_id)] = verification_id
+                    except Exception:
+                        logger.warning(f"Skipping invalid verification ID: {verification_id}")
+                cursor = self.verification_collection.find({'_id': {'$in': list(object_ids)}}, projection)
+                return {object_ids[doc['_id']]: doc async for doc in cursor}
+
+            if doctor_emails:
+                pipeline = DBConnector.latest_by_email_pipeline(doctor_emails, projection)
+                cursor = await self.verification_collection.aggregate(pipeline)
+                return {doc['doctor_data']['email']: doc async for doc in cursor}
+
+            return {}
+        except Exception as e:
+            logger.error(f"Error retrieving verification statuses: {str(e)}")
+            return {}
+
+    async def add_verified_doctor(self, doctor_data, document_paths=None):
+        """
+        Add a new verified doctor to the database
+
+        Returns:
+        - ID of inserted doctor document
+        """
+        try:
+            result = await self.doctors_collection.insert_one(
+                DBConnector.build_doctor_doc(doctor_data, document_paths)
+            )
+            logger.info(f"Added verified doctor with ID: {result.inserted_id}")
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error adding verified doctor: {str(e)}")
+            raise
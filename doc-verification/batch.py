@@ -0,0 +1,233 @@
+"""
+Batch verification of many doctors' documents in one request
+
+A batch arrives either as a ZIP archive with one folder per doctor:
+
+    ayesha-khan/doctor.json      optional {"name": ..., "email": ...}
+    ayesha-khan/license.pdf
+    ayesha-khan/degree.jpg
+    imran-ali/license.png
+    ...
+
+or as repeated multipart groups, doctors[<key>][name], doctors[<key>][email],
+doctors[<key>][license] and doctors[<key>][degree]. Each doctor becomes a
+BatchEntry; fan_out() verifies at most BATCH_CONCURRENCY of them at a time
+and yields results as they complete, so memory stays bounded by the number
+of doctors in flight rather than the size of the batch.
+"""
+import os
+import re
+import json
+import logging
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from werkzeug.datastructures import FileStorage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Doctors accepted in one batch
+BATCH_MAX_DOCTORS = int(os.getenv('BATCH_MAX_DOCTORS', 500))
+# Doctors verified at the same time; their documents share the process pool
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', os.cpu_count() or 2))
+
+DOCUMENT_TYPES = ('license', 'degree')
+DOCTOR_FIELDS = ('name', 'email')
+# Largest doctor.json read from an archive
+DOCTOR_JSON_MAX_BYTES = 64 * 1024
+
+FORM_FIELD = re.compile(r'^doctors\[([^\]]+)\]\[(\w+)\]$')
+
+class BatchFormatError(ValueError):
+    """Raised when a batch request cannot be split into doctors"""
+
+class BatchEntry:
+    """One doctor's documents within a batch"""
+
+    def __init__(self, index, key, doctor_data, files, rejected=None):
+        """
+        Initialize the entry
+
+        Parameters:
+        - index: Position of the doctor in the batch
+        - key: Folder name or form group key identifying the doctor
+        - doctor_data: Doctor name and email
+        - files: Dictionary of document type to a callable returning the
+          document as a FileStorage, opened only when the doctor is verified
+        - rejected: Optional dict of document type to the reason it was rejected
+        """
+        self.index = index
+        self.key = key
+        self.doctor_data = doctor_data
+        self.files = files
+        self.rejected = rejected or {}
+
+    def open_files(self):
+        """Yield (document_type, FileStorage) for each document of the doctor"""
+        for document_type, opener in self.files.items():
+            yield document_type, opener()
+
+def form_entries(form, files):
+    """
+    Split a multipart batch into doctors
+
+    Parameters:
+    - form: Werkzeug MultiDict of form fields
+    - files: Werkzeug MultiDict of uploaded files
+
+    Returns:
+    - List of BatchEntry, in the order the groups first appear
+
+    Raises:
+    - BatchFormatError if there are no groups or too many
+    """
+    groups = {}
+    for source in (form, files):
+        for field, value in source.items(multi=True):
+            match = FORM_FIELD.match(field)
+            if not match:
+                continue
+            key, name = match.groups()
+            groups.setdefault(key, {})[name] = value
+
+    if not groups:
+        raise BatchFormatError("No doctors found; send doctors[<key>][license] and doctors[<key>][degree] files")
+    if len(groups) > BATCH_MAX_DOCTORS:
+        raise BatchFormatError(f"Batch has {len(groups)} doctors; at most {BATCH_MAX_DOCTORS} are allowed")
+
+    entries = []
+    for index, (key, group) in enumerate(groups.items()):
+        doctor_data = {field: str(group.get(field, '')) for field in DOCTOR_FIELDS}
+        documents, rejected = {}, {}
+        for document_type in DOCUMENT_TYPES:
+            file = group.get(document_type)
+            if not isinstance(file, FileStorage) or not file.filename:
+                continue
+            if getattr(file.stream, 'kind', None) == 'zip':
+                rejected[document_type] = "ZIP archives are only accepted as the batch archive"
+                continue
+            documents[document_type] = lambda file=file: file
+        entries.append(BatchEntry(index, key, doctor_data, documents, rejected))
+    return entries
+
+def _read_doctor_json(archive, info):
+    if info.file_size > DOCTOR_JSON_MAX_BYTES:
+        raise BatchFormatError(f"{info.filename} is larger than {DOCTOR_JSON_MAX_BYTES} bytes")
+    try:
+        data = json.loads(archive.read(info))
+    except ValueError as e:
+        raise BatchFormatError(f"{info.filename} is not valid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise BatchFormatError(f"{info.filename} must hold a JSON object")
+    return {field: str(data.get(field, '')) for field in DOCTOR_FIELDS}
+
+def archive_entries(archive, max_document_size=None):
+    """
+    Split a ZIP batch into doctors, one per top-level folder
+
+    Only the archive's central directory and the small doctor.json files
+    are read here; documents are decompressed when their doctor is verified.
+
+    Parameters:
+    - archive: Open zipfile.ZipFile
+    - max_document_size: Optional limit on a document's uncompressed size
+
+    Returns:
+    - List of BatchEntry, in folder name order
+
+    Raises:
+    - BatchFormatError if the archive holds no doctors or too many
+    """
+    folders = {}
+    for info in archive.infolist():
+        parts = info.filename.split('/')
+        if info.is_dir() or len(parts) != 2 or not parts[0] or parts[0].startswith(('.', '__MACOSX')):
+            continue
+        folder, name = parts
+        if name.startswith('.'):
+            continue
+        folders.setdefault(folder, []).append(info)
+
+    if not folders:
+        raise BatchFormatError("No doctors found; put each doctor's documents in their own folder")
+    if len(folders) > BATCH_MAX_DOCTORS:
+        raise BatchFormatError(f"Batch has {len(folders)} doctors; at most {BATCH_MAX_DOCTORS} are allowed")
+
+    def opener(info):
+        return lambda: FileStorage(stream=archive.open(info), filename=os.path.basename(info.filename))
+
+    entries = []
+    for index, folder in enumerate(sorted(folders)):
+        doctor_data = {'name': '', 'email': ''}
+        documents, rejected = {}, {}
+        for info in folders[folder]:
+            name = info.filename.split('/')[1].lower()
+            stem = name.rsplit('.', 1)[0]
+            if name == 'doctor.json':
+                doctor_data = _read_doctor_json(archive, info)
+            elif stem in DOCUMENT_TYPES:
+                if max_document_size and info.file_size > max_document_size:
+                    rejected[stem] = f"Document is larger than {max_document_size // (1024 * 1024)}MB"
+                else:
+                    documents[stem] = opener(info)
+        entries.append(BatchEntry(index, folder, doctor_data, documents, rejected))
+    return entries
+
+def open_archive(stream):
+    """
+    Open an uploaded ZIP batch
+
+    Raises:
+    - BatchFormatError if the upload is not a readable ZIP archive
+    """
+    try:
+        return zipfile.ZipFile(stream)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile) as e:
+        raise BatchFormatError(f"Archive could not be read: {str(e)}")
+
+def fan_out(entries, verify, concurrency=None):
+    """
+    Verify batch entries with bounded concurrency, in completion order
+
+    At most `concurrency` entries are submitted at a time; the next one is
+    only started when a running one finishes. Closing the generator (e.g.
+    when the client disconnects) cancels the entries not yet started.
+
+    Parameters:
+    - entries: Iterable of BatchEntry
+    - verify: Callable verifying one entry and returning its result
+    - concurrency: Entries in flight (defaults to BATCH_CONCURRENCY)
+
+    Yields:
+    - Tuples of (entry, result, error); error is the exception raised by
+      verify, in which case result is None
+    """
+    concurrency = max(1, concurrency or BATCH_CONCURRENCY)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    entries = iter(entries)
+    pending = {}
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                entry = next(entries, None)
+                if entry is None:
+                    exhausted = True
+                else:
+                    pending[executor.submit(verify, entry)] = entry
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = pending.pop(future)
+                try:
+                    yield entry, future.result(), None
+                except Exception as e:
+                    logger.error(f"Batch verification failed for {entry.key}: {str(e)}")
+                    yield entry, None, e
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
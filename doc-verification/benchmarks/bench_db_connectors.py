@@ -0,0 +1,127 @@
+"""
+Compare concurrent-request throughput of DBConnector and AsyncDBConnector
+
+Usage:
+    python benchmarks/bench_db_connectors.py --uri mongodb://localhost:27017
+        [--requests 2000] [--concurrency 1 16 64 256] [--pool-size 100]
+
+Each request is a status lookup by email followed by a status update, the
+pattern of an admin review action. The sync connector runs requests on a
+thread pool of the given concurrency; the async connector runs them as
+tasks on one event loop, bounded by a semaphore. Data is seeded into a
+scratch database that is dropped afterwards.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(mode, concurrency, latencies, wall):
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.mean(latencies), 2)
+    }
+
+def seed(db, doctors):
+    docs = [db.build_verification_doc({'name': f'Doctor {i}', 'email': f'doctor{i}@example.com'},
+                                      {'status': 'pending_review', 'verification_results': {}})
+            for i in range(doctors)]
+    db.add_verification_requests(docs)
+    return [str(doc['_id']) for doc in docs]
+
+def run_sync(db, emails, ids, requests, concurrency):
+    def request(i):
+        start = time.perf_counter()
+        db.get_verification_status(doctor_email=emails[i % len(emails)])
+        db.update_verification_status(ids[i % len(ids)], 'pending_review')
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(request, range(requests)))
+    return latencies, time.perf_counter() - start
+
+async def run_async(db, emails, ids, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await db.get_verification_status(doctor_email=emails[i % len(emails)])
+            await db.update_verification_status(ids[i % len(ids)], 'pending_review')
+            return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(request(i) for i in range(requests)))
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--doctors', type=int, default=500, help='Verification requests to seed')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 16, 64, 256])
+    parser.add_argument('--pool-size', type=int, default=100)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = args.uri
+    os.environ['DB_NAME'] = f"healthlink_bench_{random.randint(0, 1_000_000)}"
+    os.environ['MONGO_MAX_POOL_SIZE'] = str(args.pool_size)
+
+    from db_connector import DBConnector
+    from async_db_connector import AsyncDBConnector
+
+    sync_db = DBConnector()
+    ids = seed(sync_db, args.doctors)
+    emails = [f'doctor{i}@example.com' for i in range(args.doctors)]
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            latencies, wall = run_sync(sync_db, emails, ids, args.requests, concurrency)
+            results.append(summarize('sync', concurrency, latencies, wall))
+
+            async def measure():
+                async_db = AsyncDBConnector()
+                try:
+                    # Warm the pool so connection setup is not measured
+                    await async_db.get_verification_status(doctor_email=emails[0])
+                    return await run_async(async_db, emails, ids, args.requests, concurrency)
+                finally:
+                    await async_db.close()
+
+            latencies, wall = asyncio.run(measure())
+            results.append(summarize('async', concurrency, latencies, wall))
+    finally:
+        sync_db.client.drop_database(sync_db.db.name)
+        sync_db.client.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'mode':>6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for r in results:
+            print(f"{r['mode']:>6} {r['concurrency']:>5} {r['throughput_rps']:>9} "
+                  f"{r['p50_ms']:>8} {r['p99_ms']:>8}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
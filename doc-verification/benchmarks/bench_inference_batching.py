@@ -0,0 +1,107 @@
+"""
+Measure classifier throughput and latency with and without micro-batching
+
+Usage:
+    python benchmarks/bench_inference_batching.py [--clients 16] [--requests 8]
+        [--settings 1:0 4:2 8:5 16:5 32:10]
+
+Each setting is max_batch_size:max_wait_ms; 1:0 runs every text in its own
+forward pass. Concurrent clients each send requests back to back, like
+registrations arriving at once.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from verify_documents import DocVerifier
+from inference_scheduler import BatchScheduler
+
+WORDS = ('medical license practice doctor physician council board certificate '
+         'registration medicine university degree bachelor surgery college awarded').split()
+
+def synthetic_texts(count, seed=7):
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 400))) for _ in range(count)]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_setting(verifier, texts, clients, max_batch_size, max_wait_ms):
+    if max_batch_size <= 1:
+        score = lambda text: verifier.score_texts([text])[0]
+    else:
+        scheduler = BatchScheduler(verifier.score_texts, max_batch_size=max_batch_size,
+                                   max_wait_ms=max_wait_ms)
+        score = scheduler.score
+
+    latencies = []
+    lock = threading.Lock()
+    per_client = len(texts) // clients
+
+    def client(offset):
+        for text in texts[offset:offset + per_client]:
+            start = time.perf_counter()
+            score(text)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i * per_client,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        'max_batch_size': max_batch_size,
+        'max_wait_ms': max_wait_ms,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'mean_ms': round(statistics.mean(latencies), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=8, help='Requests per client')
+    parser.add_argument('--settings', nargs='*', default=['1:0', '4:2', '8:5', '16:5', '32:10'])
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    verifier = DocVerifier(batching=False)
+    if not verifier.model:
+        print("Classifier model could not be loaded")
+        return 1
+
+    texts = synthetic_texts(args.clients * args.requests)
+    verifier.score_texts(texts[:1])  # warm up
+
+    results = []
+    for setting in args.settings:
+        max_batch_size, max_wait_ms = setting.split(':')
+        results.append(run_setting(verifier, texts, args.clients, int(max_batch_size), float(max_wait_ms)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'batch':>5} {'wait ms':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for r in results:
+            print(f"{r['max_batch_size']:>5} {r['max_wait_ms']:>8} {r['throughput_rps']:>8} "
+                  f"{r['p50_ms']:>8} {r['p99_ms']:>8}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
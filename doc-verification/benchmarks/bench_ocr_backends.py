@@ -0,0 +1,109 @@
+"""
+Compare per-image OCR latency of the available OCR backends
+
+Usage:
+    python benchmarks/bench_ocr_backends.py [--iterations 20] [--images a.jpg b.png]
+
+Without --images a small synthetic certificate is rendered, which is the
+case where per-call startup cost of the tesseract CLI dominates.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from ocr_engine import OCR_BACKENDS, PYTESSERACT_AVAILABLE, TESSEROCR_AVAILABLE, create_ocr_engine
+
+def synthetic_certificate(width=900, height=600):
+    """Render a small grayscale certificate-like image"""
+    img = np.full((height, width), 255, dtype=np.uint8)
+    lines = [
+        'PAKISTAN MEDICAL AND DENTAL COUNCIL',
+        'LICENSE TO PRACTICE MEDICINE',
+        'This certifies that Dr. Jane Doe',
+        'is a registered medical practitioner',
+        'Registration Number 12345-P'
+    ]
+    for i, line in enumerate(lines):
+        cv2.putText(img, line, (40, 90 + i * 95), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return img
+
+def load_images(paths):
+    images = []
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        images.append(img)
+    return images
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def bench_backend(backend, images, iterations):
+    engine = create_ocr_engine(backend)
+
+    # First call includes loading language data
+    start = time.perf_counter()
+    engine.image_to_string(images[0])
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(iterations):
+        for img in images:
+            start = time.perf_counter()
+            engine.image_to_string(img)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'backend': backend,
+        'images': len(images),
+        'calls': len(timings),
+        'cold_ms': round(cold_ms, 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--images', nargs='*', default=[])
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else [synthetic_certificate()]
+    if not images:
+        print("No images to benchmark")
+        return 1
+
+    available = {'pytesseract': PYTESSERACT_AVAILABLE, 'tesserocr': TESSEROCR_AVAILABLE}
+    results = []
+    for backend in OCR_BACKENDS:
+        if not available[backend]:
+            print(f"Skipping {backend}: not installed")
+            continue
+        try:
+            results.append(bench_backend(backend, images, args.iterations))
+        except Exception as e:
+            print(f"Skipping {backend}: {str(e)}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'backend':<12} {'cold ms':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for r in results:
+            print(f"{r['backend']:<12} {r['cold_ms']:>9} {r['mean_ms']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
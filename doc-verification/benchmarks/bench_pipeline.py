@@ -0,0 +1,269 @@
+"""
+Benchmark the verification pipeline stage by stage on a synthetic corpus
+
+Usage:
+    python benchmarks/bench_pipeline.py [--corpus DIR] [--iterations 2] [--json]
+    python benchmarks/bench_pipeline.py --save-baseline pipeline-baseline.json
+    python benchmarks/bench_pipeline.py --compare pipeline-baseline.json [--tolerance 0.25]
+
+Benchmarks, each run on every suitable corpus document:
+- preprocess_image:               app.preprocess_image on image files
+- extract_text_from_image:        app.extract_text_from_image on image files
+- calculate_keyword_matches:      app.calculate_keyword_matches on the rendered text
+- app.verify_document:            from a file path
+- app.verify_document[bytes]:     from upload bytes, as the in-memory pipeline runs it
+- DocVerifier.verify_document:    images and multi-page scanned PDFs
+
+Time inside each call is split into the pipeline stages (decode, triage,
+duplicate_check, preprocess, ocr, keyword_scoring, model_inference,
+persistence) by the same stage() timers that feed /metrics. Without
+--corpus, a corpus is generated with benchmarks/corpus.py in a scratch
+directory. The OCR cache is disabled and results are written to a
+scratch result store, so every call does the full work.
+
+--compare exits with status 1 when a benchmark's median latency is more
+than --tolerance slower than in the baseline (and by at least
+--min-delta-ms). Baselines are only comparable on the same machine with
+the same OCR backend; the environment of both runs is printed.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import generate_corpus, load_corpus
+
+BENCHMARKS = (
+    'preprocess_image',
+    'extract_text_from_image',
+    'calculate_keyword_matches',
+    'app.verify_document',
+    'app.verify_document[bytes]',
+    'DocVerifier.verify_document'
+)
+
+# Keyword scans take microseconds, so each timed sample repeats the call
+KEYWORD_REPEAT = 100
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def prepare_app(workdir):
+    """Import the app with its caches, stores and upload folders in a scratch directory"""
+    os.environ['OCR_CACHE_ENABLED'] = '0'
+    os.environ['WARMUP_ON_START'] = '0'
+    os.environ['VERIFY_PROCESS_WORKERS'] = '0'
+    os.environ['MONGO_PERSIST'] = '0'
+    os.environ['RESULT_STORE_PATH'] = os.path.join(workdir, 'results.sqlite3')
+    os.environ['PHASH_INDEX_PATH'] = os.path.join(workdir, 'phash_index.sqlite3')
+    os.environ.pop('METRICS_DIR', None)
+    os.chdir(workdir)
+    import app
+    return app
+
+def benchmark_calls(app, verifier, corpus):
+    """
+    Build the calls to time for each benchmark
+
+    Returns:
+    - Dictionary of benchmark name to a list of zero-argument callables
+    """
+    images = [doc for doc in corpus if doc['format'] != 'pdf']
+    keywords = {'license': app.LICENSE_KEYWORDS, 'degree': app.DEGREE_KEYWORDS}
+
+    def preprocess(doc):
+        def call():
+            processed_path = app.preprocess_image(doc['path'])
+            if processed_path and os.path.exists(processed_path):
+                os.remove(processed_path)
+        return call
+
+    def keyword_matches(doc):
+        text = app.clean_extracted_text(doc['text'])
+        def call():
+            for _ in range(KEYWORD_REPEAT):
+                app.calculate_keyword_matches(text, keywords[doc['document_type']])
+        return call
+
+    def verify_bytes(doc):
+        with open(doc['path'], 'rb') as f:
+            content = f.read()
+        return lambda: app.verify_document(doc['path'], doc['document_type'], content=content)
+
+    return {
+        'preprocess_image': [preprocess(doc) for doc in images],
+        'extract_text_from_image': [
+            (lambda path=doc['path']: app.extract_text_from_image(path)) for doc in images],
+        'calculate_keyword_matches': [keyword_matches(doc) for doc in corpus],
+        'app.verify_document': [
+            (lambda doc=doc: app.verify_document(doc['path'], doc['document_type'])) for doc in images],
+        'app.verify_document[bytes]': [verify_bytes(doc) for doc in images],
+        'DocVerifier.verify_document': [
+            (lambda doc=doc: verifier.verify_document(doc['path'], doc['document_type'])) for doc in corpus]
+    }
+
+def run_benchmark(calls, iterations, repeat=1):
+    """
+    Time each call over several iterations
+
+    Returns:
+    - Summary with latency statistics in milliseconds and the mean time per
+      call spent in each pipeline stage
+    """
+    from metrics import collect_stages
+
+    # Untimed first call loads libraries and engines
+    calls[0]()
+
+    latencies = []
+    stage_totals = {}
+    for _ in range(iterations):
+        for call in calls:
+            with collect_stages() as timings:
+                start = time.perf_counter()
+                result = call()
+                elapsed = time.perf_counter() - start
+            # app.verify_document collects its own stage timings
+            if isinstance(result, dict) and result.get('stage_timings'):
+                timings = result['stage_timings']
+            latencies.append(elapsed * 1000 / repeat)
+            for name, seconds in timings.items():
+                stage_totals[name] = stage_totals.get(name, 0.0) + seconds * 1000 / repeat
+
+    return {
+        'calls': len(latencies),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'min_ms': round(min(latencies), 3),
+        'stages_ms': {name: round(total / len(latencies), 3) for name, total in sorted(stage_totals.items())}
+    }
+
+def environment(app):
+    from ocr_engine import get_ocr_engine
+    try:
+        get_ocr_engine().warm_up()
+        ocr = get_ocr_engine().name
+    except Exception as e:
+        ocr = f"unavailable ({str(e)[:60]})"
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'ocr': ocr,
+        'preprocess_profile': app.PREPROCESS_PROFILE.get('name')
+    }
+
+def compare(baseline, current, tolerance, min_delta_ms):
+    """
+    Compare median latencies with a baseline
+
+    Returns:
+    - List of (benchmark, baseline ms, current ms, change, regressed) rows
+    """
+    rows = []
+    for name, result in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+        change = (result['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0.0
+        regressed = change > tolerance and result['p50_ms'] - base['p50_ms'] >= min_delta_ms
+        rows.append((name, base['p50_ms'], result['p50_ms'], change, regressed))
+    return rows
+
+def print_results(results):
+    print(f"{'benchmark':<30} {'calls':>6} {'p50 ms':>10} {'p95 ms':>10}  stages (mean ms)")
+    for name, r in results['benchmarks'].items():
+        stages = ' '.join(f"{stage}={ms}" for stage, ms in r['stages_ms'].items())
+        print(f"{name:<30} {r['calls']:>6} {r['p50_ms']:>10} {r['p95_ms']:>10}  {stages}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='Corpus directory from benchmarks/corpus.py (default: generate one)')
+    parser.add_argument('--count', type=int, default=6, help='Images in a generated corpus')
+    parser.add_argument('--pdfs', type=int, default=2, help='Multi-page PDFs in a generated corpus')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--benchmarks', nargs='*', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--save-baseline', metavar='PATH', help='Write the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Fail on regressions against a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative slowdown of a median (default 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore slowdowns smaller than this (default 1 ms)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.corpus:
+            corpus = load_corpus(args.corpus)
+        else:
+            corpus = generate_corpus(os.path.join(workdir, 'corpus'), args.count, args.pdfs, seed=args.seed)
+
+        app = prepare_app(workdir)
+        # Per-document log lines would dominate the output
+        logging.disable(logging.INFO)
+
+        from verify_documents import DocVerifier
+        verifier = DocVerifier()
+        verifier.warm_up()
+
+        calls = benchmark_calls(app, verifier, corpus)
+        results = {
+            'environment': environment(app),
+            'corpus': {'documents': len(corpus), 'source': args.corpus or f"generated, seed {args.seed}"},
+            'iterations': args.iterations,
+            'benchmarks': {}
+        }
+        for name in args.benchmarks:
+            if not calls[name]:
+                continue
+            repeat = KEYWORD_REPEAT if name == 'calculate_keyword_matches' else 1
+            results['benchmarks'][name] = run_benchmark(calls[name], args.iterations, repeat)
+        os.chdir(APP_DIR)
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    if baseline is None:
+        return 0
+
+    if baseline.get('environment') != results['environment']:
+        print(f"Warning: baseline environment differs: {baseline.get('environment')}")
+    rows = compare(baseline, results, args.tolerance, args.min_delta_ms)
+    print(f"\n{'benchmark':<30} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for name, base_ms, current_ms, change, regressed in rows:
+        print(f"{name:<30} {base_ms:>10} {current_ms:>10} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Measure service startup: import time, time to first health check and time to ready
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--json]
+
+Each run starts a fresh interpreter in a scratch directory (the app creates its
+upload, results and cache paths in the working directory) and reports:
+- import_s:   time to import app, after which /api/health can answer
+- health_s:   time until the first /api/health response
+- ready_s:    time until /api/ready reports every engine warm or failed
+- eager_s:    time to import the heavy libraries up front, as app.py used to
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = r"""
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+imported = time.perf_counter() - start
+client = app.app.test_client()
+client.get('/api/health')
+health = time.perf_counter() - start
+while client.get('/api/ready').status_code != 200:
+    time.sleep(0.01)
+ready = time.perf_counter() - start
+print(json.dumps({'import_s': imported, 'health_s': health, 'ready_s': ready,
+                  'engines': app.warmup.status()[1]}))
+"""
+
+EAGER_SCRIPT = r"""
+import time, json
+start = time.perf_counter()
+for name in ('numpy', 'cv2', 'PIL.Image', 'pytesseract', 'fitz', 'torch', 'transformers'):
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+print(json.dumps({'eager_s': time.perf_counter() - start}))
+"""
+
+def run_script(script, *args):
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run([sys.executable, '-c', script, *args], cwd=workdir,
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(values):
+    return {'mean': round(statistics.mean(values), 3), 'min': round(min(values), 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    runs = [dict(run_script(STARTUP_SCRIPT, APP_DIR), **run_script(EAGER_SCRIPT)) for _ in range(args.runs)]
+    results = {key: summarize([run[key] for run in runs])
+               for key in ('import_s', 'health_s', 'ready_s', 'eager_s')}
+    results['engines'] = runs[-1]['engines']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'stage':>10} {'mean s':>8} {'min s':>8}")
+        for key in ('import_s', 'health_s', 'ready_s', 'eager_s'):
+            print(f"{key:>10} {results[key]['mean']:>8} {results[key]['min']:>8}")
+        for name, state in results['engines'].items():
+            print(f"engine {name}: {state['status']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Generate a synthetic corpus of license and degree documents for benchmarks
+
+Usage:
+    python benchmarks/corpus.py --out /tmp/docverify-corpus [--count 8] [--pdfs 2] [--seed 7]
+
+Documents are rendered offline with Pillow: certificate text on a page
+that is then scaled to a range of resolutions, skewed, blurred and
+sprinkled with sensor noise, and saved as PNG, JPEG or multi-page scanned
+PDF. The same seed always produces the same corpus. A manifest.json next
+to the files records each document's type, variations and rendered text.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Certificate page size at scale 1.0 (A4 landscape at roughly 100 dpi)
+PAGE_SIZE = (1170, 830)
+SCALES = (0.6, 1.0, 1.6, 2.4)
+NAMES = ('Ayesha Khan', 'Imran Ali', 'Sara Ahmed', 'Usman Tariq', 'Fatima Noor', 'Bilal Hussain')
+
+LICENSE_TEMPLATE = [
+    'PAKISTAN MEDICAL AND DENTAL COUNCIL',
+    'LICENSE TO PRACTICE MEDICINE',
+    'This certifies that Dr. {name}',
+    'is a registered medical practitioner',
+    'authorized by the board to practice as a physician',
+    'Registration Number {number}-P   Valid until {year}'
+]
+
+DEGREE_TEMPLATE = [
+    'UNIVERSITY OF HEALTH SCIENCES',
+    'FACULTY OF MEDICINE',
+    'This is to certify that {name}',
+    'has been awarded the degree of',
+    'BACHELOR OF MEDICINE AND BACHELOR OF SURGERY (MBBS)',
+    'by the academic council of the college in {year}'
+]
+
+def load_font(size):
+    """Scalable font; Pillow's bundled default when no TrueType font is installed"""
+    for path in ('/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf',
+                 '/usr/share/fonts/dejavu/DejaVuSerif.ttf',
+                 '/Library/Fonts/Times New Roman.ttf',
+                 'C:\\Windows\\Fonts\\times.ttf'):
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size=size)
+
+def render_page(document_type, rng):
+    """
+    Render a clean certificate page
+
+    Returns:
+    - Tuple of (grayscale PIL image, rendered text)
+    """
+    template = LICENSE_TEMPLATE if document_type == 'license' else DEGREE_TEMPLATE
+    lines = [line.format(name=rng.choice(NAMES), number=rng.randint(10000, 99999),
+                         year=rng.randint(2005, 2030)) for line in template]
+
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    width, height = PAGE_SIZE
+    draw.rectangle((20, 20, width - 20, height - 20), outline=60, width=6)
+    title_font, body_font = load_font(44), load_font(30)
+    y = 110
+    for i, line in enumerate(lines):
+        font = title_font if i < 2 else body_font
+        line_width = draw.textlength(line, font=font)
+        draw.text(((width - line_width) / 2, y), line, fill=20, font=font)
+        y += 95 if i < 2 else 80
+    return page, '\n'.join(lines)
+
+def degrade(page, rng, scale, skew, blur, noise):
+    """Apply the scan-like variations to a rendered page"""
+    if scale != 1.0:
+        page = page.resize((int(page.width * scale), int(page.height * scale)), Image.LANCZOS)
+    if skew:
+        page = page.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if blur:
+        page = page.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += np.random.default_rng(rng.randint(0, 2 ** 32 - 1)).normal(0, noise, pixels.shape)
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return page
+
+def random_variation(rng):
+    return {
+        'scale': rng.choice(SCALES),
+        'skew': round(rng.uniform(-4, 4), 2),
+        'blur': rng.choice((0, 0, 0.8, 1.6)),
+        'noise': rng.choice((0, 6, 14))
+    }
+
+def generate_corpus(out_dir, count=8, pdfs=2, pdf_pages=3, seed=7):
+    """
+    Write a synthetic corpus and its manifest
+
+    Parameters:
+    - out_dir: Directory to write the documents to
+    - count: Number of single-page images, alternating license and degree
+    - pdfs: Number of multi-page scanned PDFs
+    - pdf_pages: Pages per PDF
+    - seed: Random seed; the same seed produces the same corpus
+
+    Returns:
+    - List of manifest entries, one per document
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+
+    for i in range(count):
+        document_type = 'license' if i % 2 == 0 else 'degree'
+        variation = random_variation(rng)
+        page, text = render_page(document_type, rng)
+        page = degrade(page, rng, **variation)
+        image_format = 'jpg' if i % 3 == 2 else 'png'
+        path = os.path.join(out_dir, f"{document_type}-{i:03d}.{image_format}")
+        page.save(path, quality=85) if image_format == 'jpg' else page.save(path)
+        manifest.append(dict(variation, path=path, document_type=document_type, format=image_format,
+                             pages=1, width=page.width, height=page.height, text=text))
+
+    for i in range(pdfs):
+        document_type = 'degree' if i % 2 == 0 else 'license'
+        variation = random_variation(rng)
+        pages, texts = [], []
+        for _ in range(pdf_pages):
+            page, text = render_page(document_type, rng)
+            pages.append(degrade(page, rng, **variation).convert('RGB'))
+            texts.append(text)
+        path = os.path.join(out_dir, f"{document_type}-scan-{i:03d}.pdf")
+        # Pages are embedded as images, like a scanner's output, so they go through OCR
+        pages[0].save(path, save_all=True, append_images=pages[1:], resolution=100.0)
+        manifest.append(dict(variation, path=path, document_type=document_type, format='pdf',
+                             pages=pdf_pages, width=pages[0].width, height=pages[0].height,
+                             text='\n'.join(texts)))
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump({'seed': seed, 'documents': manifest}, f, indent=2)
+    return manifest
+
+def load_corpus(corpus_dir):
+    """Read the manifest of a generated corpus"""
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        return json.load(f)['documents']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--count', type=int, default=8, help='Single-page images')
+    parser.add_argument('--pdfs', type=int, default=2, help='Multi-page scanned PDFs')
+    parser.add_argument('--pdf-pages', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out, args.count, args.pdfs, args.pdf_pages, args.seed)
+    for doc in manifest:
+        print(f"{doc['path']}: {doc['document_type']} {doc['width']}x{doc['height']} "
+              f"skew {doc['skew']} blur {doc['blur']} noise {doc['noise']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
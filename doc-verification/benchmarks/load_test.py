@@ -0,0 +1,324 @@
+"""
+Load-test the verification endpoints with synthetic or replayed traffic
+
+Usage:
+    python benchmarks/load_test.py run [--url http://localhost:5001]
+        [--endpoint /api/verify-doctor] [--requests 40] [--concurrency 8] [--rate 2]
+    python benchmarks/load_test.py replay traffic.jsonl [--speed 4] [--url ...]
+
+Without --url, requests go to the Flask test client in this process (the
+app runs in a scratch directory); with --url, to a running server.
+
+run sends license and degree uploads of mixed formats and resolutions.
+With --rate, requests arrive as a Poisson process at that many per second
+(open loop); without it, each of the --concurrency clients sends its next
+request as soon as the previous one finishes (closed loop).
+
+replay sends the request shapes recorded by the service with
+TRAFFIC_RECORD_PATH set (file sizes, types and resolutions; never the
+documents themselves), with their original inter-arrival gaps divided by
+--speed. Documents of the recorded kind and resolution are synthesized;
+every upload gets unique bytes so caches behave as with real traffic.
+
+Latency is measured from each request's scheduled arrival, so time spent
+waiting for a free client counts, as it would for a real user.
+Asynchronous requests (202) are polled until their job finishes.
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from PIL import Image
+from corpus import PAGE_SIZE, SCALES, degrade, random_variation, render_page
+from traffic import load_shapes
+
+ENDPOINTS = ('/api/verify-doctor', '/api/verify-doctor-original')
+EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'pdf': 'pdf'}
+CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'pdf': 'application/pdf'}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class DocumentFactory:
+    """Synthesizes upload bytes for a request shape, caching one document per shape"""
+
+    def __init__(self, seed=7):
+        self.rng = random.Random(seed)
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def make(self, field, kind, width=None, height=None, size=None):
+        """
+        Return (filename, bytes, content type) for a file shape
+
+        Files whose kind was not detected (rejected uploads) are replayed as
+        random bytes of the recorded size.
+        """
+        extension = EXTENSIONS.get(kind)
+        if extension is None:
+            return f"{field}.txt", os.urandom(size or 1024), 'text/plain'
+
+        # Round dimensions so near-identical shapes share one rendered document
+        width = int(round((width or PAGE_SIZE[0]) / 50.0) * 50) or 50
+        height = int(round((height or PAGE_SIZE[1]) / 50.0) * 50) or 50
+        key = (field, extension, width, height)
+        with self.lock:
+            if key not in self.cache:
+                self.cache[key] = self._render(field, extension, width, height)
+            content = self.cache[key]
+        return f"{field}.{extension}", content, CONTENT_TYPES[extension]
+
+    def _render(self, field, extension, width, height):
+        document_type = 'degree' if field == 'degree' else 'license'
+        page, _ = render_page(document_type, self.rng)
+        variation = random_variation(self.rng)
+        variation['scale'] = 1.0
+        page = degrade(page, self.rng, **variation).resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if extension == 'jpg':
+            page.save(buffer, 'JPEG', quality=85)
+        elif extension == 'pdf':
+            page.convert('RGB').save(buffer, 'PDF', resolution=100.0)
+        else:
+            page.save(buffer, 'PNG')
+        return buffer.getvalue()
+
+def synthetic_shapes(count, endpoint, rate, kinds, seed=7):
+    """Request shapes with Poisson arrivals (all at time 0 when rate is 0)"""
+    rng = random.Random(seed)
+    shapes, arrival = [], 0.0
+    for _ in range(count):
+        files = []
+        for field in ('license', 'degree'):
+            scale = rng.choice(SCALES)
+            files.append({'field': field, 'kind': rng.choice(kinds),
+                          'width': int(PAGE_SIZE[0] * scale), 'height': int(PAGE_SIZE[1] * scale)})
+        shapes.append({'time': arrival, 'endpoint': endpoint, 'async': False, 'files': files})
+        if rate:
+            arrival += rng.expovariate(rate)
+    return shapes
+
+def encode_multipart(fields, files):
+    """Encode form fields and (field, filename, bytes, content type) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for field, filename, content, content_type in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                   f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+        body.write(content)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+class HTTPTransport:
+    """Sends requests to a running server"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def post(self, path, fields, files):
+        body, content_type = encode_multipart(fields, files)
+        request = urllib.request.Request(self.url + path, data=body, method='POST',
+                                         headers={'Content-Type': content_type})
+        return self._send(request)
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.url + path))
+
+    @staticmethod
+    def _send(request):
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            return e.code, {}
+
+class TestClientTransport:
+    """Sends requests to the app in this process through Flask's test client"""
+
+    def __init__(self, workdir):
+        os.environ.setdefault('WARMUP_ON_START', '0')
+        os.environ.setdefault('MONGO_PERSIST', '0')
+        os.environ['RESULT_STORE_PATH'] = os.path.join(workdir, 'results.sqlite3')
+        os.environ['OCR_CACHE_PATH'] = os.path.join(workdir, 'ocr_cache.sqlite3')
+        os.environ['VERIFY_JOB_DB'] = ''
+        os.environ.pop('TRAFFIC_RECORD_PATH', None)
+        os.chdir(workdir)
+        import app
+        self.app = app.app
+
+    def post(self, path, fields, files):
+        data = dict(fields)
+        for field, filename, content, content_type in files:
+            data[field] = (io.BytesIO(content), filename, content_type)
+        response = self.app.test_client().post(path, data=data, content_type='multipart/form-data')
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def get(self, path):
+        response = self.app.test_client().get(path)
+        return response.status_code, response.get_json(silent=True) or {}
+
+def send(transport, factory, shape, index):
+    """
+    Send one request and wait for its result
+
+    Returns:
+    - Tuple of (status code, seconds spent in the request)
+    """
+    fields = {'name': f'Load Test {index}', 'email': f'loadtest{index}@example.com'}
+    files = []
+    for f in shape['files']:
+        filename, content, content_type = factory.make(f['field'], f.get('kind'), f.get('width'),
+                                                       f.get('height'), f.get('size'))
+        # Trailing random bytes make every upload unique, as real documents
+        # are, so OCR cache and blob store hits do not flatter the results
+        files.append((f['field'], filename, content + os.urandom(16), content_type))
+    path = shape['endpoint'] + ('?async=1' if shape.get('async') else '')
+
+    start = time.perf_counter()
+    status, body = transport.post(path, fields, files)
+    if status == 202 and body.get('status_url'):
+        # Asynchronous request: done when the job is
+        while True:
+            time.sleep(0.2)
+            job_status, job = transport.get(body['status_url'])
+            if job_status != 200 or job.get('status') in ('completed', 'failed'):
+                status = 200 if job.get('status') == 'completed' else 500
+                break
+    return status, time.perf_counter() - start
+
+def run_load(transport, factory, shapes, concurrency, speed=1.0, closed_loop=False):
+    """
+    Send the shapes at their arrival times with at most concurrency in flight
+
+    Returns:
+    - Summary with throughput, status counts and latency percentiles
+    """
+    latencies, services, statuses = [], [], {}
+    lock = threading.Lock()
+    origin = shapes[0]['time'] if shapes else 0
+
+    def task(shape, index, scheduled):
+        try:
+            status, service = send(transport, factory, shape, index)
+        except Exception as e:
+            status, service = f"error: {type(e).__name__}", None
+        # Latency counts from the scheduled arrival, including time queued for a
+        # client; in a closed loop each request arrives when its client is free
+        latency = time.perf_counter() - scheduled if scheduled is not None else service
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if service is not None and isinstance(status, int) and status < 400:
+                latencies.append(latency)
+                services.append(service)
+
+    # Render every document up front so synthesis is not measured
+    for shape in shapes:
+        for f in shape['files']:
+            factory.make(f['field'], f.get('kind'), f.get('width'), f.get('height'), f.get('size'))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, shape in enumerate(shapes):
+            if closed_loop:
+                executor.submit(task, shape, index, None)
+                continue
+            scheduled = start + (shape['time'] - origin) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(task, shape, index, scheduled)
+    wall = time.perf_counter() - start
+
+    summary = {
+        'requests': len(shapes),
+        'succeeded': len(latencies),
+        'statuses': statuses,
+        'wall_s': round(wall, 2),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'offered_rps': round((len(shapes) - 1) / ((shapes[-1]['time'] - origin) / speed), 2)
+        if not closed_loop and len(shapes) > 1 and shapes[-1]['time'] > origin else None
+    }
+    if latencies:
+        summary.update({
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+            'service_p50_ms': round(percentile(services, 50) * 1000, 1)
+        })
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Server to load (default: Flask test client in this process)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum requests in flight')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Send synthetic traffic')
+    run_parser.add_argument('--endpoint', choices=ENDPOINTS, default=ENDPOINTS[0])
+    run_parser.add_argument('--requests', type=int, default=40)
+    run_parser.add_argument('--rate', type=float, default=0,
+                            help='Arrivals per second (default: closed loop)')
+    run_parser.add_argument('--kinds', nargs='*', choices=sorted(EXTENSIONS), default=['png', 'jpeg'])
+    run_parser.add_argument('--async', dest='is_async', action='store_true',
+                            help='Request asynchronous verification and poll the jobs')
+
+    replay_parser = subparsers.add_parser('replay', help='Replay recorded request shapes')
+    replay_parser.add_argument('shapes', help='JSON-lines file written with TRAFFIC_RECORD_PATH')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='Replay N times faster')
+    replay_parser.add_argument('--limit', type=int, help='Replay only the first N requests')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        shapes = synthetic_shapes(args.requests, args.endpoint, args.rate, args.kinds, args.seed)
+        for shape in shapes:
+            shape['async'] = args.is_async
+        closed_loop, speed = not args.rate, 1.0
+    else:
+        shapes = load_shapes(args.shapes)[:args.limit]
+        closed_loop, speed = False, args.speed
+    if not shapes:
+        print("No requests to send")
+        return 1
+
+    factory = DocumentFactory(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        transport = HTTPTransport(args.url) if args.url else TestClientTransport(workdir)
+        summary = run_load(transport, factory, shapes, args.concurrency, speed, closed_loop)
+        os.chdir(APP_DIR)
+
+    summary.update({'target': args.url or 'test client', 'concurrency': args.concurrency,
+                    'mode': 'closed loop' if closed_loop else f"open loop, speed {speed}x"})
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for key, value in summary.items():
+            print(f"{key:>16}: {value}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
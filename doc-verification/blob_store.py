@@ -0,0 +1,177 @@
+"""
+Content-addressed store for uploaded documents
+
+Each distinct upload is stored once, as objects/<ab>/<sha256>, where <ab> is
+the first two hex digits of the hash. Upload and review names are hardlinks
+to the blob, so identical uploads and review copies take no extra space.
+A blob whose only remaining link is its store entry is unreferenced and is
+removed by garbage collection:
+    python blob_store.py gc [--grace 3600] [--dry-run]
+    python blob_store.py stats
+"""
+import os
+import sys
+import time
+import uuid
+import shutil
+import logging
+import argparse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """Deduplicated, hash-sharded file store with hardlinked references"""
+
+    def __init__(self, root=None):
+        """
+        Initialize the store
+
+        Parameters:
+        - root: Directory holding the sharded blobs; keep it on the same
+          volume as the upload folder so references can be hardlinks
+        """
+        self.root = root or os.getenv('BLOB_STORE_PATH', os.path.join('uploads', 'objects'))
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, content_hash):
+        """Return the blob path for a SHA-256 hex digest"""
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def exists(self, content_hash):
+        return os.path.exists(self.path_for(content_hash))
+
+    def put(self, content_hash, write):
+        """
+        Store a blob unless an identical one is already stored
+
+        Parameters:
+        - content_hash: SHA-256 hex digest of the content
+        - write: Callable that creates the content at the path it is given;
+          only called when the blob is missing
+
+        Returns:
+        - Path of the stored blob
+        """
+        path = self.path_for(content_hash)
+        if os.path.exists(path):
+            # Refresh the mtime so a concurrent gc grace period covers the new reference
+            os.utime(path)
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write(temp_path)
+            # Blobs are shared by every reference, so they are never modified in place
+            os.chmod(temp_path, 0o444)
+            # Linking rather than renaming never replaces a blob that a
+            # concurrent writer of the same content already linked names to
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return path
+
+    def put_bytes(self, content_hash, content):
+        """Store bytes under their hash and return the blob path"""
+        def write(path):
+            with open(path, 'wb') as f:
+                f.write(content)
+        return self.put(content_hash, write)
+
+    def link(self, content_hash, dest):
+        """
+        Create a named reference to a stored blob
+
+        Falls back to a copy when dest is on another volume, in which case
+        the copy is not counted as a reference.
+        """
+        try:
+            os.link(self.path_for(content_hash), dest)
+        except OSError as e:
+            if not os.path.exists(self.path_for(content_hash)):
+                raise
+            logger.warning(f"Could not hardlink {dest}, copying instead: {str(e)}")
+            shutil.copy2(self.path_for(content_hash), dest)
+        return dest
+
+    def _entries(self):
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                yield os.path.join(shard_path, name)
+
+    def gc(self, grace=3600, dry_run=False):
+        """
+        Remove blobs that no upload or review name links to any more
+
+        Parameters:
+        - grace: Skip blobs and temp files touched within this many seconds,
+          so in-flight uploads are not collected before they are linked
+        - dry_run: Only report what would be removed
+
+        Returns:
+        - Dictionary with the number of removed blobs and bytes reclaimed
+        """
+        cutoff = time.time() - grace
+        removed, reclaimed = 0, 0
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            if not path.endswith('.tmp') and stat.st_nlink > 1:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            reclaimed += stat.st_size
+        logger.info(f"{'Would remove' if dry_run else 'Removed'} {removed} unreferenced blobs ({reclaimed} bytes)")
+        return {'removed': removed, 'bytes': reclaimed}
+
+    def stats(self):
+        """Count blobs, their size and how many references point at them"""
+        blobs, size, references = 0, 0, 0
+        for path in self._entries():
+            if path.endswith('.tmp'):
+                continue
+            stat = os.stat(path)
+            blobs += 1
+            size += stat.st_size
+            references += stat.st_nlink - 1
+        return {'blobs': blobs, 'bytes': size, 'references': references}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', help='Blob store directory (defaults to BLOB_STORE_PATH)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    gc_parser = subparsers.add_parser('gc', help='Remove unreferenced blobs')
+    gc_parser.add_argument('--grace', type=int, default=3600, help='Seconds before a new blob can be collected')
+    gc_parser.add_argument('--dry-run', action='store_true')
+    subparsers.add_parser('stats', help='Report blob count, size and references')
+
+    args = parser.parse_args()
+    store = BlobStore(args.root)
+    if args.command == 'gc':
+        result = store.gc(grace=args.grace, dry_run=args.dry_run)
+    else:
+        result = store.stats()
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
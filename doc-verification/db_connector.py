@@ -1,6 +1,7 @@
 import os
 import logging
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure, OperationFailure
 from dotenv import load_dotenv
 from bson import ObjectId
 from datetime import datetime
@@ -13,11 +14,61 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Duplicate key error code; a retried batch re-inserts records that already landed
+DUPLICATE_KEY_ERROR = 11000
+
+# Fields returned by status lookups, leaving out the embedded document results
+STATUS_PROJECTION = {
+    'doctor_data.name': 1,
+    'doctor_data.email': 1,
+    'status': 1,
+    'reviewer_notes': 1,
+    'timestamp': 1
+}
+
+# Indexes created by ensure_indexes(); _id lookups use the built-in _id index
+VERIFICATION_INDEXES = [
+    ([('doctor_data.email', ASCENDING), ('timestamp.created_at', DESCENDING)], 'email_created_at'),
+    ([('status', ASCENDING), ('timestamp.created_at', DESCENDING)], 'status_created_at')
+]
+DOCTOR_INDEXES = [
+    ([('email', ASCENDING)], 'email')
+]
+
+def client_options():
+    """Connection pool sizing and timeouts shared by the sync and async connectors"""
+    return {
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+        'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        # How long an operation waits for a free pooled connection
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    }
+
+def is_transient_error(error):
+    """Check whether a MongoDB error is worth retrying (network errors, failovers)"""
+    if isinstance(error, (AutoReconnect, ConnectionFailure)):
+        return True
+    if isinstance(error, OperationFailure):
+        return error.has_error_label('RetryableWriteError')
+    return False
+
 class DBConnector:
     """Class for handling MongoDB operations"""
     
-    def __init__(self):
-        """Initialize the database connection"""
+    def __init__(self, client=None, ensure_indexes=True):
+        """
+        Initialize the database connection
+        
+        Parameters:
+        - client: Optional MongoClient (or compatible in-memory stand-in) to use
+          instead of connecting to MONGO_URI
+        - ensure_indexes: Create the query indexes now; pass False to call
+          ensure_indexes() later, e.g. off the request path
+        """
         try:
             # Get MongoDB connection string from environment variables
             # or use default local connection
@@ -25,7 +76,7 @@ class DBConnector:
             db_name = os.getenv('DB_NAME', 'healthlink')
             
             # Connect to MongoDB
-            self.client = MongoClient(mongo_uri)
+            self.client = client if client is not None else MongoClient(mongo_uri, **client_options())
             self.db = self.client[db_name]
             
             # Define collections
@@ -37,6 +88,27 @@ class DBConnector:
         except Exception as e:
             logger.error(f"Database connection error: {str(e)}")
             raise
+        
+        if ensure_indexes:
+            self.ensure_indexes()
+    
+    def ensure_indexes(self):
+        """
+        Create the indexes used by status and admin queries if they are missing
+        
+        Returns:
+        - True if all indexes exist, False if creating them failed
+        """
+        try:
+            for keys, name in VERIFICATION_INDEXES:
+                self.verification_collection.create_index(keys, name=name)
+            for keys, name in DOCTOR_INDEXES:
+                self.doctors_collection.create_index(keys, name=name)
+            logger.info("MongoDB indexes are in place")
+            return True
+        except Exception as e:
+            logger.error(f"Error creating MongoDB indexes: {str(e)}")
+            return False
     
     def add_doctor_verification_request(self, doctor_data, verification_results):
         """
@@ -50,15 +122,7 @@ class DBConnector:
         - ID of inserted document
         """
         try:
-            verification_doc = {
-                'doctor_data': doctor_data,
-                'verification_results': verification_results,
-                'status': verification_results.get('status', 'pending_review'),
-                'timestamp': {
-                    'created_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow()
-                }
-            }
+            verification_doc = self.build_verification_doc(doctor_data, verification_results)
             
             result = self.verification_collection.insert_one(verification_doc)
             logger.info(f"Added verification request with ID: {result.inserted_id}")
@@ -68,6 +132,59 @@ class DBConnector:
             logger.error(f"Error adding verification request: {str(e)}")
             raise
     
+    @staticmethod
+    def build_verification_doc(doctor_data, verification_results, verification_id=None):
+        """
+        Build a verification request document
+        
+        Parameters:
+        - doctor_data: Dictionary containing doctor information
+        - verification_results: Results of document verification
+        - verification_id: Optional ID; one is generated otherwise, so callers
+          know the ID before the document is written
+        
+        Returns:
+        - Document ready for insertion
+        """
+        now = datetime.utcnow()
+        verification_doc = {
+            '_id': ObjectId(verification_id) if verification_id else ObjectId(),
+            'doctor_data': doctor_data,
+            'verification_results': verification_results,
+            'status': verification_results.get('status', 'pending_review'),
+            'timestamp': {
+                'created_at': now,
+                'updated_at': now
+            }
+        }
+        return verification_doc
+    
+    def add_verification_requests(self, verification_docs):
+        """
+        Insert verification request documents in one unordered bulk write
+        
+        Documents must carry their _id, so a retried batch is idempotent:
+        documents that were already written are skipped as duplicates.
+        
+        Parameters:
+        - verification_docs: List of documents from build_verification_doc()
+        
+        Returns:
+        - Number of newly inserted documents
+        """
+        if not verification_docs:
+            return 0
+        try:
+            result = self.verification_collection.insert_many(verification_docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            inserted = e.details.get('nInserted', 0)
+        logger.info(f"Added {inserted} verification requests in bulk")
+        return inserted
+    
     def update_verification_status(self, verification_id, new_status, reviewer_notes=None):
         """
         Update the status of a verification request
@@ -81,15 +198,7 @@ class DBConnector:
         - True if update was successful, False otherwise
         """
         try:
-            update_data = {
-                '$set': {
-                    'status': new_status,
-                    'timestamp.updated_at': datetime.utcnow()
-                }
-            }
-            
-            if reviewer_notes:
-                update_data['$set']['reviewer_notes'] = reviewer_notes
+            update_data = self.build_status_update(new_status, reviewer_notes)
                 
             result = self.verification_collection.update_one(
                 {'_id': ObjectId(verification_id)},
@@ -103,13 +212,15 @@ class DBConnector:
             logger.error(f"Error updating verification status: {str(e)}")
             return False
     
-    def get_verification_status(self, doctor_email=None, verification_id=None):
+    def get_verification_status(self, doctor_email=None, verification_id=None, projection=None):
         """
         Get the status of a verification request by doctor email or verification ID
         
         Parameters:
-        - doctor_email: Doctor's email address
+        - doctor_email: Doctor's email address; the latest request is returned
         - verification_id: ID of the verification request
+        - projection: Optional fields to return, e.g. STATUS_PROJECTION to
+          leave out the embedded document results
         
         Returns:
         - Verification document or None if not found
@@ -123,13 +234,50 @@ class DBConnector:
             else:
                 return None
                 
-            result = self.verification_collection.find_one(query)
+            result = self.verification_collection.find_one(
+                query, projection, sort=[('timestamp.created_at', DESCENDING)]
+            )
             return result
             
         except Exception as e:
             logger.error(f"Error retrieving verification status: {str(e)}")
             return None
     
+    def get_verification_statuses(self, doctor_emails=None, verification_ids=None, projection=STATUS_PROJECTION):
+        """
+        Resolve the statuses of many verification requests in one round-trip
+        
+        Parameters:
+        - doctor_emails: Doctor email addresses; the latest request per email is returned
+        - verification_ids: IDs of verification requests
+        - projection: Fields to return (defaults to STATUS_PROJECTION)
+        
+        Returns:
+        - Dictionary keyed by email or ID (as given) of the matching documents;
+          keys with no match are left out
+        """
+        try:
+            if verification_ids:
+                object_ids = {}
+                for verification_id in verification_ids:
+                    try:
+                        object_ids[ObjectId(verification_id)] = verification_id
+                    except Exception:
+                        logger.warning(f"Skipping invalid verification ID: {verification_id}")
+                cursor = self.verification_collection.find({'_id': {'$in': list(object_ids)}}, projection)
+                return {object_ids[doc['_id']]: doc for doc in cursor}
+            
+            if doctor_emails:
+                pipeline = self.latest_by_email_pipeline(doctor_emails, projection)
+                cursor = self.verification_collection.aggregate(pipeline)
+                return {doc['doctor_data']['email']: doc for doc in cursor}
+            
+            return {}
+            
+        except Exception as e:
+            logger.error(f"Error retrieving verification statuses: {str(e)}")
+            return {}
+    
     def add_verified_doctor(self, doctor_data, document_paths=None):
         """
         Add a new verified doctor to the database
@@ -143,18 +291,7 @@ class DBConnector:
         """
         try:
             # Prepare doctor document
-            doctor_doc = {
-                'name': doctor_data.get('name'),
-                'email': doctor_data.get('email'),
-                'specialization': doctor_data.get('specialization'),
-                'qualification': doctor_data.get('qualification', []),
-                'experience': doctor_data.get('experience', 0),
-                'fee': doctor_data.get('fee', 0),
-                'profile': document_paths.get('profile_photo', '') if document_paths else '',
-                'verified': True,
-                'document_paths': document_paths,
-                'created_at': datetime.utcnow()
-            }
+            doctor_doc = self.build_doctor_doc(doctor_data, document_paths)
             
             result = self.doctors_collection.insert_one(doctor_doc)
             logger.info(f"Added verified doctor with ID: {result.inserted_id}")
@@ -162,4 +299,49 @@ class DBConnector:
             
         except Exception as e:
             logger.error(f"Error adding verified doctor: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    @staticmethod
+    def build_doctor_doc(doctor_data, document_paths=None):
+        """Build a verified doctor document"""
+        return {
+            'name': doctor_data.get('name'),
+            'email': doctor_data.get('email'),
+            'specialization': doctor_data.get('specialization'),
+            'qualification': doctor_data.get('qualification', []),
+            'experience': doctor_data.get('experience', 0),
+            'fee': doctor_data.get('fee', 0),
+            'profile': document_paths.get('profile_photo', '') if document_paths else '',
+            'verified': True,
+            'document_paths': document_paths,
+            'created_at': datetime.utcnow()
+        }
+    
+    @staticmethod
+    def build_status_update(new_status, reviewer_notes=None):
+        """Build the update document for a verification status change"""
+        update_data = {
+            '$set': {
+                'status': new_status,
+                'timestamp.updated_at': datetime.utcnow()
+            }
+        }
+        
+        if reviewer_notes:
+            update_data['$set']['reviewer_notes'] = reviewer_notes
+        return update_data
+    
+    @staticmethod
+    def latest_by_email_pipeline(doctor_emails, projection=STATUS_PROJECTION):
+        """Aggregation returning the newest verification request per email"""
+        # Served by the (email, created_at) index
+        pipeline = [
+            {'$match': {'doctor_data.email': {'$in': list(doctor_emails)}}},
+            {'$sort': {'doctor_data.email': ASCENDING, 'timestamp.created_at': DESCENDING}},
+            {'$group': {'_id': '$doctor_data.email', 'doc': {'$first': '$$ROOT'}}},
+            {'$replaceRoot': {'newRoot': '$doc'}}
+        ]
+        if projection:
+            # Results are keyed by email, so it is always returned
+            pipeline.append({'$project': dict(projection, **{'doctor_data.email': 1})})
+        return pipeline
@@ -0,0 +1,75 @@
+"""
+Gunicorn settings for the verification service
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Settings can be overridden with the usual environment variables:
+WEB_CONCURRENCY (workers), VERIFY_PROCESS_WORKERS (document processes per
+worker), GUNICORN_THREADS, GUNICORN_MAX_REQUESTS,
+GUNICORN_MAX_REQUESTS_JITTER, GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT.
+"""
+import os
+from serving import autotune_document_workers, autotune_workers
+
+workers = autotune_workers()
+# Each worker reads the documents of a request in parallel on its own
+# process pool, sized to its share of the cores; 0 reads them inline
+os.environ['VERIFY_PROCESS_WORKERS'] = str(autotune_document_workers(workers))
+# Async job status must be visible to whichever worker gets the poll
+os.environ.setdefault('VERIFY_JOB_DB', 'verify_jobs.sqlite3')
+# Workers share metrics snapshots so /metrics reports the whole server
+os.environ.setdefault('METRICS_DIR', 'metrics-snapshots')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+
+# Load the app, OCR engine and models once in the master, then fork
+preload_app = True
+# A few threads per worker keep health checks answering during long OCR runs
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+
+# Recycle workers gracefully to bound memory growth from native libraries
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 50))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 60))
+
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    """Discard metrics snapshots left by a previous run"""
+    from metrics import Registry
+    Registry.clear_directory(os.environ['METRICS_DIR'])
+
+def post_fork(server, worker):
+    """Load per-process engine state that cannot be inherited from the master"""
+    import app as service
+    try:
+        # Native OCR handles are created per process, so warm the ones that
+        # will read this worker's documents rather than on its first requests
+        if service.document_pool.enabled:
+            # Documents are OCR'd in the pool's processes
+            service.document_pool.warm_up()
+        else:
+            # Documents are OCR'd on the request and PDF page threads, which
+            # share the engine's instance pool; load all of it
+            service.get_ocr_engine().warm_up()
+    except Exception as e:
+        worker.log.warning(f"OCR warm-up failed in worker {worker.pid}: {str(e)}")
+
+def worker_exit(server, worker):
+    """Finish in-flight background work before a recycled or stopped worker exits"""
+    import sys
+    import app as service
+    service.job_manager.executor.shutdown(wait=True)
+    service.persist_executor.shutdown(wait=True)
+    service.document_pool.shutdown()
+    # DocVerifier tooling is optional; only stop its page threads if it ran
+    if 'verify_documents' in sys.modules:
+        sys.modules['verify_documents'].shutdown_page_pool()
+    service.shutdown_ocr_engine()
+    if service._verification_writer is not None:
+        service._verification_writer.close()
+    # Keep this worker's counts in the totals after it is gone
+    service.metrics_registry.retire()
@@ -0,0 +1,91 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class BatchScheduler:
+    """
+    Collects texts from concurrent callers into batches for one forward pass
+
+    A batch is dispatched as soon as it holds max_batch_size texts or the
+    oldest waiting text has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, score_batch, max_batch_size=None, max_wait_ms=None):
+        """
+        Initialize the scheduler
+
+        Parameters:
+        - score_batch: Callable taking a list of texts and returning one score per text
+        - max_batch_size: Maximum number of texts per forward pass
+        - max_wait_ms: Maximum time a text waits for others to join its batch
+        """
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size or int(os.getenv('INFERENCE_MAX_BATCH', 16))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Started lazily, and restarted in forked workers where the thread is gone
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, text):
+        """Queue a text for scoring and return a Future resolving to its score"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def score(self, text, timeout=None):
+        """Score a text, blocking until its batch has run"""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first text, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Skip callers that gave up before their batch ran
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                scores = self.score_batch([text for text, _ in batch])
+                for (_, future), score in zip(batch, scores):
+                    future.set_result(score)
+            except Exception as e:
+                logger.error(f"Error in batched inference: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
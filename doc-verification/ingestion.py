@@ -0,0 +1,354 @@
+import os
+import io
+import shutil
+import struct
+import hashlib
+import logging
+import tempfile
+from flask import Request, current_app
+from metrics import stage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are spooled to a temp file in the upload folder
+UPLOAD_SPOOL_MEMORY = int(os.getenv('UPLOAD_SPOOL_MEMORY', 1024 * 1024))
+# Images outside these bounds are rejected before any decoding
+UPLOAD_MAX_PIXELS = int(os.getenv('UPLOAD_MAX_PIXELS', 50_000_000))
+UPLOAD_MIN_SIDE = int(os.getenv('UPLOAD_MIN_SIDE', 64))
+
+# Leading bytes kept for content sniffing; JPEG dimensions sit in the SOF
+# segment, which follows any EXIF/ICC segments at the start of the file
+SNIFF_BYTES = 256 * 1024
+
+# File extensions accepted for each detected content kind
+KIND_EXTENSIONS = {
+    'pdf': {'pdf'},
+    'png': {'png'},
+    'jpeg': {'jpg', 'jpeg'},
+    'zip': {'zip'}
+}
+
+# JPEG start-of-frame markers (excluding DHT, JPG and DAC, which share the range)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload fails content validation"""
+
+def sniff_kind(header, archives=False):
+    """
+    Detect the upload type from its magic bytes
+
+    Returns:
+    - 'pdf', 'png', 'jpeg', 'zip' (only when archives are accepted) or None
+    """
+    if archives and header.startswith(b'PK\x03\x04'):
+        return 'zip'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    # PDF readers accept a header anywhere in the first 1024 bytes
+    if b'%PDF-' in header[:1024]:
+        return 'pdf'
+    return None
+
+def _png_dimensions(header):
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+def _jpeg_dimensions(header):
+    offset = 2
+    while offset + 4 <= len(header):
+        if header[offset] != 0xFF:
+            return None
+        marker = header[offset + 1]
+        # Fill bytes and standalone markers carry no length field
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            offset += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if offset + 9 > len(header):
+                return None
+            height, width = struct.unpack('>HH', header[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + struct.unpack('>H', header[offset + 2:offset + 4])[0]
+    return None
+
+def image_dimensions(kind, header):
+    """Read (width, height) from the leading bytes of a PNG or JPEG, or None"""
+    if kind == 'png':
+        return _png_dimensions(header)
+    if kind == 'jpeg':
+        return _jpeg_dimensions(header)
+    return None
+
+class UploadSpool:
+    """
+    Writable upload stream that validates and hashes the bytes as they arrive
+
+    Werkzeug writes each multipart file part here chunk by chunk. The SHA-256
+    digest is computed on the fly, the magic bytes and image dimensions are
+    checked from the leading bytes, and the content is kept in memory until
+    it outgrows max_memory, then spooled to a temp file in spool_dir. Once an
+    upload fails validation the remaining bytes are discarded unread.
+    """
+
+    def __init__(self, filename=None, max_memory=None, spool_dir=None, archives=False):
+        self.filename = filename
+        self.max_memory = UPLOAD_SPOOL_MEMORY if max_memory is None else max_memory
+        self.spool_dir = spool_dir
+        self.archives = archives
+        self.size = 0
+        self.kind = None
+        self.width = None
+        self.height = None
+        self.error = None
+        self.path = None
+        self._file = io.BytesIO()
+        self._hash = hashlib.sha256()
+        self._header = bytearray()
+        self._inspected = False
+        self._finished = False
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def on_disk(self):
+        return self.path is not None
+
+    def write(self, data):
+        if self.error:
+            return len(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+        if not self._inspected:
+            self._header += data[:SNIFF_BYTES - len(self._header)]
+            self._inspect(final=False)
+            if self.error:
+                self._discard()
+                return len(data)
+
+        self._file.write(data)
+        if self.path is None and self.size > self.max_memory:
+            self._rollover()
+        return len(data)
+
+    def _reject(self, reason):
+        self.error = reason
+        logger.warning(f"Rejected upload {self.filename}: {reason}")
+
+    def _inspect(self, final):
+        """Validate as soon as enough leading bytes have arrived"""
+        header = bytes(self._header)
+        header_full = len(header) >= SNIFF_BYTES
+
+        if self.kind is None:
+            if len(header) < 1024 and not final:
+                return
+            self.kind = sniff_kind(header, self.archives)
+            if self.kind is None:
+                self._reject("File content is not a PDF, PNG or JPEG document"
+                             + (" or ZIP archive" if self.archives else ""))
+                return
+            extension = self.filename.rsplit('.', 1)[-1].lower() if self.filename and '.' in self.filename else ''
+            if extension and extension not in KIND_EXTENSIONS[self.kind]:
+                self._reject(f"File extension .{extension} does not match its {self.kind.upper()} content")
+                return
+
+        if self.kind in ('pdf', 'zip'):
+            self._inspected = True
+            return
+
+        dimensions = image_dimensions(self.kind, header)
+        if dimensions is None:
+            if header_full:
+                # Unusually large metadata; leave the check to the decoder
+                self._inspected = True
+            elif final:
+                self._reject("Could not read image dimensions; the file may be truncated")
+            return
+
+        self._inspected = True
+        self.width, self.height = dimensions
+        if min(dimensions) < max(UPLOAD_MIN_SIDE, 1):
+            self._reject(f"Image is too small ({self.width}x{self.height})")
+        elif self.width * self.height > UPLOAD_MAX_PIXELS:
+            self._reject(f"Image is too large ({self.width}x{self.height})")
+
+    def _finish(self):
+        """Run the final checks once the whole upload has been written"""
+        if self._finished:
+            return
+        self._finished = True
+        if self.error:
+            return
+        if self.size == 0:
+            self._reject("File is empty")
+        elif not self._inspected:
+            self._inspect(final=True)
+        if self.error:
+            self._discard()
+
+    def _rollover(self):
+        spool = tempfile.NamedTemporaryFile(dir=self.spool_dir, prefix='.upload-', delete=False)
+        spool.write(self._file.getvalue())
+        self._file = spool
+        self.path = spool.name
+
+    def _discard(self):
+        self._file.close()
+        self._remove_spool()
+        self._file = io.BytesIO()
+
+    def _remove_spool(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def getvalue(self):
+        """Return the uploaded bytes"""
+        self._finish()
+        if isinstance(self._file, io.BytesIO):
+            return self._file.getvalue()
+        position = self._file.tell()
+        self._file.seek(0)
+        try:
+            return self._file.read()
+        finally:
+            self._file.seek(position)
+
+    def persist(self, path):
+        """
+        Store the upload at path, renaming the spool file instead of copying it
+
+        Returns:
+        - The path the upload was stored at
+        """
+        self._finish()
+        if self.path is not None:
+            self._file.close()
+            os.replace(self.path, path)
+            self.path = None
+            self._file = open(path, 'rb')
+        else:
+            with open(path, 'wb') as f:
+                f.write(self._file.getvalue())
+        return path
+
+    # File interface used by werkzeug and FileStorage
+    def seek(self, offset, whence=0):
+        self._finish()
+        return self._file.seek(offset, whence)
+
+    def read(self, size=-1):
+        self._finish()
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        self._finish()
+        return self._file.readline(size)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        self._finish()
+        return iter(self._file)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        self._file.close()
+        # A spool file that was never persisted belongs to no one
+        self._remove_spool()
+
+class IngestRequest(Request):
+    """
+    Request class that streams file uploads through an UploadSpool
+
+    Endpoints named in the BULK_UPLOAD_ENDPOINTS config accept bodies up to
+    BULK_MAX_CONTENT_LENGTH with up to BULK_MAX_FORM_PARTS parts, accept ZIP
+    archives, and spool every file to disk, so a large batch never sits in
+    memory.
+    """
+
+    @property
+    def is_bulk_upload(self):
+        return self.endpoint in current_app.config.get('BULK_UPLOAD_ENDPOINTS', ())
+
+    @property
+    def max_content_length(self):
+        if self.is_bulk_upload:
+            return current_app.config.get('BULK_MAX_CONTENT_LENGTH')
+        return super().max_content_length
+
+    @property
+    def max_form_parts(self):
+        if self.is_bulk_upload:
+            return current_app.config.get('BULK_MAX_FORM_PARTS')
+        return Request.max_form_parts
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.is_bulk_upload:
+            return UploadSpool(filename, max_memory=0, spool_dir=current_app.config.get('UPLOAD_FOLDER'),
+                               archives=True)
+        return UploadSpool(filename, spool_dir=current_app.config.get('UPLOAD_FOLDER'))
+
+    def _load_form_data(self):
+        if 'form' in self.__dict__ or self.mimetype != 'multipart/form-data':
+            return super()._load_form_data()
+        # Reading and spooling the multipart body is the upload-receive stage
+        with stage('upload_receive'):
+            super()._load_form_data()
+
+def inspect_upload(file):
+    """
+    Return the validated spool behind an uploaded file
+
+    Parameters:
+    - file: Uploaded werkzeug FileStorage
+
+    Returns:
+    - UploadSpool with the content hash, detected kind and image dimensions
+
+    Raises:
+    - UploadRejectedError if the content failed validation
+    """
+    spool = file.stream
+    if not isinstance(spool, UploadSpool):
+        # Uploads parsed without IngestRequest are validated with one extra copy
+        spool = UploadSpool(file.filename, spool_dir=current_app.config.get('UPLOAD_FOLDER'))
+        shutil.copyfileobj(file.stream, spool)
+        file.stream = spool
+    spool._finish()
+    if spool.error:
+        raise UploadRejectedError(spool.error)
+    return spool
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(Exception):
+    """Raised when the background queue cannot accept more jobs"""
+
+class SharedJobTable:
+    """
+    SQLite table of job snapshots shared by all worker processes
+
+    With several pre-forked workers, a status lookup can land on a worker
+    other than the one running the job; it answers from this table.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)')
+
+    def _connect(self):
+        # A short-lived connection per operation, as for the OCR cache
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def save(self, job):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO jobs (job_id, updated_at, data) VALUES (?, ?, ?)',
+                         (job['job_id'], job['updated_at'], json.dumps(job, default=str)))
+
+    def load(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self, cutoff):
+        """Remove snapshots not updated since cutoff"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE updated_at < ?', (cutoff,))
+
+class JobManager:
+    """Runs verification jobs on a bounded background worker pool"""
+
+    def __init__(self, max_workers=None, max_pending=None, ttl=None, shared_path=None):
+        """
+        Initialize the job manager
+
+        Parameters:
+        - max_workers: Number of background worker threads
+        - max_pending: Maximum number of queued or running jobs
+        - ttl: Seconds a finished job stays available for status lookups
+        - shared_path: Optional SQLite path (defaults to VERIFY_JOB_DB) where
+          job snapshots are published for other worker processes
+        """
+        self.max_workers = max_workers or int(os.getenv('VERIFY_JOB_WORKERS', 2))
+        self.max_pending = max_pending or int(os.getenv('VERIFY_JOB_MAX_PENDING', 50))
+        self.ttl = ttl or int(os.getenv('VERIFY_JOB_TTL', 60 * 60))
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='verify-job')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+        shared_path = shared_path or os.getenv('VERIFY_JOB_DB')
+        self.shared = None
+        if shared_path:
+            try:
+                self.shared = SharedJobTable(shared_path)
+            except Exception as e:
+                logger.error(f"Job status sharing disabled, could not open {shared_path}: {str(e)}")
+
+    def _publish(self, job_id):
+        """Write the current snapshot of a job to the shared table"""
+        if self.shared is None:
+            return
+        snapshot = self.get(job_id, local_only=True)
+        if snapshot is None:
+            return
+        try:
+            self.shared.save(snapshot)
+        except Exception as e:
+            logger.error(f"Error publishing job {job_id}: {str(e)}")
+
+    def _pending_count(self):
+        return sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+
+    def count(self, status):
+        """Number of jobs in this process with the given status"""
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job['status'] == status)
+
+    def _prune(self, now):
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job['status'] in ('completed', 'failed') and now - job['updated_at'] > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                job['updated_at'] = time.time()
+        self._publish(job_id)
+
+    def submit(self, func, *args, total_steps=1, **kwargs):
+        """
+        Queue a job for background execution
+
+        Parameters:
+        - func: Callable to run; it receives a `progress` keyword argument,
+          a callback to invoke once per completed step
+        - total_steps: Number of steps the job reports progress for
+
+        Returns:
+        - Job ID
+
+        Raises:
+        - JobQueueFullError if too many jobs are already pending
+        """
+        now = time.time()
+        with self.lock:
+            self._prune(now)
+            if self._pending_count() >= self.max_pending:
+                raise JobQueueFullError(f"Verification queue is full ({self.max_pending} jobs pending)")
+
+            job_id = str(uuid.uuid4())
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'progress': {'completed': 0, 'total': total_steps},
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now
+            }
+
+        if self.shared is not None:
+            try:
+                self.shared.prune(now - self.ttl)
+            except Exception as e:
+                logger.error(f"Error pruning shared jobs: {str(e)}")
+        self._publish(job_id)
+
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        logger.info(f"Queued verification job {job_id}")
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status='running')
+
+        def progress():
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    job['progress']['completed'] += 1
+                    job['updated_at'] = time.time()
+            self._publish(job_id)
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+            self._update(job_id, status='completed', result=result)
+            logger.info(f"Verification job {job_id} completed")
+        except Exception as e:
+            logger.error(f"Verification job {job_id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            self._update(job_id, status='failed', error=str(e))
+
+    def get(self, job_id, local_only=False):
+        """Return a snapshot of a job or None if it is unknown or expired"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                snapshot = dict(job)
+                snapshot['progress'] = dict(job['progress'])
+                return snapshot
+
+        if local_only or self.shared is None:
+            return None
+        # The job may be running in another worker process
+        try:
+            snapshot = self.shared.load(job_id)
+        except Exception as e:
+            logger.error(f"Error reading shared job {job_id}: {str(e)}")
+            return None
+        if snapshot and snapshot['status'] in ('completed', 'failed') \
+                and time.time() - snapshot['updated_at'] > self.ttl:
+            return None
+        return snapshot
@@ -0,0 +1,185 @@
+import logging
+from collections import deque
+from itertools import product
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# A declared document type is flagged when another keyword set scores this much higher
+TYPE_MISMATCH_MARGIN = 0.15
+
+class _PyAutomaton:
+    """Pure-Python Aho-Corasick automaton, used when pyahocorasick is not installed"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(value)
+
+        # Breadth-first construction of failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for value in output[state]:
+                yield index, value
+
+def _build_automaton(patterns):
+    if AHOCORASICK_AVAILABLE:
+        automaton = ahocorasick.Automaton()
+        for pattern, value in patterns.items():
+            automaton.add_word(pattern, value)
+        automaton.make_automaton()
+        return automaton
+    return _PyAutomaton(patterns)
+
+class KeywordEngine:
+    """
+    Single-pass OCR correction and keyword scoring for several keyword sets
+
+    Correction patterns and keywords are literal, case-insensitive strings
+    compiled into one Aho-Corasick automaton. Keywords that contain the
+    target of a correction are also compiled in their uncorrected spelling
+    (e.g. 'l|cense' for 'license'), so a single scan of the raw OCR text
+    yields both the corrected text and the keyword matches of every set.
+    """
+
+    def __init__(self, keyword_sets, corrections=None):
+        """
+        Compile the automaton
+
+        Parameters:
+        - keyword_sets: Dictionary of set name (e.g. document type) to keyword list
+        - corrections: Dictionary of literal OCR error to its correction
+        """
+        self.keyword_sets = {name: list(keywords) for name, keywords in keyword_sets.items()}
+        self.corrections = {error.lower(): correction
+                            for error, correction in (corrections or {}).items()}
+
+        # Pattern -> list of ('keyword', (set name, keyword)) / ('correction', replacement)
+        patterns = {}
+        for name, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                for variant in self._spellings(keyword.lower()):
+                    patterns.setdefault(variant, []).append(('keyword', (name, keyword)))
+        for error, correction in self.corrections.items():
+            patterns.setdefault(error, []).append(('correction', correction))
+
+        self.automaton = _build_automaton(
+            {pattern: (len(pattern), tuple(values)) for pattern, values in patterns.items()}
+        )
+
+    def _spellings(self, keyword):
+        """Return a keyword plus every spelling OCR errors would turn into it"""
+        options = [(correction.lower(), error) for error, correction in self.corrections.items()
+                   if correction.lower() in keyword]
+        if not options:
+            return [keyword]
+
+        spellings = set()
+        for choice in product([False, True], repeat=len(options)):
+            spelling = keyword
+            for use_error, (correct, error) in zip(choice, options):
+                if use_error:
+                    spelling = spelling.replace(correct, error)
+            spellings.add(spelling)
+        return sorted(spellings)
+
+    def scan(self, text):
+        """
+        Correct OCR errors and match every keyword set in one pass
+
+        Returns:
+        - Dictionary with the corrected 'text', per-set 'matches' (in keyword
+          list order) and per-set 'scores' (fraction of keywords found)
+        """
+        text = text or ""
+        lowered = text.lower()
+        # Keep the original casing unless lowercasing changed the length
+        base = text if len(lowered) == len(text) else lowered
+
+        found = {name: set() for name in self.keyword_sets}
+        fixes = []
+        for end, (length, values) in self.automaton.iter(lowered):
+            for kind, payload in values:
+                if kind == 'keyword':
+                    found[payload[0]].add(payload[1])
+                else:
+                    fixes.append((end - length + 1, end + 1, payload))
+
+        corrected = self._apply_fixes(base, fixes) if fixes else base
+
+        matches = {name: [keyword for keyword in keywords if keyword in found[name]]
+                   for name, keywords in self.keyword_sets.items()}
+        scores = {name: (len(matches[name]) / len(keywords) if keywords else 0)
+                  for name, keywords in self.keyword_sets.items()}
+        return {'text': corrected, 'matches': matches, 'scores': scores}
+
+    @staticmethod
+    def _apply_fixes(text, fixes):
+        # Leftmost-longest, non-overlapping replacement
+        fixes.sort(key=lambda fix: (fix[0], -(fix[1] - fix[0])))
+        parts = []
+        position = 0
+        for start, end, replacement in fixes:
+            if start < position:
+                continue
+            parts.append(text[position:start])
+            parts.append(replacement)
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
+    def correct(self, text):
+        """Return text with OCR corrections applied"""
+        return self.scan(text)['text']
+
+    @staticmethod
+    def type_check(scan, declared_type, margin=TYPE_MISMATCH_MARGIN):
+        """
+        Compare the declared document type with the best-scoring keyword set
+
+        Returns:
+        - Tuple of (detected type, whether the declared type looks wrong)
+        """
+        scores = scan['scores']
+        detected = max(scores, key=scores.get)
+        declared_score = scores.get(declared_type, 0)
+        mismatch = detected != declared_type and scores[detected] - declared_score >= margin
+        return detected, mismatch
@@ -0,0 +1,104 @@
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    @property
+    def loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+def preload(*modules):
+    """Import lazy modules now, e.g. from a warm-up thread"""
+    for module in modules:
+        module._load()
+
+def module_available(*names):
+    """Check that top-level modules are installed without importing them"""
+    try:
+        return all(importlib.util.find_spec(name) is not None for name in names)
+    except (ImportError, ValueError):
+        return False
+
+class Warmup:
+    """Loads registered engines in a background thread and tracks which are warm"""
+
+    def __init__(self):
+        self.engines = {}
+        self.loaders = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def register(self, name, loader, enabled=True):
+        """
+        Register an engine to warm up
+
+        Parameters:
+        - name: Engine name reported by status()
+        - loader: Callable that loads the engine
+        - enabled: Disabled engines are reported but never loaded
+        """
+        with self.lock:
+            self.engines[name] = {'status': 'pending' if enabled else 'disabled'}
+            if enabled:
+                self.loaders.append((name, loader))
+
+    def run(self):
+        """Load every registered engine in the calling thread"""
+        for name, loader in self.loaders:
+            with self.lock:
+                if self.engines[name]['status'] == 'ready':
+                    continue
+                self.engines[name] = {'status': 'warming'}
+            start = time.perf_counter()
+            try:
+                loader()
+                state = {'status': 'ready'}
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {str(e)}")
+                state = {'status': 'failed', 'error': str(e)}
+            state['seconds'] = round(time.perf_counter() - start, 3)
+            with self.lock:
+                self.engines[name] = state
+            logger.info(f"Warm-up of {name}: {state['status']} in {state['seconds']}s")
+
+    def start(self):
+        """Start warming up in a background thread"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        self.thread.start()
+
+    def status(self):
+        """Return (ready, engines) where ready means nothing is pending or warming"""
+        with self.lock:
+            engines = {name: dict(state) for name, state in self.engines.items()}
+        ready = all(state['status'] in ('ready', 'disabled', 'failed') for state in engines.values())
+        return ready, engines
@@ -0,0 +1,409 @@
+"""
+Prometheus-format metrics for the verification service
+
+Pipeline stages are timed with stage():
+
+    with stage('ocr'):
+        text = engine.image_to_string(img)
+
+Inside collect_stages(), stage timings are gathered into a dict instead of
+being observed directly. verify_document uses this to return its timings
+from document worker processes, and the parent process observes them with
+observe_stages(), so no timing is lost or counted twice.
+
+With METRICS_DIR set (pre-forked workers), each process periodically
+writes a snapshot there and /metrics merges the snapshots of all
+processes. Counters and histograms of exited (e.g. recycled) workers keep
+counting towards the totals; their gauges are dropped.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows; multi-process metrics only run under gunicorn, which is
+    # POSIX-only, so there are no concurrent retirements to serialize
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from fast keyword scans to slow multi-page OCR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _merge(merged, snapshot, gauges=True):
+    """Add the samples of one process snapshot to merged, in place"""
+    for name, metric in snapshot.items():
+        if metric['type'] == 'gauge' and not gauges:
+            continue
+        if name not in merged:
+            merged[name] = dict(metric, samples={})
+        target = merged[name]['samples']
+        for key, value in metric['samples'].items():
+            if key not in target:
+                target[key] = value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(target[key], value)]
+            else:
+                target[key] += value
+    return merged
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self):
+        with self.lock:
+            samples = {json.dumps(key): self._copy(value) for key, value in self.samples.items()}
+        return {'type': self.kind, 'help': self.documentation, 'labels': self.labels, 'samples': samples}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.touch()
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = value
+        self.registry.touch()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.touch()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Count the enclosed block as in flight while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class CallbackGauge(_Metric):
+    """Gauge whose value is read from a callable at collection time"""
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, func):
+        super().__init__(registry, name, documentation)
+        self.func = func
+
+    def snapshot(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {str(e)}")
+            value = 0
+        return {'type': self.kind, 'help': self.documentation, 'labels': (),
+                'samples': {json.dumps(()): value}}
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                sample = self.samples[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+        self.registry.touch()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['buckets'] = self.buckets
+        return snapshot
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+class Registry:
+    """Metrics of this process, optionally shared with sibling worker processes"""
+
+    def __init__(self, directory=None, dump_interval=None):
+        """
+        Initialize the registry
+
+        Parameters:
+        - directory: Directory for per-process snapshots (defaults to METRICS_DIR);
+          without one, only this process's metrics are exposed
+        - dump_interval: Seconds between snapshots of a changed registry
+        """
+        self.directory = directory if directory is not None else os.getenv('METRICS_DIR', '')
+        self.dump_interval = dump_interval or float(os.getenv('METRICS_DUMP_INTERVAL', 2))
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._dirty = False
+        self._dumper_pid = None
+        self._dump_lock = threading.Lock()
+        self._retired = False
+
+    def _register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(self, name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(self, name, documentation, labels))
+
+    def gauge_callback(self, name, documentation, func):
+        return self._register(CallbackGauge(self, name, documentation, func))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labels, buckets))
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    # Sharing between pre-forked worker processes
+
+    def touch(self):
+        """Mark the registry changed and make sure this process writes snapshots"""
+        self._dirty = True
+        if self.directory and self._dumper_pid != os.getpid():
+            with self.lock:
+                if self._dumper_pid != os.getpid():
+                    # Started per process; a forked worker does not inherit the thread
+                    self._dumper_pid = os.getpid()
+                    threading.Thread(target=self._dump_loop, name='metrics-dump', daemon=True).start()
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def dump(self):
+        """Write this process's snapshot for sibling processes to merge"""
+        with self._dump_lock:
+            if not self._retired:
+                self._write_snapshot()
+
+    def _write_snapshot(self, snapshot=None, path=None):
+        os.makedirs(self.directory, exist_ok=True)
+        path = path or self._snapshot_path(os.getpid())
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot if snapshot is not None else self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def _dump_loop(self):
+        while not self._retired:
+            time.sleep(self.dump_interval)
+            if self._dirty:
+                self._dirty = False
+                try:
+                    self.dump()
+                except Exception as e:
+                    logger.error(f"Error writing metrics snapshot: {str(e)}")
+
+    def retire(self):
+        """
+        Fold this process's counters and histograms into the retired totals before it exits
+
+        Recycled workers would otherwise leave one snapshot each behind, and
+        their pids may be reused by later workers.
+        """
+        if not self.directory:
+            return
+        with self._dump_lock:
+            self._retired = True
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, 'metrics-retired.json')
+            with open(os.path.join(self.directory, 'metrics-retired.lock'), 'w') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(path) as f:
+                        retired = json.load(f)
+                except (OSError, ValueError):
+                    retired = {}
+                self._write_snapshot(_merge(retired, self.snapshot(), gauges=False), path)
+            try:
+                os.remove(self._snapshot_path(os.getpid()))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _sibling_snapshots(self):
+        """Snapshots of the other processes, as (snapshot, process is alive) pairs"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            label = name[len('metrics-'):-len('.json')]
+            if label == 'retired':
+                alive = False
+            else:
+                if int(label) == os.getpid():
+                    continue
+                alive = self._alive(int(label))
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append((json.load(f), alive))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    @staticmethod
+    def clear_directory(directory):
+        """Remove snapshots left by a previous run"""
+        if directory and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith('metrics-'):
+                    os.remove(os.path.join(directory, name))
+
+    def render(self):
+        """Render this process's metrics, merged with its siblings', in Prometheus text format"""
+        merged = self.snapshot()
+        for snapshot, alive in self._sibling_snapshots():
+            # Only metrics this process knows are rendered, so the output
+            # never mixes in series from an older deployment
+            _merge(merged, {name: metric for name, metric in snapshot.items() if name in merged},
+                   gauges=alive)
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labels = metric['labels']
+            for key, value in sorted(metric['samples'].items()):
+                values = json.loads(key)
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels, values)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + [float('inf')], value):
+                    cumulative += count
+                    le = _format_value(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(labels, values, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels, values)} {_format_value(float(value[-2]))}")
+                lines.append(f"{name}_count{_format_labels(labels, values)} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+# Pipeline stages: upload_receive, decode, preprocess, ocr, keyword_scoring,
+# model_inference, persistence
+STAGE_SECONDS = registry.histogram(
+    'docverify_stage_seconds', 'Time spent in each verification pipeline stage',
+    labels=('stage',)
+)
+
+_stage_collector = contextvars.ContextVar('stage_collector', default=None)
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _stage_collector.get()
+        if timings is None:
+            STAGE_SECONDS.observe(elapsed, stage=name)
+        else:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+@contextmanager
+def collect_stages():
+    """Gather stage timings of the enclosed block into a dict instead of observing them"""
+    timings = {}
+    token = _stage_collector.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_collector.reset(token)
+
+def observe_stages(timings):
+    """Observe stage timings gathered by collect_stages(), e.g. in another process"""
+    for name, elapsed in (timings or {}).items():
+        STAGE_SECONDS.observe(elapsed, stage=name)
@@ -0,0 +1,207 @@
+"""
+Inference backends for the document classifier
+
+Backends:
+- torch:      fp32 PyTorch model (default)
+- torch-int8: PyTorch model with dynamic int8 quantization of Linear layers
+- onnx:       ONNX Runtime session over an exported model.onnx
+- onnx-int8:  ONNX Runtime session over the dynamically quantized model.int8.onnx
+
+Export a model directory and check it against fp32 with:
+    python model_backends.py export --output models/doc-classifier
+    python model_backends.py parity --model-dir models/doc-classifier --backend onnx-int8
+"""
+import os
+import sys
+import logging
+import argparse
+from lazy_loading import LazyModule, module_available
+
+# Inference libraries are imported when a classifier is first loaded
+np = LazyModule('numpy')
+torch = LazyModule('torch')
+transformers = LazyModule('transformers')
+onnxruntime = LazyModule('onnxruntime')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ONNX_AVAILABLE = module_available('onnxruntime')
+
+DEFAULT_MODEL_NAME = "distilbert-base-uncased"
+ONNX_FILENAME = "model.onnx"
+ONNX_INT8_FILENAME = "model.int8.onnx"
+MODEL_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+def _softmax_valid(logits):
+    """Probability of the 'valid document' class for each row of logits"""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return (exp[:, 1] / exp.sum(axis=1)).tolist()
+
+class TorchClassifier:
+    """PyTorch classifier, optionally with dynamic int8 quantization"""
+
+    def __init__(self, model_path, device="cpu", quantize=False):
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_path)
+        model = transformers.AutoModelForSequenceClassification.from_pretrained(model_path, num_labels=2)
+        model.eval()
+        if quantize:
+            # Dynamic quantization only runs on CPU
+            device = "cpu"
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(device)
+        self.device = device
+        self.name = 'torch-int8' if quantize else 'torch'
+
+    def score(self, texts):
+        """Return the probability of being a valid document for each text"""
+        inputs = self.tokenizer(texts, truncation=True, padding=True, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return _softmax_valid(logits.float().cpu().numpy())
+
+class OnnxClassifier:
+    """ONNX Runtime classifier loaded from an exported model directory"""
+
+    def __init__(self, model_dir, quantized=False):
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime is not installed")
+        filename = ONNX_INT8_FILENAME if quantized else ONNX_FILENAME
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run 'python model_backends.py export' first")
+
+        options = onnxruntime.SessionOptions()
+        threads = int(os.getenv('ONNX_INTRA_OP_THREADS', 0))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir)
+        self.name = 'onnx-int8' if quantized else 'onnx'
+
+    def score(self, texts):
+        """Return the probability of being a valid document for each text"""
+        inputs = self.tokenizer(texts, truncation=True, padding=True, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names}
+        logits = self.session.run(None, feeds)[0]
+        return _softmax_valid(logits)
+
+def load_classifier(backend=None, model_path=None, device="cpu"):
+    """
+    Load the document classifier
+
+    Parameters:
+    - backend: One of MODEL_BACKENDS (defaults to MODEL_BACKEND or 'torch')
+    - model_path: Local model directory or hub name (defaults to MODEL_DIR,
+      then the base model)
+    - device: Torch device for the torch backend
+
+    Returns:
+    - Classifier with a tokenizer attribute and a score(texts) method
+    """
+    backend = backend or os.getenv('MODEL_BACKEND', 'torch')
+    model_path = model_path or os.getenv('MODEL_DIR') or DEFAULT_MODEL_NAME
+
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend}")
+
+    if backend.startswith('onnx'):
+        return OnnxClassifier(model_path, quantized=backend == 'onnx-int8')
+    return TorchClassifier(model_path, device=device, quantize=backend == 'torch-int8')
+
+def export_model(output_dir, model_name=DEFAULT_MODEL_NAME, quantize=True):
+    """
+    Save the fp32 model, its ONNX export and an int8 ONNX variant to a directory
+
+    All backends then load the same weights from output_dir, so their scores
+    can be compared against each other.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+    model.save_pretrained(output_dir)
+
+    sample = tokenizer(["medical license"], return_tensors="pt")
+    onnx_path = os.path.join(output_dir, ONNX_FILENAME)
+    torch.onnx.export(
+        model,
+        (sample['input_ids'], sample['attention_mask']),
+        onnx_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'}
+        },
+        opset_version=14
+    )
+    logger.info(f"Exported ONNX model to {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(output_dir, ONNX_INT8_FILENAME)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 ONNX model to {int8_path}")
+
+def check_parity(model_dir, backend, texts=None, tolerance=0.05, threshold=0.7):
+    """
+    Compare a backend's scores against the fp32 torch model from the same directory
+
+    Returns:
+    - Dictionary with max/mean absolute score difference and decision agreement
+    """
+    texts = texts or [
+        "pakistan medical and dental council license to practice medicine registration number",
+        "bachelor of medicine and bachelor of surgery mbbs awarded by the university",
+        "quarterly sales report for the northern region",
+        "certificate of completion",
+        ""
+    ]
+    reference = TorchClassifier(model_dir).score(texts)
+    candidate = load_classifier(backend, model_dir).score(texts)
+
+    diffs = [abs(a - b) for a, b in zip(reference, candidate)]
+    agreement = sum((a >= threshold) == (b >= threshold) for a, b in zip(reference, candidate))
+    return {
+        'backend': backend,
+        'texts': len(texts),
+        'max_abs_diff': max(diffs),
+        'mean_abs_diff': sum(diffs) / len(diffs),
+        'decision_agreement': agreement / len(texts),
+        'passed': max(diffs) <= tolerance and agreement == len(texts)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export fp32, ONNX and int8 ONNX models')
+    export_parser.add_argument('--output', required=True)
+    export_parser.add_argument('--model-name', default=DEFAULT_MODEL_NAME)
+    export_parser.add_argument('--no-quantize', action='store_true')
+
+    parity_parser = subparsers.add_parser('parity', help='Compare a backend against fp32 scores')
+    parity_parser.add_argument('--model-dir', required=True)
+    parity_parser.add_argument('--backend', choices=MODEL_BACKENDS, default='onnx-int8')
+    parity_parser.add_argument('--tolerance', type=float, default=0.05)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_model(args.output, args.model_name, quantize=not args.no_quantize)
+        return 0
+
+    result = check_parity(args.model_dir, args.backend, tolerance=args.tolerance)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return 0 if result['passed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of a bytes object"""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def settings_fingerprint(*settings):
+    """
+    Build a stable fingerprint for the settings that influence a cached result
+
+    Any JSON-serializable values can be passed (keyword lists, preprocessing
+    parameters, OCR corrections). When one of them changes, the fingerprint
+    changes and existing cache entries are treated as stale.
+    """
+    encoded = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+class OCRCache:
+    """Persistent, content-addressed cache of OCR output"""
+
+    def __init__(self, db_path=None, max_entries=None, max_bytes=None, max_age=None):
+        """
+        Initialize the cache
+
+        Parameters:
+        - db_path: Path to the SQLite cache file
+        - max_entries: Maximum number of cached documents
+        - max_bytes: Maximum total size of cached text in bytes
+        - max_age: Maximum age of an entry in seconds
+        """
+        self.db_path = db_path or os.getenv('OCR_CACHE_PATH', 'ocr_cache.sqlite3')
+        self.max_entries = max_entries or int(os.getenv('OCR_CACHE_MAX_ENTRIES', 5000))
+        self.max_bytes = max_bytes or int(os.getenv('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.max_age = max_age or int(os.getenv('OCR_CACHE_MAX_AGE', 30 * 24 * 60 * 60))
+        self.enabled = os.getenv('OCR_CACHE_ENABLED', '1') != '0'
+
+        if self.enabled:
+            try:
+                self._init_db()
+            except Exception as e:
+                logger.error(f"OCR cache disabled, could not open {self.db_path}: {str(e)}")
+                self.enabled = False
+
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe to use
+        # from threads and worker processes at the same time
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ocr_cache_accessed ON ocr_cache (accessed_at)')
+
+    @staticmethod
+    def _key(content_hash, namespace):
+        return f"{namespace}:{content_hash}"
+
+    def get(self, content_hash, fingerprint, namespace='default'):
+        """
+        Look up cached OCR text
+
+        Parameters:
+        - content_hash: SHA-256 of the document bytes
+        - fingerprint: Fingerprint of the settings the text was produced with
+        - namespace: Pipeline the text belongs to (e.g. document type)
+
+        Returns:
+        - Cached text or None on a miss
+        """
+        if not self.enabled or not content_hash:
+            return None
+
+        key = self._key(content_hash, namespace)
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT fingerprint, text, created_at FROM ocr_cache WHERE cache_key = ?',
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                cached_fingerprint, text, created_at = row
+                if cached_fingerprint != fingerprint or now - created_at > self.max_age:
+                    # Settings changed or entry expired - drop it
+                    conn.execute('DELETE FROM ocr_cache WHERE cache_key = ?', (key,))
+                    return None
+
+                conn.execute('UPDATE ocr_cache SET accessed_at = ? WHERE cache_key = ?', (now, key))
+
+            logger.info(f"OCR cache hit for {key[:40]}")
+            return text
+        except Exception as e:
+            logger.error(f"Error reading OCR cache: {str(e)}")
+            return None
+
+    def put(self, content_hash, fingerprint, text, namespace='default'):
+        """Store OCR text for a document and evict old entries if needed"""
+        if not self.enabled or not content_hash or not text:
+            return
+
+        key = self._key(content_hash, namespace)
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO ocr_cache '
+                    '(cache_key, fingerprint, text, size, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, fingerprint, text, len(text.encode('utf-8')), now, now)
+                )
+                self._evict(conn, now)
+        except Exception as e:
+            logger.error(f"Error writing OCR cache: {str(e)}")
+
+    def _evict(self, conn, now):
+        """Remove expired entries, then least recently used ones over the limits"""
+        conn.execute('DELETE FROM ocr_cache WHERE created_at < ?', (now - self.max_age,))
+
+        count, total_size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache'
+        ).fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            'SELECT cache_key, size FROM ocr_cache ORDER BY accessed_at ASC'
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total_size -= size
+        conn.executemany('DELETE FROM ocr_cache WHERE cache_key = ?', evicted)
+        logger.info(f"Evicted {len(evicted)} OCR cache entries")
+
+    def clear(self):
+        """Remove all cached entries"""
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute('DELETE FROM ocr_cache')
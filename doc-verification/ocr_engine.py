@@ -0,0 +1,192 @@
+import os
+import logging
+import threading
+from lazy_loading import LazyModule, module_available
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# OCR libraries are imported on first use to keep service startup fast
+PYTESSERACT_AVAILABLE = module_available('pytesseract')
+TESSEROCR_AVAILABLE = module_available('tesserocr', 'PIL')
+pytesseract = LazyModule('pytesseract')
+tesserocr = LazyModule('tesserocr')
+Image = LazyModule('PIL.Image')
+
+# Most Tesseract API instances a process keeps loaded; OCR calls beyond this
+# wait for an instance to be returned instead of loading another copy
+OCR_ENGINE_POOL_SIZE = max(1, int(os.getenv('OCR_ENGINE_POOL_SIZE', min(4, os.cpu_count() or 1))))
+
+class PytesseractEngine:
+    """OCR backend that runs the tesseract CLI once per image"""
+
+    name = 'pytesseract'
+
+    def __init__(self, lang='eng'):
+        self.lang = lang
+
+    def image_to_string(self, image):
+        """Recognize text in a numpy array or PIL image"""
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+    def warm_up(self, count=None):
+        """Import pytesseract and check the tesseract binary can be run"""
+        pytesseract.get_tesseract_version()
+
+    def close(self):
+        """Nothing to release; every call runs its own tesseract process"""
+
+class TesserocrEngine:
+    """
+    OCR backend that keeps Tesseract API instances alive in-process
+
+    A bounded pool of API instances is shared by every thread of the
+    process. Language data is loaded once per instance and reused across
+    calls, so there is no process fork, temp file or traineddata reload per
+    image, and new request or PDF page threads reuse the loaded instances.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', tessdata_path=None, pool_size=None):
+        self.lang = lang
+        self.tessdata_path = tessdata_path or os.getenv('TESSDATA_PREFIX')
+        self.pool_size = max(1, pool_size or OCR_ENGINE_POOL_SIZE)
+        # PyTessBaseAPI is not thread-safe, so each call checks an instance out
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+    def _create_api(self):
+        kwargs = {'lang': self.lang}
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        logger.info(f"Loaded Tesseract engine ({self.lang}), instance {self._created} of {self.pool_size}")
+        return api
+
+    def _checkout(self):
+        with self._available:
+            while not self._idle and self._created >= self.pool_size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        # Language data is loaded outside the lock so other calls can proceed
+        try:
+            return self._create_api()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def _checkin(self, api):
+        with self._available:
+            if self._closed:
+                api.End()
+                return
+            self._idle.append(api)
+            self._available.notify()
+
+    def image_to_string(self, image):
+        """Recognize text in a numpy array or PIL image"""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        api = self._checkout()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            self._checkin(api)
+
+    def warm_up(self, count=None):
+        """
+        Load API instances ahead of the first request
+
+        Parameters:
+        - count: Number of instances to have loaded (defaults to the pool size)
+        """
+        count = min(count or self.pool_size, self.pool_size)
+        apis = []
+        try:
+            while len(apis) < count:
+                apis.append(self._checkout())
+        finally:
+            for api in apis:
+                self._checkin(api)
+
+    def close(self):
+        """End the loaded API instances; instances in use are ended when returned"""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for api in idle:
+            api.End()
+
+OCR_BACKENDS = {
+    'pytesseract': PytesseractEngine,
+    'tesserocr': TesserocrEngine
+}
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+def resolve_backend(backend=None):
+    """Name of the backend create_ocr_engine uses for an OCR_BACKEND value"""
+    backend = (backend or os.getenv('OCR_BACKEND', 'auto')).lower()
+    if backend == 'auto' or (backend == 'tesserocr' and not TESSEROCR_AVAILABLE):
+        return 'tesserocr' if TESSEROCR_AVAILABLE else 'pytesseract'
+    return backend
+
+def engine_settings():
+    """Backend and language the OCR output depends on, for cache fingerprints"""
+    return {'backend': resolve_backend(), 'lang': os.getenv('OCR_LANG', 'eng')}
+
+def create_ocr_engine(backend=None, lang=None):
+    """
+    Create an OCR engine
+
+    Parameters:
+    - backend: 'auto', 'tesserocr' or 'pytesseract' (defaults to OCR_BACKEND)
+    - lang: Tesseract language code (defaults to OCR_LANG or 'eng')
+
+    Returns:
+    - Engine with an image_to_string(image) method
+    """
+    backend = (backend or os.getenv('OCR_BACKEND', 'auto')).lower()
+    lang = lang or os.getenv('OCR_LANG', 'eng')
+
+    if backend == 'tesserocr' and not TESSEROCR_AVAILABLE:
+        logger.warning("tesserocr is not installed, falling back to pytesseract")
+    backend = resolve_backend(backend)
+
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {backend}")
+
+    return OCR_BACKENDS[backend](lang=lang)
+
+def get_ocr_engine():
+    """Return the engine shared by this worker process, creating it on first use"""
+    global _engine, _engine_pid
+    with _engine_lock:
+        # A forked worker must not reuse its parent's native engine state
+        if _engine is None or _engine_pid != os.getpid():
+            _engine = create_ocr_engine()
+            _engine_pid = os.getpid()
+            logger.info(f"Using {_engine.name} OCR backend")
+        return _engine
+
+def shutdown_ocr_engine():
+    """Release the native OCR state of this worker process, e.g. before it exits"""
+    global _engine
+    with _engine_lock:
+        # An engine inherited from the parent process is not ours to release
+        if _engine is not None and _engine_pid == os.getpid():
+            _engine.close()
+        _engine = None
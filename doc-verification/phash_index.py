@@ -0,0 +1,361 @@
+"""
+Perceptual-hash index of license and degree images
+
+Every verified license and degree image gets a 64-bit DCT perceptual hash
+of its ink, turned upright, deskewed and cropped to the text, so the hash
+survives re-compression, rescaling, blur, rotation and re-photographing.
+The hashes are kept in SQLite with multi-index hashing: each hash is split
+into four 16-bit chunks, each chunk column is indexed, and two hashes within
+Hamming distance r must share a chunk within distance r // 4. A search
+probes the indexed chunk values near the query's chunks and then checks the
+full distance of the few candidates, so lookups stay fast at hundreds of
+thousands of documents.
+
+A perceptual hash describes the page layout, so two certificates printed
+from the same template for different doctors hash as close as two photos
+of one certificate. Near hits are therefore confirmed with same_document(),
+which aligns the two pages (ORB features and a RANSAC homography) and
+compares their ink region by region. Only confirmed duplicates may share OCR
+output or be flagged as one certificate used by several accounts.
+
+Maintenance:
+    python phash_index.py stats
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+from itertools import combinations
+from lazy_loading import LazyModule
+
+# Imaging libraries are imported on first use to keep service startup fast
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+# Largest Hamming distance treated as a near-duplicate candidate; up to 11
+# bits a search probes chunk values within 2 bits, about 550 index lookups
+PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', 11))
+# Expired entries are purged at most this often from the write path
+PURGE_INTERVAL = 60 * 60
+
+# Longest side pages are compared at by same_document()
+MATCH_SIDE = 1000
+# Homography inliers needed before two pages are compared at all
+MATCH_MIN_INLIERS = 60
+# Largest share of differing ink in any region of two aligned pages; a
+# different name or registration number differs by far more in its region
+MATCH_MAX_DIFFERENCE = float(os.getenv('PHASH_MATCH_MAX_DIFFERENCE', 0.45))
+MATCH_CELL = 40
+
+def normalized_ink(gray):
+    """
+    Ink of a page turned upright, deskewed and cropped to the text
+
+    Uses the triage statistics, so photos of one certificate taken at
+    different angles, distances and lighting line up.
+
+    Returns:
+    - uint8 ink mask, or None if the page has no ink
+    """
+    from triage import INK_DELTA, analysis_copy, darkness, deskew, detect_rotation, upright_view
+
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    ink = darkness(analysis_copy(gray)) > INK_DELTA
+    if not ink.any():
+        return None
+    ink = deskew(np.ascontiguousarray(upright_view(ink, detect_rotation(ink))))
+    rows, cols = np.nonzero(ink)
+    if len(rows) == 0:
+        return None
+    # Percentiles rather than extremes, so specks in the margin do not count
+    top, bottom = np.percentile(rows, (0.5, 99.5)).astype(int)
+    left, right = np.percentile(cols, (0.5, 99.5)).astype(int)
+    return ink[top:bottom + 1, left:right + 1].astype(np.uint8) * 255
+
+def perceptual_hash(gray):
+    """
+    64-bit DCT perceptual hash of a page
+
+    The normalized ink is reduced to 32x32, and each of the 8x8
+    lowest-frequency DCT coefficients becomes one bit: set when it is above
+    their median.
+
+    Parameters:
+    - gray: Grayscale (or BGR) numpy array
+
+    Returns:
+    - Hash as an int, or None if the page has no ink
+    """
+    ink = normalized_ink(gray)
+    if ink is None:
+        return None
+    small = cv2.resize(ink, (32, 32), interpolation=cv2.INTER_AREA)
+    coefficients = cv2.dct(small.astype(np.float32))[:8, :8].flatten()
+    # The DC term is the overall amount of ink, so it is left out of the median
+    median = np.median(coefficients[1:])
+    value = 0
+    for bit in coefficients > median:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def split_hash(value):
+    """Split a hash into its CHUNKS chunk values, most significant first"""
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - i))) & mask for i in range(CHUNKS)]
+
+def chunk_neighbours(chunk, radius):
+    """All chunk values within Hamming distance radius of chunk"""
+    values = [chunk]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), distance):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+def match_view(img):
+    """Scale a page so its longest side is MATCH_SIDE, as same_document compares it"""
+    scale = MATCH_SIDE / max(img.shape[:2])
+    if scale == 1:
+        return img
+    size = (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+def same_document(page, other):
+    """
+    Check whether two page images show the same physical document
+
+    The second page is aligned onto the first with ORB features and a RANSAC
+    homography, then the ink of both is compared region by region. Pages
+    from the same template with a different name, number or date differ
+    strongly in those regions.
+
+    Parameters:
+    - page, other: Grayscale numpy arrays; pages already passed through
+      match_view() are not scaled again
+
+    Returns:
+    - Tuple of (same document, largest regional difference or None when the
+      pages could not be aligned)
+    """
+    # Imported here to keep the triage statistics in one place
+    from triage import INK_DELTA, darkness
+
+    page, other = match_view(page), match_view(other)
+    orb = cv2.ORB_create(1500)
+    page_points, page_descriptors = orb.detectAndCompute(page, None)
+    other_points, other_descriptors = orb.detectAndCompute(other, None)
+    if page_descriptors is None or other_descriptors is None:
+        return False, None
+    matches = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True).match(other_descriptors, page_descriptors)
+    if len(matches) < MATCH_MIN_INLIERS:
+        return False, None
+    source = np.float32([other_points[match.queryIdx].pt for match in matches])
+    target = np.float32([page_points[match.trainIdx].pt for match in matches])
+    homography, inliers = cv2.findHomography(source, target, cv2.RANSAC, 4.0)
+    if homography is None or int(inliers.sum()) < MATCH_MIN_INLIERS:
+        return False, None
+
+    height, width = page.shape
+    aligned = cv2.warpPerspective(other, homography, (width, height), borderValue=255)
+    covered = cv2.warpPerspective(np.ones_like(other), homography, (width, height)) > 0
+    # Slightly blurred ink tolerates the remaining misalignment of a pixel or two
+    page_ink = cv2.GaussianBlur((darkness(page) > INK_DELTA).astype(np.float32), (7, 7), 0)
+    other_ink = cv2.GaussianBlur((darkness(aligned) > INK_DELTA).astype(np.float32), (7, 7), 0)
+    difference = np.abs(page_ink - other_ink) * covered
+    union = np.maximum(page_ink, other_ink) * covered
+
+    rows, cols = height // MATCH_CELL, width // MATCH_CELL
+    def cells(values):
+        trimmed = values[:rows * MATCH_CELL, :cols * MATCH_CELL]
+        return trimmed.reshape(rows, MATCH_CELL, cols, MATCH_CELL).sum(axis=(1, 3))
+    difference, union = cells(difference), cells(union)
+    inked = union > MATCH_CELL
+    if not inked.any():
+        return False, None
+    worst = float((difference[inked] / union[inked]).max())
+    return worst <= MATCH_MAX_DIFFERENCE, round(worst, 3)
+
+class PerceptualHashIndex:
+    """Persistent perceptual-hash index with multi-index Hamming search"""
+
+    def __init__(self, db_path=None, max_distance=None, retention=None):
+        """
+        Initialize the index
+
+        Parameters:
+        - db_path: Path to the SQLite index file
+        - max_distance: Default search radius in bits
+        - retention: Seconds to keep an entry; 0 keeps entries forever
+          (defaults to RESULT_RETENTION, so entries live as long as results)
+        """
+        self.db_path = db_path or os.getenv('PHASH_INDEX_PATH', 'phash_index.sqlite3')
+        self.max_distance = PHASH_MAX_DISTANCE if max_distance is None else max_distance
+        if retention is None:
+            retention = int(os.getenv('RESULT_RETENTION', 365 * 24 * 60 * 60))
+        self.retention = retention
+        self.enabled = os.getenv('PHASH_INDEX_ENABLED', '1') != '0'
+        self._last_purge = 0
+
+        if self.enabled:
+            try:
+                self._init_db()
+            except Exception as e:
+                logger.error(f"Perceptual-hash index disabled, could not open {self.db_path}: {str(e)}")
+                self.enabled = False
+
+    def _connect(self):
+        # A short-lived connection per operation keeps the index safe to use
+        # from threads and worker processes at the same time
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        chunk_columns = ', '.join(f"c{i} INTEGER NOT NULL" for i in range(CHUNKS))
+        with self._connect() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS phashes (
+                    entry_id INTEGER PRIMARY KEY,
+                    phash INTEGER NOT NULL,
+                    {chunk_columns},
+                    content_hash TEXT NOT NULL,
+                    result_id TEXT,
+                    email TEXT,
+                    document_type TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            for i in range(CHUNKS):
+                conn.execute(f'CREATE INDEX IF NOT EXISTS idx_phashes_c{i} ON phashes (c{i})')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_phashes_content ON phashes (content_hash)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_phashes_created ON phashes (created_at)')
+
+    def add(self, phash, content_hash, result_id=None, email=None, document_type=None, created_at=None):
+        """
+        Index a document
+
+        Parameters:
+        - phash: Perceptual hash of the document image
+        - content_hash: SHA-256 of the document bytes
+        - result_id: ID of the verification result for the document
+        - email: Email of the account the document was uploaded by
+        - document_type: license or degree
+        - created_at: Optional timestamp, defaults to now
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO phashes (phash, {', '.join(f'c{i}' for i in range(CHUNKS))}, content_hash, "
+                f"result_id, email, document_type, created_at) VALUES ({', '.join('?' * (CHUNKS + 6))})",
+                (_to_signed(phash), *split_hash(phash), content_hash, result_id,
+                 (email or '').lower() or None, document_type, created_at or now)
+            )
+            if self.retention and now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                deleted = conn.execute('DELETE FROM phashes WHERE created_at < ?',
+                                       (now - self.retention,)).rowcount
+                if deleted:
+                    logger.info(f"Purged {deleted} expired perceptual-hash entries")
+
+    def hash_for(self, content_hash):
+        """Return the stored perceptual hash of a document's bytes, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT phash FROM phashes WHERE content_hash = ? LIMIT 1',
+                               (content_hash,)).fetchone()
+        return _to_unsigned(row[0]) if row else None
+
+    def search(self, phash, max_distance=None, document_type=None):
+        """
+        Find indexed documents within a Hamming distance of a hash
+
+        Parameters:
+        - phash: Query hash
+        - max_distance: Search radius in bits (defaults to PHASH_MAX_DISTANCE)
+        - document_type: Optional document type to restrict the search to
+
+        Returns:
+        - List of match dicts (result_id, content_hash, email, document_type,
+          distance, created_at), nearest first
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        chunk_radius = max_distance // CHUNKS
+
+        # Pigeonhole: a hash within max_distance has at least one chunk
+        # within chunk_radius of the query's chunk at the same position
+        probes = [chunk_neighbours(chunk, chunk_radius) for chunk in split_hash(phash)]
+
+        rows = {}
+        type_filter = ' AND document_type = ?' if document_type else ''
+        with self._connect() as conn:
+            for i, values in enumerate(probes):
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(values), 900):
+                    batch = values[start:start + 900]
+                    query = (f"SELECT entry_id, phash, content_hash, result_id, email, document_type, created_at "
+                             f"FROM phashes WHERE c{i} IN ({', '.join('?' * len(batch))}){type_filter}")
+                    params = batch + [document_type] if document_type else batch
+                    for row in conn.execute(query, params):
+                        rows[row[0]] = row
+
+        matches = []
+        for _, stored, content_hash, result_id, email, entry_type, created_at in rows.values():
+            distance = hamming(_to_unsigned(stored), phash)
+            if distance <= max_distance:
+                matches.append({
+                    'result_id': result_id,
+                    'content_hash': content_hash,
+                    'email': email,
+                    'document_type': entry_type,
+                    'distance': distance,
+                    'created_at': created_at
+                })
+        matches.sort(key=lambda match: (match['distance'], -match['created_at']))
+        return matches
+
+    def stats(self):
+        """Return the number of indexed documents and distinct contents"""
+        with self._connect() as conn:
+            entries, contents = conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT content_hash) FROM phashes'
+            ).fetchone()
+        return {'entries': entries, 'distinct_contents': contents}
+
+def main():
+    parser = argparse.ArgumentParser(description='Perceptual-hash index maintenance')
+    parser.add_argument('command', choices=['stats'])
+    parser.add_argument('--db', help='Index path (defaults to PHASH_INDEX_PATH)')
+    args = parser.parse_args()
+
+    index = PerceptualHashIndex(args.db)
+    if args.command == 'stats':
+        print(index.stats())
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
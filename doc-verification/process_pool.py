@@ -0,0 +1,160 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def default_start_method():
+    """
+    Start method used when none is configured
+
+    The pool is created on first use, after the app has started its warm-up,
+    job and write-behind threads. Forking that multi-threaded process can
+    leave locks those threads held (logging, sqlite) locked forever in the
+    workers, so they are forked from a clean forkserver process instead,
+    or spawned where forkserver is unavailable (Windows).
+    """
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+class DocumentProcessPool:
+    """Runs per-document verification across a shared pool of worker processes"""
+
+    def __init__(self, max_workers=None, start_method=None, initializer=None):
+        """
+        Initialize the pool
+
+        Parameters:
+        - max_workers: Number of worker processes; 0 runs documents inline
+          in the calling thread
+        - start_method: Multiprocessing start method (fork, spawn, forkserver);
+          defaults to VERIFY_PROCESS_START_METHOD or default_start_method()
+        - initializer: Optional module-level function each worker process
+          runs once when it starts, e.g. to load its OCR engine
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv('VERIFY_PROCESS_WORKERS', os.cpu_count() or 1))
+        self.max_workers = max(0, max_workers)
+        self.start_method = (start_method or os.getenv('VERIFY_PROCESS_START_METHOD')
+                             or default_start_method())
+
+        self.initializer = initializer
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not spawn processes
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=context,
+                                                     initializer=self.initializer)
+                logger.info(f"Started document process pool with {self.max_workers} "
+                            f"{self.start_method} workers")
+            return self._executor
+
+    def _reset(self, executor):
+        """Discard a broken executor so the next submission starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, func, kwargs):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(func, **kwargs)
+        except BrokenProcessPool:
+            # The pool broke since it was last used; start a fresh one
+            self._reset(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(func, **kwargs)
+
+    def run(self, func, calls, error_handler, on_done=None):
+        """
+        Run one call per document in parallel
+
+        Parameters:
+        - func: Module-level (picklable) function to run in the workers
+        - calls: List of keyword-argument dicts, one per document
+        - error_handler: Callable (kwargs, exception) returning the result
+          to use for a document whose call failed
+        - on_done: Optional callback invoked as each document finishes
+
+        Returns:
+        - Results in the same order as calls, regardless of completion order
+        """
+        results = [None] * len(calls)
+
+        if not self.enabled:
+            for index, kwargs in enumerate(calls):
+                try:
+                    results[index] = func(**kwargs)
+                except Exception as e:
+                    results[index] = error_handler(kwargs, e)
+                if on_done:
+                    on_done()
+            return results
+
+        pending = {}
+        for index, kwargs in enumerate(calls):
+            executor, future = self._submit(func, kwargs)
+            pending[future] = (index, executor)
+
+        for future in as_completed(pending):
+            index, executor = pending[future]
+            kwargs = calls[index]
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. a native crash); retry this document once
+                # in a fresh pool so other documents are not failed with it
+                logger.error(f"Document worker crashed, retrying: {str(e)}")
+                self._reset(executor)
+                retry_executor = None
+                try:
+                    retry_executor, retry_future = self._submit(func, kwargs)
+                    results[index] = retry_future.result()
+                except Exception as retry_error:
+                    if isinstance(retry_error, BrokenProcessPool) and retry_executor is not None:
+                        self._reset(retry_executor)
+                    results[index] = error_handler(kwargs, retry_error)
+            except Exception as e:
+                results[index] = error_handler(kwargs, e)
+            if on_done:
+                on_done()
+
+        return results
+
+    def warm_up(self):
+        """
+        Start the worker processes ahead of the first documents
+
+        Each process runs the initializer as it starts, so the first
+        documents do not pay for process start-up or engine loading.
+        """
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        # Workers are started as tasks arrive; one task each starts them all
+        futures = [executor.submit(os.getpid) for _ in range(self.max_workers)]
+        started = {future.result() for future in futures}
+        logger.info(f"Warmed {len(started)} document worker processes")
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,126 @@
+"""
+Opt-in CPU and memory profiling of single verification requests
+
+A request is profiled when an admin sends the X-Profile: 1 header along
+with the ADMIN_API_TOKEN bearer token, or when it is picked by
+PROFILE_SAMPLE_RATE (e.g. 0.01 profiles 1% of requests).
+Requests that are not profiled only pay for that check.
+
+The profile holds the cProfile statistics of the verification and the
+peak memory allocated by Python code while it ran (tracemalloc). Memory
+allocated inside native libraries (OpenCV, Tesseract) is not traced, but
+their time shows up as the calls into them.
+"""
+import os
+import time
+import random
+import pstats
+import marshal
+import logging
+import cProfile
+import threading
+import tracemalloc
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+# Fraction of verification requests profiled without being asked to
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Functions listed in a profile summary, by cumulative time
+PROFILE_TOP_FUNCTIONS = int(os.getenv('PROFILE_TOP_FUNCTIONS', 30))
+
+# tracemalloc is process-wide, so only one verification per process is
+# profiled at a time
+_profile_lock = threading.Lock()
+
+def sampled():
+    """Whether a request should be profiled under PROFILE_SAMPLE_RATE"""
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def _function_name(key):
+    filename, line, name = key
+    if filename == '~':
+        # Built-in functions, e.g. <method 'image_to_string' ...>
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+class RequestProfile:
+    """
+    Context manager capturing a CPU profile and peak Python memory of its block
+
+    Usage:
+        with RequestProfile() as profile:
+            verify(...)
+        if profile.captured:
+            store(profile.summary(), profile.stats_bytes())
+    """
+
+    def __init__(self):
+        self.captured = False
+        self._profiler = None
+        self._owns_tracing = False
+
+    def __enter__(self):
+        if not _profile_lock.acquire(blocking=False):
+            logger.info("Another verification is being profiled; skipping this one")
+            return self
+
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        self._start_memory = tracemalloc.get_traced_memory()[0]
+        self._profiler = cProfile.Profile()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.thread_time()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is None:
+            return False
+        try:
+            self._profiler.disable()
+            self.cpu_seconds = time.thread_time() - self._start_cpu
+            self.wall_seconds = time.perf_counter() - self._start_wall
+            self.peak_memory = max(0, tracemalloc.get_traced_memory()[1] - self._start_memory)
+            if self._owns_tracing:
+                tracemalloc.stop()
+            self.captured = True
+        finally:
+            _profile_lock.release()
+        return False
+
+    def summary(self, limit=None):
+        """
+        Summarize the profile
+
+        Parameters:
+        - limit: Number of functions to list (defaults to PROFILE_TOP_FUNCTIONS)
+
+        Returns:
+        - Dictionary with wall and CPU time, peak memory and the functions
+          with the highest cumulative time
+        """
+        limit = limit or PROFILE_TOP_FUNCTIONS
+        stats = pstats.Stats(self._profiler).stats
+        functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return {
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'peak_memory_bytes': self.peak_memory,
+            'functions': [{
+                'function': _function_name(key),
+                'calls': calls,
+                'total_seconds': round(total_time, 4),
+                'cumulative_seconds': round(cumulative_time, 4)
+            } for key, (_, calls, total_time, cumulative_time, _) in functions]
+        }
+
+    def stats_bytes(self):
+        """Profile in the pstats file format, for snakeviz or pstats.Stats(path)"""
+        return marshal.dumps(pstats.Stats(self._profiler).stats)
@@ -0,0 +1,283 @@
+"""
+Indexed store for document verification results
+
+Results are kept in a single SQLite table with indexes on result id, doctor
+email and (status, created_at), so lookups and the admin review queue never
+scan the filesystem.
+
+Maintenance:
+    python result_store.py compact
+    python result_store.py import analysis_results/
+"""
+import os
+import sys
+import json
+import time
+import base64
+import sqlite3
+import logging
+import argparse
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Expired results are purged at most this often from the write path
+PURGE_INTERVAL = 60 * 60
+
+class ResultStore:
+    """Persistent verification results indexed by id, email and status"""
+
+    def __init__(self, db_path=None, retention=None):
+        """
+        Initialize the store
+
+        Parameters:
+        - db_path: Path to the SQLite database file
+        - retention: Seconds to keep a result; 0 keeps results forever
+        """
+        self.db_path = db_path or os.getenv('RESULT_STORE_PATH', 'verification_results.sqlite3')
+        if retention is None:
+            retention = int(os.getenv('RESULT_RETENTION', 365 * 24 * 60 * 60))
+        self.retention = retention
+        self._last_purge = 0
+        self._init_db()
+
+    def _connect(self):
+        # A short-lived connection per operation keeps the store safe to use
+        # from threads and worker processes at the same time
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    result_id TEXT PRIMARY KEY,
+                    document_type TEXT,
+                    status TEXT,
+                    email TEXT,
+                    created_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_email ON results (email, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_status ON results (status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at)')
+            # Optional request profiles, kept for as long as their results
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS profiles (
+                    result_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    summary TEXT NOT NULL,
+                    stats BLOB
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_profiles_created ON profiles (created_at)')
+
+    def put(self, result, email=None, created_at=None):
+        """
+        Store a verification result
+
+        Parameters:
+        - result: Result dictionary with at least a result_id
+        - email: Email of the doctor the document belongs to
+        - created_at: Optional timestamp, defaults to now
+        """
+        now = time.time()
+        created_at = created_at or now
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results '
+                '(result_id, document_type, status, email, created_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (result['result_id'], result.get('document_type'), result.get('status'),
+                 (email or '').lower() or None, created_at, json.dumps(result))
+            )
+            if self.retention and now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                self._purge(conn, now)
+
+    def get(self, result_id):
+        """Return a result by id, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT data, email, created_at FROM results WHERE result_id = ?', (result_id,)
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def put_profile(self, result_id, summary, stats=None, created_at=None):
+        """
+        Store the profile of the verification that produced a result
+
+        Parameters:
+        - result_id: ID of the profiled result
+        - summary: JSON-serializable profile summary
+        - stats: Optional raw profile in the pstats file format
+        - created_at: Optional timestamp, defaults to now
+        """
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO profiles (result_id, created_at, summary, stats) VALUES (?, ?, ?, ?)',
+                (result_id, created_at or time.time(), json.dumps(summary), stats)
+            )
+
+    def get_profile(self, result_id):
+        """
+        Return the profile stored for a result
+
+        Returns:
+        - Tuple of (summary, stats), or None if the result was not profiled
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT summary, stats FROM profiles WHERE result_id = ?', (result_id,)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def find_by_email(self, email, limit=50):
+        """Return the newest results for a doctor's email"""
+        results, _ = self.list(email=email, limit=limit)
+        return results
+
+    def list(self, status=None, email=None, document_type=None, limit=50, cursor=None):
+        """
+        List results, newest first, with keyset pagination
+
+        Parameters:
+        - status: Optional status filter (e.g. 'suspicious')
+        - email: Optional doctor email filter
+        - document_type: Optional document type filter
+        - limit: Maximum number of results per page
+        - cursor: Cursor returned with the previous page
+
+        Returns:
+        - Tuple of (results, next_cursor); next_cursor is None on the last page
+        """
+        clauses, params = [], []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if email:
+            clauses.append('email = ?')
+            params.append(email.lower())
+        if document_type:
+            clauses.append('document_type = ?')
+            params.append(document_type)
+        if cursor:
+            created_at, result_id = self._decode_cursor(cursor)
+            clauses.append('(created_at < ? OR (created_at = ? AND result_id < ?))')
+            params.extend([created_at, created_at, result_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT data, email, created_at, result_id FROM results {where} '
+                'ORDER BY created_at DESC, result_id DESC LIMIT ?',
+                params + [limit + 1]
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1][2], rows[-1][3])
+        return [self._decode(row) for row in rows], next_cursor
+
+    def count(self, status=None):
+        """Count stored results, optionally with a given status"""
+        with self._connect() as conn:
+            if status:
+                return conn.execute('SELECT COUNT(*) FROM results WHERE status = ?', (status,)).fetchone()[0]
+            return conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _purge(self, conn, now):
+        deleted = conn.execute('DELETE FROM results WHERE created_at < ?', (now - self.retention,)).rowcount
+        conn.execute('DELETE FROM profiles WHERE created_at < ?', (now - self.retention,))
+        if deleted:
+            logger.info(f"Purged {deleted} verification results past retention")
+        return deleted
+
+    def compact(self):
+        """
+        Purge results past retention and reclaim their space
+
+        Returns:
+        - Number of purged results
+        """
+        deleted = 0
+        if self.retention:
+            with self._connect() as conn:
+                deleted = self._purge(conn, time.time())
+        conn = self._connect()
+        try:
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        return deleted
+
+    def import_json_files(self, folder):
+        """
+        Import results written as one JSON file per result by earlier versions
+
+        Returns:
+        - Number of imported results
+        """
+        imported = 0
+        for name in os.listdir(folder):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                with open(path) as f:
+                    result = json.load(f)
+                if 'result_id' not in result:
+                    continue
+                self.put(result, created_at=os.path.getmtime(path))
+                imported += 1
+            except Exception as e:
+                logger.warning(f"Skipping {path}: {str(e)}")
+        return imported
+
+    @staticmethod
+    def _decode(row):
+        data, email, created_at = row[:3]
+        result = json.loads(data)
+        result['email'] = email
+        result['created_at'] = created_at
+        return result
+
+    @staticmethod
+    def _encode_cursor(created_at, result_id):
+        return base64.urlsafe_b64encode(f"{created_at!r}|{result_id}".encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            created_at, result_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+            return float(created_at), result_id
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='Result store path (defaults to RESULT_STORE_PATH)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('compact', help='Purge results past retention and vacuum the database')
+    import_parser = subparsers.add_parser('import', help='Import legacy per-result JSON files')
+    import_parser.add_argument('folder')
+
+    args = parser.parse_args()
+    store = ResultStore(args.db)
+    if args.command == 'compact':
+        print(f"Purged {store.compact()} results; {store.count()} remain")
+    else:
+        print(f"Imported {store.import_json_files(args.folder)} results")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def available_cpus():
+    """Number of cores this process may use, honouring CPU affinity and cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # cgroup v2: "<quota> <period>", or "max <period>" when unlimited
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()[:2]
+        cpus = min(cpus, max(1, int(int(limit) / int(period))))
+    else:
+        # cgroup v1
+        limit = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limit and period and int(limit) > 0:
+            cpus = min(cpus, max(1, int(int(limit) / int(period))))
+    return cpus
+
+def available_memory():
+    """Bytes of memory available to this container, or None if unknown"""
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        # cgroup v1 reports "no limit" as a huge number
+        if value and value.isdigit() and int(value) < 1 << 60:
+            limits.append(int(value))
+
+    meminfo = _read('/proc/meminfo')
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith('MemAvailable:'):
+                limits.append(int(line.split()[1]) * 1024)
+                break
+    return min(limits) if limits else None
+
+def process_memory():
+    """Resident set size of this process in bytes, or 0 if unknown"""
+    status = _read('/proc/self/status')
+    if status:
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def autotune_workers(worker_memory=None, max_workers=None):
+    """
+    Pick the number of pre-forked workers from available cores and memory
+
+    Parameters:
+    - worker_memory: Bytes each worker adds on top of the shared preloaded
+      state (defaults to WORKER_MEMORY_MB, 400 MB)
+    - max_workers: Upper bound (defaults to WORKER_MAX, 16)
+
+    Returns:
+    - Worker count; WEB_CONCURRENCY overrides the calculation
+    """
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(1, int(os.getenv('WEB_CONCURRENCY')))
+
+    worker_memory = worker_memory or int(os.getenv('WORKER_MEMORY_MB', 400)) * 1024 * 1024
+    max_workers = max_workers or int(os.getenv('WORKER_MAX', 16))
+
+    # OCR is CPU-bound, so one worker per core
+    workers = available_cpus()
+    memory = available_memory()
+    if memory:
+        # Workers share the master's preloaded pages, so only their own
+        # allocations count against the budget
+        workers = min(workers, max(1, memory // worker_memory))
+    workers = max(1, min(workers, max_workers))
+    logger.info(f"Autotuned {workers} workers ({available_cpus()} cores, "
+                f"{(memory or 0) // (1024 * 1024)} MB available)")
+    return workers
+
+def autotune_document_workers(workers):
+    """
+    Pick the size of each pre-forked worker's document process pool
+
+    Parameters:
+    - workers: Number of pre-forked workers sharing the cores
+
+    Returns:
+    - Process count per worker: its share of the cores, but at least two so
+      a request's license and degree are read side by side rather than one
+      after the other; VERIFY_PROCESS_WORKERS overrides the calculation
+    """
+    if os.getenv('VERIFY_PROCESS_WORKERS'):
+        return max(0, int(os.getenv('VERIFY_PROCESS_WORKERS')))
+    return max(2, available_cpus() // max(1, workers))
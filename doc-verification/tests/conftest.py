@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the verification service tests
+
+The service modules import each other by name, so the service directory is
+put on sys.path. app.py creates its upload folders and stores when it is
+imported; the app fixture imports it once inside a scratch directory, with
+the background warm-up, the process pool and MongoDB persistence turned off.
+"""
+import os
+import sys
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('service')
+    patch = pytest.MonkeyPatch()
+    settings = {
+        'WARMUP_ON_START': '0',
+        'VERIFY_PROCESS_WORKERS': '0',
+        'MONGO_PERSIST': '0',
+        'OCR_CACHE_PATH': str(workdir / 'ocr_cache.sqlite3'),
+        'RESULT_STORE_PATH': str(workdir / 'results.sqlite3'),
+        'PHASH_INDEX_PATH': str(workdir / 'phash_index.sqlite3'),
+        'BLOB_STORE_PATH': str(workdir / 'uploads' / 'objects'),
+    }
+    for name, value in settings.items():
+        patch.setenv(name, value)
+    for name in ('METRICS_DIR', 'TRAFFIC_RECORD_PATH', 'VERIFY_JOB_DB', 'ADMIN_API_TOKEN', 'ADMIN_API_OPEN'):
+        patch.delenv(name, raising=False)
+    # Upload and review folders are relative to the working directory
+    patch.chdir(workdir)
+    import app
+    yield app
+    patch.undo()
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
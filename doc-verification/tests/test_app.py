@@ -0,0 +1,211 @@
+import io
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+def png_bytes(img):
+    ok, encoded = cv2.imencode('.png', img)
+    assert ok
+    return encoded.tobytes()
+
+def blank_page():
+    return png_bytes(np.full((1200, 900), 245, np.uint8))
+
+def test_overall_status_reports_rejected_documents(app_module):
+    status, reasons = app_module.overall_verification_status({
+        'license': {'status': 'rejected', 'triage': {'reason': 'Page is blank'}},
+        'degree': {'status': 'pending_review'}
+    })
+    assert status == 'resubmission_required'
+    assert reasons == {'license': 'Page is blank'}
+
+def test_overall_status_suspicious_outranks_rejected(app_module):
+    status, reasons = app_module.overall_verification_status({
+        'license': {'status': 'rejected', 'error': 'File is empty'},
+        'degree': {'status': 'suspicious'}
+    })
+    assert status == 'suspicious'
+    assert reasons == {'license': 'File is empty'}
+
+def test_overall_status_without_rejections(app_module):
+    assert app_module.overall_verification_status({
+        'license': {'status': 'verified'}, 'degree': {'status': 'verified'}
+    }) == ('verified', {})
+    assert app_module.overall_verification_status({
+        'license': {'status': 'verified'}, 'degree': {'status': 'likely_valid'}
+    }) == ('pending_review', {})
+
+@pytest.mark.parametrize('endpoint', ['/api/verify-doctor', '/api/verify-doctor-original'])
+def test_blank_page_asks_for_resubmission(app_module, client, endpoint):
+    if not (app_module.ADVANCED_FEATURES and app_module.TRIAGE_ENABLED):
+        pytest.skip("Triage needs the OCR and imaging dependencies")
+    response = client.post(endpoint, data={
+        'name': 'Test Doctor',
+        'email': 'blank@example.com',
+        'license': (io.BytesIO(blank_page()), 'license.png')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['verification_results']['license']['status'] == 'rejected'
+    assert payload['status'] == 'resubmission_required'
+    assert 'license' in payload['resubmission_reasons']
+    assert 'blank' in payload['message']
+
+def test_ocr_fingerprint_follows_backend_and_triage(app_module, monkeypatch):
+    import ocr_engine
+    import triage
+    monkeypatch.setattr(ocr_engine, 'TESSEROCR_AVAILABLE', True)
+    monkeypatch.setenv('OCR_BACKEND', 'pytesseract')
+    baseline = app_module.ocr_fingerprint(app_module.LICENSE_KEYWORDS)
+    assert app_module.ocr_fingerprint(app_module.LICENSE_KEYWORDS) == baseline
+
+    monkeypatch.setenv('OCR_BACKEND', 'tesserocr')
+    assert app_module.ocr_fingerprint(app_module.LICENSE_KEYWORDS) != baseline
+
+    monkeypatch.setenv('OCR_BACKEND', 'pytesseract')
+    monkeypatch.setattr(triage, 'ROTATION_MARGIN', triage.ROTATION_MARGIN * 2)
+    assert app_module.ocr_fingerprint(app_module.LICENSE_KEYWORDS) != baseline
+
+@pytest.fixture
+def stored_result(app_module):
+    app_module.result_store.put({'result_id': 'admin-test', 'status': 'suspicious', 'document_type': 'license'},
+                                email='private@example.com')
+    return 'admin-test'
+
+def test_admin_endpoints_are_closed_without_a_token(app_module, client, stored_result, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_API_TOKEN', '')
+    monkeypatch.setattr(app_module, 'ADMIN_API_OPEN', False)
+    for path in ('/api/results', f'/api/results/{stored_result}', f'/api/results/{stored_result}/profile'):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={'Authorization': 'Bearer '}).status_code == 401
+
+def test_admin_endpoints_can_be_opened_explicitly(app_module, client, stored_result, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_API_TOKEN', '')
+    monkeypatch.setattr(app_module, 'ADMIN_API_OPEN', True)
+    response = client.get(f'/api/results/{stored_result}')
+    assert response.status_code == 200
+    assert response.get_json()['email'] == 'private@example.com'
+
+def test_admin_endpoints_check_the_token(app_module, client, stored_result, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_API_TOKEN', 's3cret')
+    monkeypatch.setattr(app_module, 'ADMIN_API_OPEN', True)
+    path = f'/api/results/{stored_result}'
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+    listing = client.get('/api/results?status=suspicious', headers={'Authorization': 'Bearer s3cret'})
+    assert stored_result in [result['result_id'] for result in listing.get_json()['results']]
+
+def exported_certificate():
+    """Born-digital certificate: flat white page, black text, green seal, red border"""
+    page = np.full((1100, 850, 3), 255, np.uint8)
+    cv2.rectangle(page, (30, 30), (820, 1070), (0, 0, 200), 12)
+    lines = ['PAKISTAN MEDICAL AND DENTAL COUNCIL', 'PMDC REGISTRATION CERTIFICATE',
+             'Registration No 12345-P', 'Medical Practitioner', 'Valid until 2030']
+    for row, line in enumerate(lines):
+        cv2.putText(page, line, (70, 200 + row * 90), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2, cv2.LINE_AA)
+    cv2.circle(page, (650, 880), 110, (40, 150, 40), -1)
+    return png_bytes(page)
+
+class RecordingEngine:
+    name = 'recording'
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def image_to_string(self, image):
+        self.calls += 1
+        return self.text
+
+def test_flat_certificate_with_seal_still_reaches_ocr(app_module, client, monkeypatch):
+    if not (app_module.ADVANCED_FEATURES and app_module.TRIAGE_ENABLED):
+        pytest.skip("Triage needs the OCR and imaging dependencies")
+    data = exported_certificate()
+    report = app_module.triage_image(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE),
+                                     lambda: app_module.decode_color_bytes(data))
+    assert report['verdict'] == 'screenshot'
+
+    engine = RecordingEngine(' '.join(app_module.LICENSE_KEYWORDS))
+    monkeypatch.setattr(app_module, 'get_ocr_engine', lambda: engine)
+    response = client.post('/api/verify-doctor', data={
+        'name': 'Test Doctor',
+        'email': 'exported@example.com',
+        'license': (io.BytesIO(data), 'license.png')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    result = response.get_json()['verification_results']['license']
+    assert engine.calls == 1
+    assert result['method'] == 'ai_ocr'
+    assert result['triage']['verdict'] == 'screenshot'
+    # Every keyword matched, but a likely screen capture is never auto-verified
+    assert result['status'] == 'likely_valid'
+    assert result['confidence'] == app_module.SCREENSHOT_MAX_CONFIDENCE
+
+def test_upload_is_decoded_once(app_module, client, monkeypatch):
+    if not (app_module.ADVANCED_FEATURES and app_module.phash_index.enabled):
+        pytest.skip("Duplicate detection needs the imaging dependencies")
+    decodes = []
+    decode_image = app_module.decode_image
+    monkeypatch.setattr(app_module, 'decode_image', lambda data: decodes.append(1) or decode_image(data))
+    monkeypatch.setattr(app_module, 'get_ocr_engine', lambda: RecordingEngine('medical council'))
+    page = np.full((1100, 850), 250, np.uint8)
+    cv2.putText(page, 'DECODED ONCE 4821', (80, 300), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    response = client.post('/api/verify-doctor', data={
+        'name': 'Test Doctor',
+        'email': 'decode@example.com',
+        'license': (io.BytesIO(png_bytes(page)), 'license.png')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert len(decodes) == 1
+
+def test_candidate_pages_are_decoded_once(app_module, monkeypatch):
+    if not app_module.ADVANCED_FEATURES:
+        pytest.skip("Duplicate detection needs the imaging dependencies")
+    content = png_bytes(np.full((2400, 1800), 250, np.uint8))
+    content_hash = app_module.hash_bytes(content)
+    app_module.blob_store.put_bytes(content_hash, content)
+    loads = []
+    load_image_file = app_module.load_image_file
+    monkeypatch.setattr(app_module, 'load_image_file',
+                        lambda path, profile: loads.append(profile) or load_image_file(path, profile))
+    first = app_module.candidate_page(content_hash)
+    assert app_module.candidate_page(content_hash) is first
+    assert len(loads) == 1
+    # Decoded at the scale pages are compared at, not the OCR scale
+    assert max(first.shape) == app_module.MATCH_SIDE
+    assert app_module.candidate_page('0' * 64) is None
+
+@pytest.fixture
+def crowded_index(app_module, tmp_path, monkeypatch):
+    """Query hash with same-template decoys nearer than the real re-upload"""
+    from phash_index import PerceptualHashIndex
+    monkeypatch.setenv('PHASH_INDEX_ENABLED', '1')
+    index = PerceptualHashIndex(str(tmp_path / 'phash.sqlite3'), retention=0)
+    query = 0x0F0F0F0F0F0F0F0F
+    for distance in range(1, 6):
+        # Decoys at distances 1 to 5, the real re-upload at 8
+        index.add(query ^ ((1 << distance) - 1) << (distance * 9), f'decoy-{distance}',
+                  f'decoy-result-{distance}', 'other@example.com', 'license')
+    index.add(query ^ 0b111_0000_0000_0000_0111 ^ (0b11 << 40), 'real', 'real-result',
+              'other@example.com', 'license')
+    monkeypatch.setattr(app_module, 'phash_index', index)
+    monkeypatch.setattr(app_module, 'perceptual_hash', lambda page: query)
+    compared = []
+    monkeypatch.setattr(app_module, 'confirm_duplicate',
+                        lambda page, candidate: compared.append(candidate) or candidate == 'real')
+    return compared
+
+def test_real_duplicate_behind_nearer_decoys_is_confirmed(app_module, crowded_index):
+    _, confirmed = app_module.find_duplicates(np.zeros((10, 10), np.uint8), 'upload')
+    assert crowded_index[:5] == [f'decoy-{distance}' for distance in range(1, 6)]
+    assert [match['content_hash'] for match in confirmed] == ['real']
+
+def test_cut_off_candidates_are_logged(app_module, crowded_index, monkeypatch, caplog):
+    monkeypatch.setattr(app_module, 'PHASH_CONFIRM_CANDIDATES', 3)
+    with caplog.at_level('WARNING', logger=app_module.logger.name):
+        _, confirmed = app_module.find_duplicates(np.zeros((10, 10), np.uint8), 'upload')
+    assert confirmed == []
+    assert len(crowded_index) == 3
+    assert 'skipped 3 more' in caplog.text
@@ -0,0 +1,117 @@
+import io
+import os
+import struct
+import zlib
+import pytest
+from ingestion import UploadSpool, sniff_kind
+
+def png_header(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk
+
+def jpeg_header(width, height):
+    # SOI, an APP0 segment, then a baseline SOF0 frame header
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + sof0
+
+def spool_upload(data, filename, chunk_size=4096, **kwargs):
+    spool = UploadSpool(filename, **kwargs)
+    for start in range(0, len(data), chunk_size):
+        spool.write(data[start:start + chunk_size])
+    spool._finish()
+    return spool
+
+PDF = b'%PDF-1.4\n' + b'0' * 2048
+HTML = b'<!DOCTYPE html><html><body><img src=x onerror=alert(1)></body></html>' + b' ' * 2048
+
+def test_sniffs_content_kinds():
+    assert sniff_kind(png_header(100, 100)) == 'png'
+    assert sniff_kind(jpeg_header(100, 100)) == 'jpeg'
+    assert sniff_kind(PDF) == 'pdf'
+    assert sniff_kind(HTML) is None
+    assert sniff_kind(b'PK\x03\x04rest') is None
+    assert sniff_kind(b'PK\x03\x04rest', archives=True) == 'zip'
+
+@pytest.mark.parametrize('data, filename, reason', [
+    (PDF, 'license.jpg', 'does not match its PDF content'),
+    (png_header(800, 600) + b'\x00' * 2048, 'license.pdf', 'does not match its PNG content'),
+    (HTML, 'license.jpg', 'not a PDF, PNG or JPEG'),
+    (HTML, 'license.html', 'not a PDF, PNG or JPEG'),
+])
+def test_rejects_content_that_does_not_match(data, filename, reason):
+    spool = spool_upload(data, filename)
+    assert reason in spool.error
+    # Nothing after the rejection is kept
+    assert spool.getvalue() == b''
+
+def test_accepts_matching_content():
+    spool = spool_upload(jpeg_header(1200, 900) + b'\x00' * 4096, 'scan.JPEG')
+    assert spool.error is None
+    assert spool.kind == 'jpeg'
+    assert (spool.width, spool.height) == (1200, 900)
+
+@pytest.mark.parametrize('header', [png_header(20000, 20000), jpeg_header(30000, 20000)])
+def test_rejects_decompression_bombs_from_the_header(header):
+    spool = spool_upload(header + b'\x00' * 4096, None, chunk_size=len(header) + 1024)
+    assert 'too large' in spool.error
+    # Rejected as soon as the header arrived, before the rest was buffered
+    assert spool.size > len(spool.getvalue())
+
+def test_rejects_tiny_images():
+    spool = spool_upload(png_header(10, 4000) + b'\x00' * 2048, 'sliver.png')
+    assert 'too small' in spool.error
+
+def test_rejects_empty_and_truncated_uploads():
+    assert spool_upload(b'', 'empty.png').error == "File is empty"
+    assert 'truncated' in spool_upload(b'\xff\xd8\xff\xe0\x00\x10JFIF', 'cut.jpg').error
+
+def test_spools_to_disk_past_the_memory_limit(tmp_path):
+    data = PDF + b'1' * 8192
+    spool = spool_upload(data, 'big.pdf', max_memory=4096, spool_dir=str(tmp_path))
+    assert spool.error is None
+    assert spool.on_disk and os.path.dirname(spool.path) == str(tmp_path)
+    assert spool.getvalue() == data
+    spool.close()
+    assert os.listdir(tmp_path) == []
+
+def test_rejected_spool_files_are_removed(tmp_path):
+    data = HTML + b'2' * 8192
+    spool = spool_upload(data, 'page.jpg', chunk_size=len(HTML), max_memory=1024, spool_dir=str(tmp_path))
+    assert spool.error
+    assert not spool.on_disk
+    assert os.listdir(tmp_path) == []
+
+def post_form(client, endpoint, padding, **files):
+    data = {'name': 'Test Doctor', 'email': 'size@example.com'}
+    files.setdefault('attachment', (b'x' * padding, 'notes.txt'))
+    data.update({field: (io.BytesIO(content), filename) for field, (content, filename) in files.items()})
+    return client.post(endpoint, data=data, content_type='multipart/form-data')
+
+def test_endpoint_rejects_uploads_that_fail_validation(client):
+    response = post_form(client, '/api/verify-doctor', 0, license=(PDF, 'license.jpg'))
+    result = response.get_json()['verification_results']['license']
+    assert result['status'] == 'rejected'
+    assert result['method'] == 'ingestion'
+    assert 'does not match' in result['error']
+
+def test_bulk_endpoint_accepts_larger_bodies(app_module, client, monkeypatch):
+    megabyte = 1024 * 1024
+    monkeypatch.setitem(app_module.app.config, 'MAX_CONTENT_LENGTH', megabyte)
+    monkeypatch.setitem(app_module.app.config, 'BULK_MAX_CONTENT_LENGTH', 3 * megabyte)
+
+    for endpoint in ('/api/verify-doctor', '/api/verify-doctor-original'):
+        response = post_form(client, endpoint, 2 * megabyte)
+        assert response.status_code == 413
+        assert response.get_json() == {'success': False, 'error': "Upload is larger than 1MB"}
+
+    # Over the single-request limit but within the bulk one; the batch is
+    # parsed and found to hold no doctors
+    response = post_form(client, '/api/verify-batch', 2 * megabyte)
+    assert response.status_code == 400
+    assert 'No doctors found' in response.get_json()['error']
+
+    response = post_form(client, '/api/verify-batch', 4 * megabyte)
+    assert response.status_code == 413
+    assert response.get_json()['error'] == "Upload is larger than 3MB"
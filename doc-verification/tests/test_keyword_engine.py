@@ -0,0 +1,100 @@
+import pytest
+import keyword_engine
+from keyword_engine import KeywordEngine
+
+LICENSE_KEYWORDS = ['medical license', 'physician', 'medical council', 'registration number']
+DEGREE_KEYWORDS = ['mbbs', 'university', 'medical degree', 'graduated']
+CORRECTIONS = {
+    'rned|cal': 'medical',
+    'l|cense': 'license',
+    'docfor': 'doctor',
+    'univers|ty': 'university'
+}
+
+# Fixed OCR outputs for the parity checks
+TEXTS = [
+    "",
+    "MEDICAL COUNCIL OF PAKISTAN\nThis medical license is granted to the physician named below.",
+    "Registration Number: 12345. Valid until 2030.",
+    "University of Health Sciences awards the degree of MBBS to a student who graduated in 2015",
+    "Certificate of attendance; nothing to see here",
+    "physicianphysician medical   license",
+]
+
+def legacy_keyword_matches(text, keywords):
+    """calculate_keyword_matches before the matcher rewrite"""
+    if not text:
+        return 0, []
+    text_words = set(text.lower().split())
+    matches = [keyword for keyword in keywords if keyword.lower() in text_words or keyword.lower() in text.lower()]
+    return (len(matches) / len(keywords) if keywords else 0), matches
+
+@pytest.fixture(params=['pyahocorasick', 'python'])
+def engine_factory(request, monkeypatch):
+    if request.param == 'pyahocorasick':
+        if not keyword_engine.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick is not installed")
+    else:
+        monkeypatch.setattr(keyword_engine, 'AHOCORASICK_AVAILABLE', False)
+
+    def build(keyword_sets=None, corrections=CORRECTIONS):
+        engine = KeywordEngine(keyword_sets or {'license': LICENSE_KEYWORDS, 'degree': DEGREE_KEYWORDS},
+                               corrections)
+        expected = keyword_engine._PyAutomaton if request.param == 'python' else keyword_engine.ahocorasick.Automaton
+        assert isinstance(engine.automaton, expected)
+        return engine
+    return build
+
+def test_literal_corrections(engine_factory):
+    engine = engine_factory()
+    assert engine.correct("rned|cal l|cense of the docfor") == "medical license of the doctor"
+    # The pipe is a literal character, not a regex alternation
+    assert engine.correct("local cal and l licence") == "local cal and l licence"
+
+def test_corrections_prefer_the_longest_leftmost_match(engine_factory):
+    engine = engine_factory(corrections={'l|c': 'lic', 'l|cense': 'license'})
+    assert engine.correct("L|CENSE") == "license"
+
+def test_misspelled_variants_match_keywords(engine_factory):
+    scan = engine_factory().scan("RNED|CAL L|CENSE issued by the rned|cal council; univers|ty records")
+    assert scan['matches']['license'] == ['medical license', 'medical council']
+    assert scan['matches']['degree'] == ['university']
+    assert scan['text'] == "medical license issued by the medical council; university records"
+
+def test_scores_are_fractions_of_each_set(engine_factory):
+    scan = engine_factory().scan("Physician registration number 42, MBBS")
+    assert scan['scores'] == {'license': 0.5, 'degree': 0.25}
+
+def test_type_check_margin(engine_factory):
+    engine = engine_factory()
+    # degree 0.5 vs license 0.25: the 0.25 gap is over the 0.15 margin
+    scan = engine.scan("mbbs university physician")
+    assert KeywordEngine.type_check(scan, 'license') == ('degree', True)
+    assert KeywordEngine.type_check(scan, 'degree') == ('degree', False)
+
+    # A tie is never a mismatch
+    scan = engine.scan("mbbs physician")
+    assert KeywordEngine.type_check(scan, 'license')[1] is False
+
+def test_type_check_margin_boundary():
+    scan = {'scores': {'license': 0.34, 'degree': 0.5}}
+    assert KeywordEngine.type_check(scan, 'license') == ('degree', True)
+    scan = {'scores': {'license': 0.36, 'degree': 0.5}}
+    assert KeywordEngine.type_check(scan, 'license') == ('degree', False)
+    assert KeywordEngine.type_check(scan, 'license', margin=0.1) == ('degree', True)
+
+@pytest.mark.parametrize('text', TEXTS)
+@pytest.mark.parametrize('keywords', [LICENSE_KEYWORDS, DEGREE_KEYWORDS])
+def test_scores_match_the_legacy_matcher(engine_factory, text, keywords):
+    expected_score, expected_matches = legacy_keyword_matches(text, keywords)
+    scan = engine_factory({'keywords': keywords}, corrections=None).scan(text)
+    assert scan['matches']['keywords'] == expected_matches
+    assert scan['scores']['keywords'] == pytest.approx(expected_score)
+
+def test_app_keyword_matches_match_the_legacy_matcher(app_module):
+    for text in TEXTS:
+        for keywords in (app_module.LICENSE_KEYWORDS, app_module.DEGREE_KEYWORDS):
+            score, matches = app_module.calculate_keyword_matches(text, keywords)
+            expected_score, expected_matches = legacy_keyword_matches(text, keywords)
+            assert matches == expected_matches
+            assert score == pytest.approx(expected_score)
@@ -0,0 +1,71 @@
+import threading
+import time
+import pytest
+
+import ocr_engine
+
+class FakeAPI:
+    loaded = []
+
+    def __init__(self, lang, path=None):
+        self.lang = lang
+        self.ended = False
+        self.busy = False
+        FakeAPI.loaded.append(self)
+
+    def SetImage(self, image):
+        # PyTessBaseAPI is not thread-safe; two callers on one instance is a bug
+        assert not self.busy
+        self.busy = True
+
+    def GetUTF8Text(self):
+        time.sleep(0.01)
+        return 'MEDICAL COUNCIL'
+
+    def Clear(self):
+        self.busy = False
+
+    def End(self):
+        self.ended = True
+
+class FakeTesserocr:
+    PyTessBaseAPI = FakeAPI
+
+@pytest.fixture
+def engine(monkeypatch):
+    pytest.importorskip('PIL')
+    FakeAPI.loaded = []
+    monkeypatch.setattr(ocr_engine, 'tesserocr', FakeTesserocr)
+    return ocr_engine.TesserocrEngine(pool_size=2)
+
+def blank_image():
+    from PIL import Image
+    return Image.new('L', (40, 20), 255)
+
+def test_threads_share_a_bounded_set_of_instances(engine):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.image_to_string(blank_image())))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['MEDICAL COUNCIL'] * 8
+    assert len(FakeAPI.loaded) <= 2
+
+    # Threads started later reuse the loaded instances
+    late = threading.Thread(target=engine.image_to_string, args=(blank_image(),))
+    late.start()
+    late.join()
+    assert len(FakeAPI.loaded) <= 2
+
+def test_warm_up_loads_the_whole_pool(engine):
+    engine.warm_up()
+    assert len(FakeAPI.loaded) == 2
+    engine.image_to_string(blank_image())
+    assert len(FakeAPI.loaded) == 2
+
+def test_close_ends_every_instance(engine):
+    engine.warm_up()
+    engine.close()
+    assert all(api.ended for api in FakeAPI.loaded)
@@ -0,0 +1,144 @@
+import random
+import pytest
+from phash_index import (CHUNK_BITS, CHUNKS, MATCH_MAX_DIFFERENCE, PHASH_MAX_DISTANCE, PerceptualHashIndex,
+                         hamming, split_hash)
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+def spread_flips(rng, distance):
+    """Bit positions for a hash at `distance`, spread as evenly as possible over the chunks"""
+    per_chunk = [distance // CHUNKS + (1 if i < distance % CHUNKS else 0) for i in range(CHUNKS)]
+    rng.shuffle(per_chunk)
+    bits = []
+    for chunk, count in enumerate(per_chunk):
+        bits.extend(chunk * CHUNK_BITS + bit for bit in rng.sample(range(CHUNK_BITS), count))
+    return bits
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setenv('PHASH_INDEX_ENABLED', '1')
+    return PerceptualHashIndex(str(tmp_path / 'phash.sqlite3'), retention=0)
+
+def test_hamming_and_chunks():
+    assert hamming(0, (1 << 64) - 1) == 64
+    assert hamming(0b1011, 0b0110) == 3
+    assert split_hash(0x0123456789ABCDEF) == [0x0123, 0x4567, 0x89AB, 0xCDEF]
+
+def test_search_finds_every_hash_within_the_radius(index):
+    rng = random.Random(11)
+    queries = [rng.getrandbits(64) for _ in range(5)] + [(1 << 64) - 1, 1 << 63]
+    expected = {}
+    for query_id, query in enumerate(queries):
+        # Neighbours at every distance up to the radius, with the flipped bits
+        # spread evenly over the chunks: the hardest case for the pigeonhole
+        # probe, where only one chunk is within the chunk radius
+        for distance in range(PHASH_MAX_DISTANCE + 1):
+            for copy in range(3):
+                result_id = f"q{query_id}-d{distance}-{copy}"
+                index.add(flip(query, spread_flips(rng, distance)), f"content-{result_id}", result_id)
+                expected.setdefault(query_id, set()).add(result_id)
+        # Just beyond the radius
+        for distance in range(PHASH_MAX_DISTANCE + 1, PHASH_MAX_DISTANCE + 6):
+            index.add(flip(query, spread_flips(rng, distance)), f"content-far-{query_id}-{distance}",
+                      f"far-{query_id}-{distance}")
+    for entry in range(2000):
+        index.add(rng.getrandbits(64), f"content-noise-{entry}", f"noise-{entry}")
+
+    stored = {}
+    with index._connect() as conn:
+        for phash, result_id in conn.execute('SELECT phash, result_id FROM phashes'):
+            stored[result_id] = phash + (1 << 64) if phash < 0 else phash
+
+    for query_id, query in enumerate(queries):
+        matches = index.search(query)
+        found = {match['result_id'] for match in matches}
+        brute_force = {result_id for result_id, phash in stored.items()
+                       if hamming(phash, query) <= PHASH_MAX_DISTANCE}
+        assert found == brute_force
+        assert expected[query_id] <= found
+        # No hits beyond the radius, and nearest first
+        assert all(match['distance'] == hamming(stored[match['result_id']], query) for match in matches)
+        assert all(match['distance'] <= PHASH_MAX_DISTANCE for match in matches)
+        assert not any(result_id.startswith('far-') for result_id in found)
+        assert [match['distance'] for match in matches] == sorted(match['distance'] for match in matches)
+
+@pytest.mark.parametrize('radius', [0, 3, 4, 7, 8])
+def test_smaller_radii(index, radius):
+    rng = random.Random(radius)
+    query = rng.getrandbits(64)
+    for distance in range(radius + 4):
+        index.add(flip(query, spread_flips(rng, distance)), f"c{distance}", f"d{distance}")
+    assert sorted(match['distance'] for match in index.search(query, max_distance=radius)) == list(range(radius + 1))
+
+def test_search_filters_by_document_type(index):
+    index.add(0xFFFF0000FFFF0000, 'a', 'license-1', document_type='license')
+    index.add(0xFFFF0000FFFF0001, 'b', 'degree-1', document_type='degree', email='Doc@Example.com')
+    assert [match['result_id'] for match in index.search(0xFFFF0000FFFF0000, document_type='degree')] == ['degree-1']
+    assert index.search(0xFFFF0000FFFF0000, document_type='degree')[0]['email'] == 'doc@example.com'
+    assert index.hash_for('a') == 0xFFFF0000FFFF0000
+    assert index.hash_for('missing') is None
+    assert index.stats()['entries'] == 2
+
+@pytest.fixture(scope='module')
+def certificates():
+    pytest.importorskip('cv2')
+    pytest.importorskip('PIL')
+    np = pytest.importorskip('numpy')
+    from PIL import Image, ImageDraw
+    from benchmarks.corpus import LICENSE_TEMPLATE, PAGE_SIZE, degrade, load_font
+
+    def render(name, number, year):
+        """One certificate from the benchmark corpus template, with chosen details"""
+        page = Image.new('L', PAGE_SIZE, 255)
+        draw = ImageDraw.Draw(page)
+        width, height = PAGE_SIZE
+        draw.rectangle((20, 20, width - 20, height - 20), outline=60, width=6)
+        title_font, body_font = load_font(44), load_font(30)
+        y = 110
+        for i, line in enumerate(LICENSE_TEMPLATE):
+            line = line.format(name=name, number=number, year=year)
+            font = title_font if i < 2 else body_font
+            draw.text(((width - draw.textlength(line, font=font)) / 2, y), line, fill=20, font=font)
+            y += 95 if i < 2 else 80
+        return page
+
+    rng = random.Random(3)
+    original = render('Ayesha Khan', 48213, 2027)
+    return {
+        'original': np.asarray(original),
+        'rephotos': [np.asarray(degrade(original, rng, **variation)) for variation in (
+            {'scale': 1.6, 'skew': 2.0, 'blur': 0.8, 'noise': 6},
+            {'scale': 0.6, 'skew': -1.5, 'blur': 0, 'noise': 14},
+            {'scale': 2.4, 'skew': 3.0, 'blur': 1.6, 'noise': 6},
+        )],
+        # Same template and layout, other doctor details
+        'template_mates': [np.asarray(degrade(render(*details), rng, scale=1.0, skew=1.0, blur=0.8, noise=6))
+                           for details in (('Imran Ali', 48213, 2027), ('Ayesha Khan', 71940, 2027),
+                                           ('Ayesha Khan', 48213, 2031), ('Fatima Noor', 93311, 2024))]
+    }
+
+def test_rephotos_hash_close_and_are_confirmed(certificates):
+    from phash_index import perceptual_hash, same_document
+    original = certificates['original']
+    for rephoto in certificates['rephotos']:
+        assert hamming(perceptual_hash(original), perceptual_hash(rephoto)) <= PHASH_MAX_DISTANCE
+        assert same_document(rephoto, original)[0]
+
+def test_template_mates_are_not_confirmed(certificates):
+    from phash_index import perceptual_hash, same_document
+    original = certificates['original']
+    for mate in certificates['template_mates']:
+        # The layout alone makes them near hits...
+        assert hamming(perceptual_hash(original), perceptual_hash(mate)) <= PHASH_MAX_DISTANCE
+        # ...so the aligned comparison has to tell them apart
+        same, difference = same_document(mate, original)
+        assert not same
+        assert difference is None or difference > MATCH_MAX_DIFFERENCE
+
+def test_blank_pages_have_no_hash(certificates):
+    np = pytest.importorskip('numpy')
+    from phash_index import perceptual_hash
+    assert perceptual_hash(np.full((800, 600), 240, np.uint8)) is None
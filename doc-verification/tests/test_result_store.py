@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import time
+import pytest
+import result_store
+from result_store import ResultStore
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / 'results.sqlite3'), retention=0)
+
+def make_result(result_id, status='pending_review', document_type='license'):
+    return {'result_id': result_id, 'status': status, 'document_type': document_type}
+
+def collect_pages(store, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        results, cursor = store.list(limit=limit, cursor=cursor, **filters)
+        ids.extend(result['result_id'] for result in results)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+def test_pagination_has_no_skips_or_duplicates_on_shared_timestamps(store):
+    # Three batches of results written within the same clock tick
+    expected = []
+    for created_at in (3000.0, 2000.0, 1000.0):
+        batch = [f"{created_at:.0f}-{index:02d}" for index in range(7)]
+        for result_id in batch:
+            store.put(make_result(result_id), created_at=created_at)
+        expected.extend(sorted(batch, reverse=True))
+
+    for limit in (1, 2, 3, 5, 7, 20):
+        ids, pages = collect_pages(store, limit)
+        assert ids == expected
+        assert pages == max(1, -(-len(expected) // limit))
+
+def test_pagination_with_filters(store):
+    for index in range(10):
+        status = 'suspicious' if index % 3 == 0 else 'verified'
+        store.put(make_result(f"r{index}", status=status), email='Doc@Example.com' if index < 5 else None,
+                  created_at=100.0 + index // 2)
+
+    ids, _ = collect_pages(store, 1, status='suspicious')
+    assert ids == ['r9', 'r6', 'r3', 'r0']
+    ids, _ = collect_pages(store, 2, email='doc@example.com')
+    assert ids == ['r4', 'r3', 'r2', 'r1', 'r0']
+    assert store.find_by_email('DOC@example.com', limit=2)[0]['email'] == 'doc@example.com'
+
+def test_invalid_cursor(store):
+    with pytest.raises(ValueError):
+        store.list(cursor='not-a-cursor')
+
+def test_get_and_profiles(store):
+    store.put(make_result('r1', status='verified'), email='a@example.com', created_at=50.0)
+    result = store.get('r1')
+    assert result['status'] == 'verified'
+    assert (result['email'], result['created_at']) == ('a@example.com', 50.0)
+    assert store.get('missing') is None
+
+    store.put_profile('r1', {'total_seconds': 1.5}, stats=b'raw')
+    assert store.get_profile('r1') == ({'total_seconds': 1.5}, b'raw')
+    assert store.get_profile('missing') is None
+
+def test_compact_purges_results_past_retention(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite3'), retention=3600)
+    now = time.time()
+    # The first write runs the hourly purge; the expired result comes after it
+    store.put(make_result('new'), created_at=now - 60)
+    store.put(make_result('old'), created_at=now - 7200)
+    store.put_profile('old', {'total_seconds': 1}, created_at=now - 7200)
+    assert store.count() == 2
+
+    assert store.compact() == 1
+    assert store.get('old') is None and store.get_profile('old') is None
+    assert store.get('new') is not None
+    assert store.count() == 1
+
+def test_compact_without_retention_keeps_everything(store):
+    store.put(make_result('ancient'), created_at=1.0)
+    assert store.compact() == 0
+    assert store.count() == 1
+
+def test_import_cli_round_trip(tmp_path, monkeypatch, capsys):
+    legacy = tmp_path / 'analysis_results'
+    legacy.mkdir()
+    imported_at = time.time() - 86400
+    results = [make_result('a1', status='verified'), make_result('a2', status='suspicious', document_type='degree')]
+    for result in results:
+        path = legacy / f"{result['result_id']}_{result['document_type']}.json"
+        path.write_text(json.dumps(result))
+        os.utime(path, (imported_at, imported_at))
+    (legacy / 'notes.txt').write_text('not a result')
+    (legacy / 'broken.json').write_text('{')
+    (legacy / 'other.json').write_text(json.dumps({'status': 'verified'}))
+
+    db_path = str(tmp_path / 'imported.sqlite3')
+    monkeypatch.setattr(sys, 'argv', ['result_store.py', '--db', db_path, 'import', str(legacy)])
+    assert result_store.main() == 0
+    assert 'Imported 2 results' in capsys.readouterr().out
+
+    store = ResultStore(db_path, retention=0)
+    for result in results:
+        stored = store.get(result['result_id'])
+        assert {key: stored[key] for key in result} == result
+        assert stored['created_at'] == pytest.approx(imported_at)
+    assert [result['result_id'] for result in store.list(status='suspicious')[0]] == ['a2']
+
+    monkeypatch.setattr(sys, 'argv', ['result_store.py', '--db', db_path, 'compact'])
+    assert result_store.main() == 0
+    assert '2 remain' in capsys.readouterr().out
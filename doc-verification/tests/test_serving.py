@@ -0,0 +1,12 @@
+import serving
+
+def test_document_workers_share_the_cores(monkeypatch):
+    monkeypatch.delenv('VERIFY_PROCESS_WORKERS', raising=False)
+    monkeypatch.setattr(serving, 'available_cpus', lambda: 16)
+    assert serving.autotune_document_workers(4) == 4
+    # A request's documents still run side by side when workers fill the cores
+    assert serving.autotune_document_workers(16) == 2
+
+def test_document_workers_can_be_overridden(monkeypatch):
+    monkeypatch.setenv('VERIFY_PROCESS_WORKERS', '0')
+    assert serving.autotune_document_workers(4) == 0
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+import pytest
+from verify_documents import DocVerifier
+
+@pytest.fixture
+def verifier(tmp_path, monkeypatch):
+    monkeypatch.setenv('OCR_CACHE_PATH', str(tmp_path / 'ocr_cache.sqlite3'))
+    monkeypatch.setenv('OCR_CACHE_ENABLED', '1')
+    return DocVerifier(batching=False)
+
+def use_rules(verifier):
+    verifier._model_state = 'failed'
+    verifier._model = verifier._tokenizer = None
+
+def use_model(verifier, max_length=512):
+    verifier._model_state = 'ready'
+    verifier._model = object()
+    verifier._tokenizer = SimpleNamespace(model_max_length=max_length)
+
+def test_text_cut_short_by_rules_is_not_reused_by_the_model(verifier, tmp_path, monkeypatch):
+    document = tmp_path / 'license.pdf'
+    document.write_bytes(b'%PDF-1.4 test document')
+    extracted = []
+
+    def extract(document_path, document_type=None):
+        text = f"text under {verifier.stopping_rule()}"
+        extracted.append(text)
+        return text
+
+    monkeypatch.setattr(verifier, '_extract_text_uncached', extract)
+
+    use_rules(verifier)
+    assert verifier.extract_text(str(document), 'license') == 'text under rules'
+    assert verifier.extract_text(str(document), 'license') == 'text under rules'
+    assert len(extracted) == 1
+
+    # Once the model is available, the rules' early stop no longer applies
+    use_model(verifier)
+    assert verifier.extract_text(str(document), 'license') == 'text under model:512'
+    assert len(extracted) == 2
+
+def test_stopping_rule_names_the_model_window(verifier):
+    use_rules(verifier)
+    assert verifier.stopping_rule() == 'rules'
+    use_model(verifier, max_length=256)
+    assert verifier.stopping_rule() == 'model:256'
+
+def test_extracted_image_text_is_corrected(verifier, monkeypatch):
+    np = pytest.importorskip('numpy')
+    import verify_documents
+    engine = SimpleNamespace(image_to_string=lambda image: 'Rned|cal L|cense issued to a docfor of rnedicine')
+    monkeypatch.setattr(verify_documents, 'get_ocr_engine', lambda: engine)
+    text = verifier.extract_text_from_array(np.full((200, 300), 255, np.uint8))
+    assert text.lower() == 'medical license issued to a doctor of medicine'
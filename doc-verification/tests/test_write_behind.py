@@ -0,0 +1,163 @@
+import threading
+import time
+import pytest
+import write_behind
+from write_behind import WriteBehindBuffer
+
+pymongo_errors = pytest.importorskip('pymongo.errors')
+db_connector = pytest.importorskip('db_connector')
+from db_connector import DBConnector, DUPLICATE_KEY_ERROR, is_transient_error
+
+class FakeCollection:
+    """insert_many of a MongoDB collection, with injectable failures"""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+        # Each entry: (exception, number of documents written before it is raised)
+        self.failures = []
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append(time.monotonic())
+        failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            error, written = failure
+            for doc in docs[:written]:
+                self.docs.setdefault(doc['_id'], doc)
+            raise error
+        duplicates, inserted = [], []
+        for index, doc in enumerate(docs):
+            if doc['_id'] in self.docs:
+                duplicates.append({'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'E11000 duplicate key'})
+            else:
+                self.docs[doc['_id']] = doc
+                inserted.append(doc['_id'])
+        if duplicates:
+            raise pymongo_errors.BulkWriteError({'writeErrors': duplicates, 'nInserted': len(inserted)})
+        return type('InsertManyResult', (), {'inserted_ids': inserted})()
+
+class FakeClient:
+    def __init__(self):
+        self.collection = FakeCollection()
+
+    def __getitem__(self, name):
+        return {'verifications': self.collection, 'doctors': FakeCollection()}
+
+def verification_docs(count, start=0):
+    return [DBConnector.build_verification_doc({'name': f'Doctor {index}', 'email': f'd{index}@example.com'},
+                                               {'status': 'pending_review'})
+            for index in range(start, start + count)]
+
+@pytest.fixture
+def db():
+    return DBConnector(client=FakeClient(), ensure_indexes=False)
+
+def make_buffer(db, **kwargs):
+    options = {'max_batch': 10, 'max_delay_ms': 10}
+    options.update(kwargs)
+    return WriteBehindBuffer(db.add_verification_requests, is_transient=is_transient_error, **options)
+
+def test_bulk_insert_skips_duplicates(db):
+    docs = verification_docs(4)
+    assert db.add_verification_requests(docs[:2]) == 2
+    assert db.add_verification_requests(docs) == 2
+    assert len(db.verification_collection.docs) == 4
+
+def test_bulk_insert_raises_other_write_errors(db):
+    db.verification_collection.failures.append((pymongo_errors.BulkWriteError(
+        {'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'Document failed validation'}], 'nInserted': 0}), 0))
+    with pytest.raises(pymongo_errors.BulkWriteError):
+        db.add_verification_requests(verification_docs(1))
+
+def test_transient_errors_are_retried_with_backoff(db):
+    collection = db.verification_collection
+    # The first attempt writes part of the batch before the connection drops
+    collection.failures = [(pymongo_errors.AutoReconnect('connection reset'), 3),
+                           (pymongo_errors.AutoReconnect('not primary'), 0)]
+    buffer = make_buffer(db)
+    docs = verification_docs(5)
+    for doc in docs:
+        assert buffer.submit(doc)
+
+    assert buffer.flush(timeout=10)
+    assert len(collection.calls) == 3
+    first_wait, second_wait = (later - earlier for earlier, later in zip(collection.calls, collection.calls[1:]))
+    assert first_wait >= 0.45
+    assert second_wait >= 0.9
+    # Records written before the failure are not duplicated by the retry
+    assert sorted(collection.docs) == sorted(doc['_id'] for doc in docs)
+    assert (buffer.written, buffer.dropped) == (5, 0)
+    buffer.close(timeout=1)
+
+def test_permanent_errors_drop_the_batch(db):
+    db.verification_collection.failures = [(pymongo_errors.OperationFailure('not authorized', code=13), 0)]
+    buffer = make_buffer(db)
+    for doc in verification_docs(3):
+        buffer.submit(doc)
+    assert buffer.flush(timeout=5)
+    assert (buffer.written, buffer.dropped) == (0, 3)
+    buffer.submit(verification_docs(1)[0])
+    assert buffer.flush(timeout=5)
+    assert buffer.written == 1
+    buffer.close(timeout=1)
+
+def test_batches_are_written_in_order(db):
+    buffer = make_buffer(db, max_batch=4)
+    docs = verification_docs(10)
+    for doc in docs:
+        buffer.submit(doc)
+    assert buffer.flush(timeout=5)
+    assert list(db.verification_collection.docs) == [doc['_id'] for doc in docs]
+    buffer.close(timeout=1)
+
+def test_close_drains_records_that_are_not_yet_due(db):
+    buffer = make_buffer(db, max_delay_ms=60000)
+    docs = verification_docs(3)
+    for doc in docs:
+        buffer.submit(doc)
+    assert db.verification_collection.docs == {}
+    buffer.close(timeout=5)
+    assert len(db.verification_collection.docs) == 3
+    assert buffer.pending() == 0
+    # Closed buffers refuse new records
+    assert buffer.submit(verification_docs(1)[0]) is False
+    assert buffer.dropped == 1
+
+def test_buffer_registers_its_drain_at_exit(db, monkeypatch):
+    registered = []
+    monkeypatch.setattr(write_behind.atexit, 'register', registered.append)
+    buffer = make_buffer(db, max_delay_ms=60000)
+    assert registered == []
+    buffer.submit(verification_docs(1)[0])
+    buffer.submit(verification_docs(1)[0])
+    assert registered == [buffer.close]
+
+    # What the interpreter runs at exit
+    registered[0]()
+    assert len(db.verification_collection.docs) == 2
+
+def test_full_buffer_drops_new_records():
+    release = threading.Event()
+    written = []
+
+    def slow_write(batch):
+        release.wait(5)
+        written.extend(batch)
+
+    buffer = WriteBehindBuffer(slow_write, max_batch=1, max_delay_ms=0, max_pending=2)
+    assert buffer.submit('in flight')
+    # Wait for the writer to take the first record off the buffer
+    deadline = time.monotonic() + 5
+    while buffer._in_flight == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert buffer.submit('queued 1')
+    assert buffer.submit('queued 2')
+    assert buffer.submit('overflow') is False
+    assert buffer.dropped == 1
+    assert buffer.pending() == 3
+
+    release.set()
+    assert buffer.flush(timeout=5)
+    assert written == ['in flight', 'queued 1', 'queued 2']
+    buffer.close(timeout=1)
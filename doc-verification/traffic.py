@@ -0,0 +1,85 @@
+"""
+Record the shape of verification requests for load-test replay
+
+With TRAFFIC_RECORD_PATH set, every verification request appends one JSON
+line: arrival time, endpoint, whether it was asynchronous, response status
+and, per uploaded file, the form field, detected kind, size and image
+dimensions. Names, emails, filenames and document content are never
+recorded. Replay the file with benchmarks/load_test.py.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from ingestion import UploadSpool
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def file_shape(field, storage):
+    """Sanitized description of one uploaded file"""
+    spool = storage.stream
+    extension = os.path.splitext(storage.filename or '')[1].lower().lstrip('.')
+    if not isinstance(spool, UploadSpool):
+        return {'field': field, 'extension': extension, 'kind': None, 'size': None}
+    return {
+        'field': field,
+        'extension': extension,
+        'kind': spool.kind,
+        'size': spool.size,
+        'width': spool.width,
+        'height': spool.height
+    }
+
+class TrafficRecorder:
+    """Appends request shapes to a JSON-lines file shared by all worker processes"""
+
+    def __init__(self, path=None):
+        """
+        Initialize the recorder
+
+        Parameters:
+        - path: File to append to (defaults to TRAFFIC_RECORD_PATH); recording
+          is off when empty
+        """
+        self.path = path if path is not None else os.getenv('TRAFFIC_RECORD_PATH', '')
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def record(self, endpoint, files, status, is_async=False, arrived_at=None):
+        """
+        Append one request shape
+
+        Parameters:
+        - endpoint: Request path, e.g. /api/verify-doctor
+        - files: Werkzeug MultiDict of uploaded files
+        - status: Response status code
+        - is_async: Whether the client asked for asynchronous verification
+        - arrived_at: Arrival timestamp, defaults to now
+        """
+        line = json.dumps({
+            'time': round(arrived_at or time.time(), 3),
+            'endpoint': endpoint,
+            'async': is_async,
+            'status': status,
+            'files': [file_shape(field, storage) for field, storage in files.items(multi=True)]
+        }) + '\n'
+        try:
+            # One write per line in append mode, so lines from concurrent
+            # worker processes do not interleave
+            with self.lock, open(self.path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            logger.error(f"Error recording request shape: {str(e)}")
+
+def load_shapes(path):
+    """Read recorded request shapes, oldest first"""
+    with open(path) as f:
+        shapes = [json.loads(line) for line in f if line.strip()]
+    return sorted(shapes, key=lambda shape: shape['time'])
@@ -0,0 +1,265 @@
+"""
+Cheap image triage run before preprocessing and OCR
+
+A handful of image statistics, computed on a downsampled copy of the
+decoded page in tens of milliseconds, catch uploads that cannot yield a
+credential and scans that need turning before OCR:
+
+- blank: nothing, or almost nothing, darker than the surrounding paper
+- blurry: even the sharpest edges are too soft for OCR
+- screenshot: a noise-free, born-digital image with coloured interface
+  elements, like a browser or desktop capture
+- rotation: text lines run vertically (90/270 degrees) or upside down
+  (180 degrees), judged from ink projection profiles and from ascenders
+  outnumbering descenders in Latin text
+
+Blank and blurry pages are short-circuited with the reason; rotated pages
+are turned upright and OCR'd as usual. The screenshot verdict is advisory:
+born-digital certificates exported to PNG or PDF are just as noise-free and
+often carry a coloured seal or border, so those pages are still read and
+only flagged for review.
+"""
+import os
+import logging
+from lazy_loading import LazyModule
+
+# Imaging libraries are imported on first use to keep service startup fast
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TRIAGE_ENABLED = os.getenv('TRIAGE_ENABLED', '1') != '0'
+
+# Longest side of the copy the statistics are computed on
+ANALYSIS_SIDE = 1000
+# Ink is darker than the local paper background by at least this much
+INK_DELTA = 40
+# Pages whose darkest marks are less than this below the local paper
+# background hold nothing but paper texture and sensor noise
+BLANK_MAX_DEPTH = 20
+# Pages with less ink than this fraction of pixels are blank
+TRIAGE_MIN_INK = float(os.getenv('TRIAGE_MIN_INK', 0.002))
+# Pages whose sharpest edges (99.5th percentile gradient) are weaker than this are unreadable
+TRIAGE_MIN_SHARPNESS = float(os.getenv('TRIAGE_MIN_SHARPNESS', 110))
+# Screenshots: share of horizontally adjacent pixels with identical values
+# (scans and photos carry sensor noise) and share of saturated colour pixels
+SCREENSHOT_MIN_FLATNESS = 0.8
+SCREENSHOT_MIN_COLOUR = 0.01
+# Verdicts that make OCR pointless; other verdicts are only reported
+REJECTED_VERDICTS = ('blank', 'blurry')
+# Orientation is only changed when the evidence is this many times stronger
+ROTATION_MARGIN = 1.5
+# Skew angles (degrees) tried when straightening text lines
+DESKEW_ANGLES = tuple(angle / 2 for angle in range(-12, 13))
+# Lines with fewer ink pixels in their ascender and descender bands are ignored
+MIN_EXTENDER_INK = 20
+
+def triage_settings():
+    """Settings that decide which pages are rejected or turned, for cache fingerprints"""
+    return {
+        'enabled': TRIAGE_ENABLED,
+        'analysis_side': ANALYSIS_SIDE,
+        'ink_delta': INK_DELTA,
+        'blank_max_depth': BLANK_MAX_DEPTH,
+        'min_ink': TRIAGE_MIN_INK,
+        'min_sharpness': TRIAGE_MIN_SHARPNESS,
+        'screenshot': (SCREENSHOT_MIN_FLATNESS, SCREENSHOT_MIN_COLOUR),
+        'rotation_margin': ROTATION_MARGIN,
+        'deskew_angles': DESKEW_ANGLES,
+        'min_extender_ink': MIN_EXTENDER_INK
+    }
+
+class TriageRejectedError(Exception):
+    """Raised when a page is not worth running OCR on"""
+
+    def __init__(self, report):
+        super().__init__(report['reason'])
+        self.report = report
+
+def analysis_copy(gray):
+    height, width = gray.shape[:2]
+    scale = ANALYSIS_SIDE / max(height, width)
+    if scale >= 1:
+        return gray
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+def darkness(small):
+    """How far each pixel is below the paper around it, robust to uneven lighting"""
+    smooth = cv2.GaussianBlur(small, (5, 5), 0)
+    background = cv2.blur(smooth, (31, 31)).astype(np.int16)
+    return background - smooth.astype(np.int16)
+
+def sharpness(small):
+    """Strength of the sharpest edges; sensor noise is smoothed away first"""
+    smooth = cv2.GaussianBlur(small, (3, 3), 0)
+    gx = cv2.Sobel(smooth, cv2.CV_32F, 1, 0)
+    gy = cv2.Sobel(smooth, cv2.CV_32F, 0, 1)
+    return float(np.percentile(cv2.magnitude(gx, gy), 99.5))
+
+def flatness(small):
+    """Share of horizontally adjacent pixels with exactly the same value"""
+    return float((small[:, 1:] == small[:, :-1]).mean())
+
+def colour_fraction(color):
+    """Share of clearly coloured (saturated, not dark) pixels in a BGR image"""
+    hsv = cv2.cvtColor(analysis_copy(color), cv2.COLOR_BGR2HSV)
+    return float(((hsv[..., 1] > 80) & (hsv[..., 2] > 60)).mean())
+
+def _line_spans(profile):
+    """Runs of rows holding ink, as (start, end) pairs"""
+    occupied = profile > max(1, profile.max() * 0.05)
+    spans, start = [], None
+    for row, filled in enumerate(occupied):
+        if filled and start is None:
+            start = row
+        elif not filled and start is not None:
+            spans.append((start, row))
+            start = None
+    if start is not None:
+        spans.append((start, len(occupied)))
+    return spans
+
+def extender_balance(ink):
+    """
+    Compare ink above and below the x-height band of each text line
+
+    Latin text has more ascenders (capitals, b, d, h, k, l, t) than
+    descenders (g, j, p, q, y), so upright lines carry more ink above the
+    band than below it.
+
+    Returns:
+    - Tuple of (ink above, ink below) summed over the lines
+    """
+    # A central strip keeps slightly skewed lines from smearing together
+    width = ink.shape[1]
+    strip = ink[:, width // 4: width - width // 4]
+    profile = strip.sum(axis=1)
+    above = below = 0
+    for start, end in _line_spans(profile):
+        if end - start < 6:
+            continue
+        line = profile[start:end]
+        band = np.nonzero(line >= line.max() * 0.5)[0]
+        above += int(line[:band[0]].sum())
+        below += int(line[band[-1] + 1:].sum())
+    return above, below
+
+def profile_strength(ink):
+    """How strongly ink is grouped into horizontal lines (row profile variation)"""
+    width = ink.shape[1]
+    profile = ink[:, width // 4: width - width // 4].sum(axis=1).astype(np.float64)
+    mean = profile.mean()
+    return float(profile.var() / (mean * mean)) if mean else 0.0
+
+def deskew(ink):
+    """Straighten slightly skewed text lines by maximizing row profile variation"""
+    mask = ink.astype(np.uint8) * 255
+    height, width = mask.shape
+    # A coarser copy is enough to score the angles
+    scale = min(1.0, 500 / max(height, width))
+    coarse = cv2.resize(mask, (max(1, int(width * scale)), max(1, int(height * scale))),
+                        interpolation=cv2.INTER_AREA)
+
+    def rotated(img, angle):
+        rows, cols = img.shape
+        matrix = cv2.getRotationMatrix2D((cols / 2, rows / 2), angle, 1.0)
+        return cv2.warpAffine(img, matrix, (cols, rows), flags=cv2.INTER_NEAREST)
+
+    angle = max(DESKEW_ANGLES, key=lambda candidate: profile_strength(rotated(coarse, candidate)))
+    return rotated(mask, angle) > 0 if angle else ink
+
+def detect_rotation(ink):
+    """
+    Estimate how far a page is turned, in degrees clockwise
+
+    Returns:
+    - 0, 90, 180 or 270; rotating the page counter-clockwise by this
+      angle makes it upright
+    """
+    horizontal, vertical = profile_strength(ink), profile_strength(ink.T)
+    candidates = (0, 180)
+    if vertical > horizontal * ROTATION_MARGIN:
+        candidates = (90, 270)
+
+    # Both candidates share their text lines; upright has ink above the
+    # x-height band where the turned-over one has it below
+    above, below = extender_balance(deskew(upright_view(ink, candidates[0])))
+    if above + below < MIN_EXTENDER_INK:
+        # No lowercase text to judge by
+        return candidates[0]
+    if candidates[0] == 0:
+        # Only turn a page over on clear evidence
+        return 180 if below > above * ROTATION_MARGIN else 0
+    return 90 if above >= below else 270
+
+def upright_view(img, rotation):
+    """Rotate an image counter-clockwise by a multiple of 90 degrees"""
+    return np.rot90(img, k=rotation // 90) if rotation else img
+
+def rotate_upright(img, rotation):
+    """Turn a page detected as rotated by `rotation` degrees upright"""
+    if not rotation:
+        return img
+    codes = {
+        90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+        180: cv2.ROTATE_180,
+        270: cv2.ROTATE_90_CLOCKWISE
+    }
+    return cv2.rotate(img, codes[rotation])
+
+def triage_image(gray, load_color=None):
+    """
+    Run the cheap checks on a decoded page
+
+    Parameters:
+    - gray: Grayscale (or BGR) numpy array as decoded for OCR
+    - load_color: Optional callable returning the page as a BGR array; it
+      is only called for noise-free images, to look for coloured interface
+      elements
+
+    Returns:
+    - Report dict with 'verdict' ('ok', 'blank', 'blurry' or 'screenshot'),
+      'reason', 'rotation' in degrees and the statistics behind them; only
+      REJECTED_VERDICTS mean the page is not worth reading
+    """
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    small = analysis_copy(gray)
+    depth = darkness(small)
+    ink = depth > INK_DELTA
+
+    report = {
+        'verdict': 'ok',
+        'reason': None,
+        'rotation': 0,
+        'depth': float(np.percentile(depth, 99.9)),
+        'ink': round(float(ink.mean()), 4),
+        'sharpness': round(sharpness(small), 1),
+        'flatness': round(flatness(small), 3)
+    }
+
+    if report['depth'] < BLANK_MAX_DEPTH:
+        report['verdict'] = 'blank'
+        report['reason'] = "Page is blank or has no legible content"
+    elif report['sharpness'] < TRIAGE_MIN_SHARPNESS:
+        report['verdict'] = 'blurry'
+        report['reason'] = "Image is too blurred to read; please upload a sharper scan or photo"
+    elif report['ink'] < TRIAGE_MIN_INK:
+        report['verdict'] = 'blank'
+        report['reason'] = "Page is blank or has no legible content"
+    elif report['flatness'] >= SCREENSHOT_MIN_FLATNESS and load_color is not None:
+        color = load_color()
+        if color is not None and color.ndim == 3:
+            report['colour'] = round(colour_fraction(color), 4)
+            if report['colour'] >= SCREENSHOT_MIN_COLOUR:
+                report['verdict'] = 'screenshot'
+                report['reason'] = "Image looks like a screen capture rather than a scan or photo"
+
+    if report['verdict'] not in REJECTED_VERDICTS:
+        report['rotation'] = detect_rotation(ink)
+    return report
@@ -1,44 +1,86 @@
 import os
 import logging
-import pytesseract
-# Comment out the explicit path
+import threading
+# To set an explicit tesseract path:
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-from PIL import Image
-import fitz  # PyMuPDF for PDF processing
-import numpy as np
-import cv2
-import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
 from pathlib import Path
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from ocr_cache import OCRCache, hash_file, settings_fingerprint
+from ocr_engine import engine_settings as ocr_engine_settings, get_ocr_engine
+from keyword_engine import KeywordEngine
+from inference_scheduler import BatchScheduler
+from model_backends import load_classifier
+from preprocessing import decode_image_bytes, get_profile, load_image_file, preprocess_gray
+from lazy_loading import LazyModule
+from metrics import stage
+
+# Heavy libraries are imported on first use, so constructing a DocVerifier is cheap
+fitz = LazyModule('fitz')  # PyMuPDF for PDF processing
+torch = LazyModule('torch')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of scanned PDF pages OCR'd concurrently by a process
+PDF_PAGE_WORKERS = max(1, int(os.getenv('PDF_PAGE_WORKERS', min(4, os.cpu_count() or 1))))
+
+_page_pool = None
+_page_pool_pid = None
+_page_pool_lock = threading.Lock()
+
+def get_page_pool():
+    """
+    Return the thread pool this process OCRs scanned PDF pages on
+    
+    The pool outlives individual documents, so its threads keep using the
+    OCR engine instances they already loaded instead of starting cold.
+    """
+    global _page_pool, _page_pool_pid
+    with _page_pool_lock:
+        # Threads do not survive fork, so a child process starts its own pool
+        if _page_pool is None or _page_pool_pid != os.getpid():
+            _page_pool = ThreadPoolExecutor(max_workers=PDF_PAGE_WORKERS,
+                                            thread_name_prefix='pdf-page')
+            _page_pool_pid = os.getpid()
+        return _page_pool
+
+def shutdown_page_pool(wait=True):
+    """Stop this process's PDF page threads, e.g. before the worker exits"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None and _page_pool_pid == os.getpid():
+            _page_pool.shutdown(wait=wait)
+        _page_pool = None
+
 class DocVerifier:
     """Class for verifying medical documents using AI techniques"""
     
-    def __init__(self):
-        """Initialize the document verifier with necessary models"""
+    def __init__(self, preprocess_profile=None, batching=None):
+        """
+        Initialize the document verifier with necessary models
+        
+        Parameters:
+        - preprocess_profile: Name of the preprocessing profile (fast, quality, full)
+        - batching: Whether concurrent model calls are micro-batched
+          (defaults to the INFERENCE_BATCHING environment variable)
+        """
         logger.info("Initializing document verifier")
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
-        # Initialize medical document classification model
-        try:
-            model_name = "distilbert-base-uncased"  # Replace with specialized model fine-tuned for medical documents
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2)
-            self.model.to(self.device)
-            self.model.eval()
-            logger.info(f"Model loaded successfully on {self.device}")
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
-            # Fallback to rule-based verification if model fails to load
-            self.model = None
-            self.tokenizer = None
+        # The classification model is loaded on first use or by warm_up()
+        self.device = None
+        self._model = None
+        self._tokenizer = None
+        self._model_state = 'not_loaded'
+        self._model_lock = threading.Lock()
+            
+        # Micro-batch concurrent classifier calls into one padded forward pass
+        if batching is None:
+            batching = os.getenv('INFERENCE_BATCHING', '1') != '0'
+        self.batch_scheduler = BatchScheduler(self.score_texts) if batching else None
             
         # Keywords for rule-based verification
         self.license_keywords = [
@@ -61,95 +103,241 @@ class DocVerifier:
             'rnedicine': 'medicine',
             'univers|ty': 'university'
         }
+        
+        # Number of scanned PDF pages read ahead of the consumer
+        self.pdf_page_workers = PDF_PAGE_WORKERS
+        
+        # Preprocessing profile shared with the Flask service
+        self.preprocess_profile = get_profile(preprocess_profile)
+        
+        # Single-pass OCR correction and keyword matcher for both document types
+        self.keyword_engine = KeywordEngine(
+            {'license': self.license_keywords, 'degree': self.degree_keywords},
+            self.ocr_corrections
+        )
+        
+        # Persistent OCR cache keyed by the SHA-256 of the document bytes
+        self.ocr_cache = OCRCache()
+        self.cache_fingerprint = settings_fingerprint(
+            self.license_keywords, self.degree_keywords,
+            self.ocr_corrections, self.preprocess_profile, ocr_engine_settings()
+        )
+
+    def _load_model(self):
+        """Load the classifier once; later calls return immediately"""
+        if self._model_state != 'not_loaded':
+            return
+        with self._model_lock:
+            if self._model_state != 'not_loaded':
+                return
+            # Initialize medical document classification model; MODEL_BACKEND selects
+            # fp32 torch, int8 torch or ONNX Runtime, MODEL_DIR a local model directory
+            try:
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                model = load_classifier(device=self.device)
+                self._model, self._tokenizer = model, model.tokenizer
+                self._model_state = 'ready'
+                logger.info(f"Model loaded successfully with {model.name} backend on {self.device}")
+            except Exception as e:
+                logger.error(f"Error loading model: {str(e)}")
+                # Fallback to rule-based verification if model fails to load
+                self._model_state = 'failed'
+
+    @property
+    def model(self):
+        self._load_model()
+        return self._model
+
+    @property
+    def tokenizer(self):
+        self._load_model()
+        return self._tokenizer
+
+    @property
+    def model_state(self):
+        """One of not_loaded, ready or failed"""
+        return self._model_state
+
+    def warm_up(self, background=False):
+        """Load the classifier now, optionally in a background thread"""
+        if background:
+            thread = threading.Thread(target=self._load_model, name='docverifier-warmup', daemon=True)
+            thread.start()
+            return thread
+        self._load_model()
+
+    def preprocess_array(self, img):
+        """Preprocess a decoded grayscale or BGR image array for better OCR results"""
+        return preprocess_gray(img, self.preprocess_profile)
+
+    def extract_text_from_array(self, img):
+        """Extract text from a decoded image array using OCR, without temp files"""
+        with stage('preprocess'):
+            denoised = self.preprocess_array(img)
+        
+        # Extract text using the worker's long-lived OCR engine
+        with stage('ocr'):
+            text = get_ocr_engine().image_to_string(denoised)
+            
+        # Apply OCR corrections
+        return self.keyword_engine.correct(text)
 
     def extract_text_from_image(self, image_path):
         """Extract text from image using OCR"""
         try:
-            # Preprocess image for better OCR results
-            img = cv2.imread(image_path)
+            with stage('decode'):
+                img = load_image_file(image_path, self.preprocess_profile)
             if img is None:
                 raise ValueError(f"Could not read image from {image_path}")
                 
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Apply threshold to get black and white image
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+            return self.extract_text_from_array(img)
             
-            # Apply noise removal
-            denoised = cv2.fastNlMeansDenoising(thresh, h=10)
-            
-            # Save preprocessed image temporarily
-            temp_path = f"{image_path}_preprocessed.jpg"
-            cv2.imwrite(temp_path, denoised)
-            
-            # Extract text using Tesseract OCR
-            text = pytesseract.image_to_string(Image.open(temp_path))
-            
-            # Clean up temp file
-            os.remove(temp_path)
-            
-            # Apply OCR corrections
-            for error, correction in self.ocr_corrections.items():
-                text = re.sub(error, correction, text, flags=re.IGNORECASE)
+        except Exception as e:
+            logger.error(f"Error extracting text from image: {str(e)}")
+            return ""
+
+    def extract_text_from_bytes(self, data):
+        """Extract text from encoded image bytes (e.g. an upload) using OCR"""
+        try:
+            with stage('decode'):
+                img = decode_image_bytes(data, self.preprocess_profile)
+            if img is None:
+                raise ValueError("Could not decode image bytes")
                 
-            return text
+            return self.extract_text_from_array(img)
             
         except Exception as e:
             logger.error(f"Error extracting text from image: {str(e)}")
             return ""
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF document"""
+    def _ocr_page_images(self, images):
+        """OCR the embedded images of one scanned page, decoded in memory"""
+        return "".join(self.extract_text_from_bytes(image_bytes) for image_bytes in images)
+
+    def iter_pdf_pages(self, pdf_path):
+        """
+        Yield the text of each PDF page, in page order
+        
+        Pages with a text layer are read directly. Scanned pages are OCR'd
+        concurrently on the process's page pool, a bounded number of pages
+        ahead of the consumer. Closing the generator early cancels pending
+        pages.
+        """
+        doc = fitz.open(pdf_path)
+        executor = get_page_pool()
+        pending = deque()
         try:
-            text = ""
-            doc = fitz.open(pdf_path)
-            
-            # Extract text from each page
             for page_num in range(len(doc)):
                 page = doc.load_page(page_num)
                 page_text = page.get_text()
-                text += page_text
                 
                 # If page has no text, it might be a scanned image
-                if not page_text.strip():
-                    # Extract images from the page
-                    image_list = page.get_images(full=True)
-                    for img_index, img in enumerate(image_list):
-                        xref = img[0]
-                        base_image = doc.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        
-                        # Save image temporarily
-                        temp_img_path = f"{pdf_path}_page{page_num}_img{img_index}.png"
-                        with open(temp_img_path, "wb") as img_file:
-                            img_file.write(image_bytes)
-                            
-                        # Extract text from image
-                        img_text = self.extract_text_from_image(temp_img_path)
-                        text += img_text
-                        
-                        # Clean up temp file
-                        os.remove(temp_img_path)
+                if page_text.strip():
+                    pending.append(page_text)
+                else:
+                    # Embedded images are passed to OCR as bytes, without temp files
+                    images = [doc.extract_image(img[0])["image"]
+                              for img in page.get_images(full=True)]
+                    pending.append(executor.submit(self._ocr_page_images, images))
+                
+                # Only read ahead as far as the workers can keep busy
+                while len(pending) > self.pdf_page_workers:
+                    yield self._page_result(pending.popleft())
+                    
+            while pending:
+                yield self._page_result(pending.popleft())
+        finally:
+            for item in pending:
+                if isinstance(item, Future):
+                    item.cancel()
+            doc.close()
+
+    @staticmethod
+    def _page_result(item):
+        return item.result() if isinstance(item, Future) else item
+
+    def stopping_rule(self):
+        """
+        Name the rule decision_settled applies
+        
+        PDF text cut short under one rule is incomplete under the other, so
+        it is part of the OCR cache fingerprint.
+        """
+        if self.model and self.tokenizer:
+            return f"model:{self.tokenizer.model_max_length}"
+        return 'rules'
+
+    def decision_settled(self, text, document_type):
+        """
+        Check whether more text can no longer change the verification decision
+        
+        The model only sees the first max_length tokens, and every word is at
+        least one token. Rule-based keyword matches only ever increase, so a
+        verified decision is final.
+        """
+        if self.model and self.tokenizer:
+            return len(text.split()) >= self.tokenizer.model_max_length
+        if document_type:
+            return self.verify_with_rules(text, document_type)['status'] == 'verified'
+        return False
+
+    def extract_text_from_pdf(self, pdf_path, document_type=None):
+        """Extract text from PDF document, stopping once the decision is settled"""
+        try:
+            parts = []
+            for page_num, page_text in enumerate(self.iter_pdf_pages(pdf_path)):
+                parts.append(page_text)
+                if self.decision_settled("".join(parts), document_type):
+                    logger.info(f"Stopping PDF extraction after page {page_num + 1}, decision settled")
+                    break
             
-            return text
+            return "".join(parts)
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             return ""
 
-    def extract_text(self, document_path):
+    def extract_text(self, document_path, document_type=None):
+        """Extract text from document, reusing cached OCR output for known bytes"""
+        try:
+            content_hash = hash_file(document_path)
+        except OSError as e:
+            logger.error(f"Error hashing document: {str(e)}")
+            content_hash = None
+            
+        # PDF extraction may stop early depending on the document type and
+        # on whether the model or the rules decide
+        namespace = f"docverifier:{document_type or 'any'}"
+        fingerprint = settings_fingerprint(self.cache_fingerprint, self.stopping_rule())
+        text = self.ocr_cache.get(content_hash, fingerprint, namespace=namespace)
+        if text is not None:
+            return text
+            
+        text = self._extract_text_uncached(document_path, document_type)
+        self.ocr_cache.put(content_hash, fingerprint, text, namespace=namespace)
+        return text
+
+    def _extract_text_uncached(self, document_path, document_type=None):
         """Extract text from document based on file type"""
         file_ext = os.path.splitext(document_path)[1].lower()
         
         if file_ext in ['.pdf']:
-            return self.extract_text_from_pdf(document_path)
+            return self.extract_text_from_pdf(document_path, document_type)
         elif file_ext in ['.png', '.jpg', '.jpeg']:
             return self.extract_text_from_image(document_path)
         else:
             logger.warning(f"Unsupported file type: {file_ext}")
             return ""
 
+    def score_texts(self, texts):
+        """
+        Run one padded forward pass over a batch of texts
+        
+        Returns:
+        - Probability of being a valid document, one per text
+        """
+        return self.model.score(texts)
+
     def verify_with_model(self, text, document_type):
         """Verify document using the ML model"""
         if not self.model or not self.tokenizer:
@@ -157,15 +345,12 @@ class DocVerifier:
             return self.verify_with_rules(text, document_type)
             
         try:
-            # Prepare text for model
-            inputs = self.tokenizer(text, truncation=True, padding=True, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Get model prediction
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.softmax(outputs.logits, dim=1)
-                score = predictions[0][1].item()  # Probability of being a valid document
+            # Get model prediction, batched with concurrent callers if enabled
+            with stage('model_inference'):
+                if self.batch_scheduler:
+                    score = self.batch_scheduler.score(text)
+                else:
+                    score = self.score_texts([text])[0]
                 
             # Use confidence threshold to determine if verified
             threshold = 0.7  # Can be adjusted based on requirements
@@ -182,17 +367,20 @@ class DocVerifier:
             # Fallback to rule-based verification
             return self.verify_with_rules(text, document_type)
 
-    def verify_with_rules(self, text, document_type):
+    def verify_with_rules(self, text, document_type, scan=None):
         """Verify document using rule-based approach"""
-        text = text.lower()
+        # Correct OCR errors and match both keyword sets in one pass
+        if scan is None:
+            with stage('keyword_scoring'):
+                scan = self.keyword_engine.scan(text)
         
         # Select keywords based on document type
-        keywords = (self.license_keywords if document_type == 'license' 
-                    else self.degree_keywords)
+        keyword_set = 'license' if document_type == 'license' else 'degree'
+        keywords = self.keyword_engine.keyword_sets[keyword_set]
         
         # Count how many keywords are found in the text
-        matches = sum(1 for keyword in keywords if keyword.lower() in text)
-        match_ratio = matches / len(keywords)
+        matches = len(scan['matches'][keyword_set])
+        match_ratio = scan['scores'][keyword_set]
         
         # Determine verification status based on match ratio
         if match_ratio >= 0.3:  # At least 30% of keywords should be present
@@ -234,7 +422,7 @@ class DocVerifier:
                 
             # Extract text from document
             start_time = time.time()
-            extracted_text = self.extract_text(document_path)
+            extracted_text = self.extract_text(document_path, document_type)
             extraction_time = time.time() - start_time
             logger.info(f"Text extraction took {extraction_time:.2f} seconds")
             
@@ -247,12 +435,24 @@ class DocVerifier:
             # Perform verification
             start_time = time.time()
             
+            # Apply OCR corrections and score both keyword sets in one pass
+            with stage('keyword_scoring'):
+                scan = self.keyword_engine.scan(extracted_text)
+            extracted_text = scan['text']
+            
             # Try AI model verification first
             if self.model and self.tokenizer:
                 verification_result = self.verify_with_model(extracted_text, document_type)
             else:
                 # Fallback to rule-based verification
-                verification_result = self.verify_with_rules(extracted_text, document_type)
+                verification_result = self.verify_with_rules(extracted_text, document_type, scan=scan)
+                
+            # Flag a degree uploaded as a license and vice versa
+            keyword_set = 'license' if document_type == 'license' else 'degree'
+            detected_type, type_mismatch = KeywordEngine.type_check(scan, keyword_set)
+            verification_result['type_scores'] = scan['scores']
+            verification_result['detected_type'] = detected_type
+            verification_result['possible_type_mismatch'] = type_mismatch
                 
             verification_time = time.time() - start_time
             logger.info(f"Verification took {verification_time:.2f} seconds")
@@ -0,0 +1,197 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """
+    Buffers records in memory and writes them in batches from a background thread
+
+    A batch is flushed once it holds max_batch records or the oldest record
+    has waited max_delay_ms. Batches that fail with a transient error are put
+    back at the front of the buffer and retried with exponential backoff, so
+    callers never wait on the database.
+    """
+
+    def __init__(self, write_batch, is_transient=None, max_batch=None, max_delay_ms=None,
+                 max_pending=None, max_backoff=30.0):
+        """
+        Initialize the buffer
+
+        Parameters:
+        - write_batch: Callable taking a list of records and persisting them;
+          it must be safe to call again with records that were partly written
+        - is_transient: Callable deciding whether an exception is worth retrying
+        - max_batch: Maximum number of records per write
+        - max_delay_ms: Maximum time a record waits before its batch is written
+        - max_pending: Maximum number of buffered records; further records are dropped
+        - max_backoff: Upper bound in seconds for the retry delay
+        """
+        self.write_batch = write_batch
+        self.is_transient = is_transient or (lambda e: False)
+        self.max_batch = max_batch or int(os.getenv('WRITE_BEHIND_MAX_BATCH', 100))
+        if max_delay_ms is None:
+            max_delay_ms = float(os.getenv('WRITE_BEHIND_MAX_DELAY_MS', 1000))
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_pending = max_pending or int(os.getenv('WRITE_BEHIND_MAX_PENDING', 10000))
+        self.max_backoff = max_backoff
+
+        self.written = 0
+        self.dropped = 0
+        self._records = deque()
+        self._oldest = None
+        self._in_flight = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Started lazily, and restarted in forked workers where the thread is gone
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            if self._pid is None:
+                atexit.register(self.close)
+            elif self._pid != os.getpid():
+                # Records buffered by the parent are its to write
+                self._records = deque()
+                self._in_flight = 0
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, record):
+        """
+        Buffer a record for writing without blocking
+
+        Returns:
+        - True if the record was buffered, False if it was dropped
+        """
+        with self._condition:
+            if self._closed or len(self._records) >= self.max_pending:
+                self.dropped += 1
+                logger.error(f"Write-behind buffer {'closed' if self._closed else 'full'}, dropping record")
+                return False
+            self._ensure_worker()
+            if not self._records:
+                self._oldest = time.monotonic()
+            self._records.append(record)
+            if len(self._records) >= self.max_batch:
+                self._condition.notify()
+            return True
+
+    def pending(self):
+        """Number of records not yet written"""
+        with self._condition:
+            return len(self._records) + self._in_flight
+
+    def _take_batch(self):
+        """Wait until a batch is due, then remove it from the buffer"""
+        with self._condition:
+            while True:
+                if self._records:
+                    due = self._oldest + self.max_delay
+                    if self._closed or len(self._records) >= self.max_batch or time.monotonic() >= due:
+                        break
+                    self._condition.wait(due - time.monotonic())
+                elif self._closed:
+                    return None
+                else:
+                    self._condition.wait()
+
+            count = min(self.max_batch, len(self._records))
+            batch = [self._records.popleft() for _ in range(count)]
+            self._oldest = time.monotonic() if self._records else None
+            self._in_flight = len(batch)
+            return batch
+
+    def _write(self, batch):
+        """Write a batch, returning True when it is done with (written or dropped)"""
+        try:
+            self.write_batch(batch)
+            self.written += len(batch)
+            return True
+        except Exception as e:
+            if self.is_transient(e):
+                logger.warning(f"Transient error writing {len(batch)} records, will retry: {str(e)}")
+                return False
+            logger.error(f"Dropping {len(batch)} records after a permanent write error: {str(e)}")
+            self.dropped += len(batch)
+            return True
+
+    def _run(self):
+        backoff = 0.5
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+
+            done = self._write(batch)
+            with self._condition:
+                self._in_flight = 0
+                if not done:
+                    # Keep the batch at the front so records are written in order
+                    self._records.extendleft(reversed(batch))
+                    self._oldest = time.monotonic()
+                self._condition.notify_all()
+
+            if done:
+                backoff = 0.5
+            else:
+                with self._condition:
+                    if self._closed:
+                        # Still retry while draining, but do not sleep past the deadline
+                        self._condition.wait(min(backoff, 1.0))
+                    else:
+                        self._condition.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def flush(self, timeout=None):
+        """
+        Write everything buffered so far, blocking until done
+
+        Returns:
+        - True if the buffer was emptied within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid():
+                return not self._records
+            # Make the pending records due immediately
+            self._oldest = time.monotonic() - self.max_delay
+            self._condition.notify_all()
+            while self._records or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """
+        Stop accepting records and drain the buffer
+
+        Parameters:
+        - timeout: Seconds to wait for the drain (defaults to WRITE_BEHIND_DRAIN_TIMEOUT)
+        """
+        if timeout is None:
+            timeout = float(os.getenv('WRITE_BEHIND_DRAIN_TIMEOUT', 10))
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join(timeout)
+        remaining = self.pending()
+        if remaining:
+            logger.error(f"Write-behind drain timed out with {remaining} records unwritten")
+        else:
+            logger.info(f"Write-behind buffer drained ({self.written} records written)")
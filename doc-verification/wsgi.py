@@ -0,0 +1,42 @@
+"""
+Production WSGI entry point
+
+Run with pre-forked workers:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app, this module is imported once in the gunicorn master. The
+imaging libraries, OCR engine and (with PRELOAD_CLASSIFIER=1) the
+DocVerifier classifier are loaded here, before workers fork, so their pages
+are shared copy-on-write by every worker instead of loaded per process.
+"""
+import gc
+import os
+import logging
+
+# Warm up synchronously below rather than in a background thread; threads
+# do not survive fork and must not hold locks when the workers are forked
+os.environ.setdefault('WARMUP_ON_START', '0')
+
+import app as service
+
+logger = logging.getLogger(__name__)
+
+app = service.app
+
+# Load engines in the master so workers inherit them
+service.warmup.run()
+
+# Classifier used by DocVerifier-based tooling; only its weights are loaded
+# here. No inference runs in the master, so torch's thread pools are
+# created after fork, in the workers that use them.
+verifier = None
+if os.getenv('PRELOAD_CLASSIFIER', '0') == '1':
+    from verify_documents import DocVerifier
+    verifier = DocVerifier()
+    verifier.warm_up()
+
+# Move everything loaded so far out of the collector's reach, so collections
+# in the workers do not touch (and un-share) the preloaded objects
+gc.collect()
+gc.freeze()
+logger.info(f"Preloaded application; {gc.get_freeze_count()} objects frozen for copy-on-write sharing")